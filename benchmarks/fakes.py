@@ -0,0 +1,242 @@
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+from botocore.exceptions import ClientError
+
+from benchmarks.synthetic import synthetic_history
+
+
+class FakeYahooSource:
+    # Drop-in PriceSource: deterministic history per symbol, no network
+    def __init__(self, seed: int = 42):
+        self.seed = seed
+        self.calls = 0
+
+    def __call__(self, ticker: str, start_date: str, end_date: str, interval: str):
+        self.calls += 1
+        return synthetic_history(ticker, start_date, end_date, self.seed)
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+class _Paginator:
+    def __init__(self, client: "LocalS3Client"):
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = "") -> Iterator[Dict]:
+        keys = self.client._keys(Bucket, Prefix)
+        for start in range(0, max(len(keys), 1), 1000):
+            yield {"Contents": [self.client._describe(Bucket, k) for k in keys[start:start + 1000]]}
+
+
+class LocalS3Client:
+    # The subset of the boto3 S3 client the loaders use, backed by a local directory
+    exceptions = type("exceptions", (), {"NoSuchKey": NoSuchKey})
+
+    def __init__(self, root: str):
+        self.root = root
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+        self._upload_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def _keys(self, bucket: str, prefix: str) -> List[str]:
+        base = os.path.join(self.root, bucket)
+        keys = []
+        # Only walk the directory the prefix points into
+        for directory, _, files in os.walk(os.path.join(base, os.path.dirname(prefix))):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def _describe(self, bucket: str, key: str) -> Dict:
+        path = self._path(bucket, key)
+        with open(path, "rb") as f:
+            etag = hashlib.md5(f.read()).hexdigest()
+        return {
+            "Key": key,
+            "Size": os.path.getsize(path),
+            "ETag": f'"{etag}"',
+            "LastModified": datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+        }
+
+    def create_bucket(self, Bucket: str):
+        os.makedirs(os.path.join(self.root, Bucket), exist_ok=True)
+
+    def put_object(self, Bucket: str, Key: str, Body, IfMatch: str = None, IfNoneMatch: str = None, **kwargs):
+        path = self._path(Bucket, Key)
+        data = Body.read() if hasattr(Body, "read") else Body
+        with self._lock:
+            exists = os.path.exists(path)
+            # Conditional writes behave like S3's: 412 when the object changed or already exists
+            changed = IfMatch is not None and (not exists or self._describe(Bucket, Key)["ETag"] != IfMatch)
+            if changed or (IfNoneMatch == "*" and exists):
+                raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": Key}}, "PutObject")
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise NoSuchKey(Key)
+        with open(path, "rb") as f:
+            data = f.read()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if Range:
+            # Only suffix ranges ("bytes=-N") are used by the staging catalog
+            data = data[-int(re.match(r"bytes=-(\d+)", Range).group(1)):]
+        return {"Body": _Body(data), "ETag": etag}
+
+    def delete_object(self, Bucket: str, Key: str):
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.remove(path)
+        return {}
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        return _Paginator(self)
+
+    def create_multipart_upload(self, Bucket: str, Key: str):
+        upload_id = str(next(self._upload_ids))
+        self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes):
+        self._uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict):
+        parts = self._uploads.pop(UploadId)
+        self.put_object(Bucket, Key, b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"]))
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str):
+        self._uploads.pop(UploadId, None)
+        return {}
+
+
+def require_moto():
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("The moto S3 backend needs moto: pip install -r requirements-dev.txt")
+    return mock_aws
+
+
+@contextmanager
+def fake_s3(bucket: str, backend: str = "local"):
+    if backend == "moto":
+        import boto3
+        mock_aws = require_moto()
+
+        with mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket=bucket)
+            yield client
+        return
+
+    root = tempfile.mkdtemp(prefix="stock_etl_s3_")
+    try:
+        client = LocalS3Client(root)
+        client.create_bucket(Bucket=bucket)
+        yield client
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+class FakeSnowflakeCursor:
+    def __init__(self, connection: "FakeSnowflakeConnection"):
+        self.connection = connection
+        self.description = []
+        self._rows = []
+        self.sfqid = None
+
+    def execute(self, query: str):
+        self.connection.queries.append(query)
+        self.description, self._rows = self.connection.respond(query)
+        return self
+
+    def execute_async(self, query: str):
+        # Runs at once; the results wait under a query id like Snowflake's async queries
+        self.execute(query)
+        self.sfqid = f"query-{len(self.connection.results)}"
+        self.connection.results[self.sfqid] = (self.description, self._rows)
+        return self
+
+    def get_results_from_sfqid(self, query_id: str):
+        self.description, self._rows = self.connection.results[query_id]
+
+    def fetchall(self) -> list:
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeSnowflakeConnection:
+    # Answers COPY INTO with one LOADED row per listed file; anything else returns no rows
+    def __init__(self, **kwargs):
+        self.params = kwargs
+        self.queries: List[str] = []
+        self.results: Dict[str, tuple] = {}
+        self.closed = False
+
+    def respond(self, query: str):
+        if "COPY INTO" in query:
+            files = re.findall(r"'([^']+\.parquet)'", query)
+            description = [("file",), ("status",), ("rows_parsed",), ("rows_loaded",)]
+            return description, [(f, "LOADED", 0, 0) for f in files]
+        return [("status",)], []
+
+    def cursor(self) -> FakeSnowflakeCursor:
+        return FakeSnowflakeCursor(self)
+
+    def get_query_status_throw_if_error(self, query_id: str) -> str:
+        return "SUCCESS"
+
+    def is_still_running(self, status: str) -> bool:
+        return False
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSnowflakeConnector:
+    # Stands in for the snowflake.connector module in SnowflakeSessionPool
+    def __init__(self):
+        self.connections: List[FakeSnowflakeConnection] = []
+
+    def connect(self, **kwargs) -> FakeSnowflakeConnection:
+        connection = FakeSnowflakeConnection(**kwargs)
+        self.connections.append(connection)
+        return connection
@@ -0,0 +1,67 @@
+import io
+import json
+import time
+import argparse
+
+import pyarrow as pa
+
+from benchmarks.synthetic import synthetic_fact_prices
+from src.loading.write_profile import SORT_KEYS, WRITE_PROFILES
+
+
+def run(rows: int, upload: bool) -> list:
+    df = synthetic_fact_prices(rows)
+    results = []
+
+    if upload:
+        import boto3
+        from benchmarks.fakes import require_moto
+        from config.config import AWSConfig
+        from src.loading.s3_loader import S3Loader
+
+        mock = require_moto()()
+        mock.start()
+        AWSConfig.S3_BUCKET = "benchmark-bucket"
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=AWSConfig.S3_BUCKET)
+
+    for name, profile in WRITE_PROFILES.items():
+        start = time.perf_counter()
+        frame = df.sort_values(SORT_KEYS["fact_daily_prices"], kind="stable") if profile.presort else df
+        buffer = io.BytesIO()
+        profile.write_table(pa.Table.from_pandas(frame, preserve_index=False), buffer)
+        encode_seconds = time.perf_counter() - start
+
+        result = {
+            "profile": name,
+            "rows": rows,
+            "bytes": buffer.getbuffer().nbytes,
+            "encode_seconds": round(encode_seconds, 4)
+        }
+
+        if upload:
+            loader = S3Loader(s3_client=client, write_profile=profile)
+            start = time.perf_counter()
+            loader.upload_dataframe(df, "fact_daily_prices")
+            result["upload_seconds"] = round(time.perf_counter() - start, 4)
+
+        results.append(result)
+
+    if upload:
+        mock.stop()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Parquet write profiles on synthetic fact data")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--upload", action="store_true", help="Also time S3Loader uploads against moto")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.upload)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,230 @@
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import resource
+import subprocess
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import pandas as pd
+
+from benchmarks.synthetic import START_DATE, symbol_names, synthetic_companies, synthetic_prices, trading_days
+
+# Named sizes as (symbols, trading days)
+SIZES = {
+    "10k": (50, 200),
+    "1m": (500, 2_000),
+    "10m": (2_000, 5_000)
+}
+
+STAGES = ["extract", "validate", "transform", "upload", "snowflake_copy"]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def prepare_extract(symbols: int, days: int, options: dict, stack: ExitStack):
+    from config.config import ETLConfig
+    from benchmarks.fakes import FakeYahooSource
+    from src.ingestion.yahoo_finance import YahooFinanceExtractor
+
+    ETLConfig.USE_PRICE_CACHE = False
+    ETLConfig.EXTRACT_RATE_LIMIT = 1e9
+    ETLConfig.EXTRACT_RATE_BURST = 10 ** 9
+    extractor = YahooFinanceExtractor(price_source=FakeYahooSource(options["seed"]))
+    tickers = symbol_names(symbols)
+    end_date = (trading_days(days)[-1] + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+    return lambda: len(extractor.extract_daily_prices(tickers, START_DATE, end_date))
+
+
+def prepare_validate(symbols: int, days: int, options: dict, stack: ExitStack):
+    from src.transformation.validators import DataValidator
+
+    prices = synthetic_prices(symbols, days, options["invalid_rate"], options["duplicate_rate"], options["seed"])
+    validator = DataValidator()
+
+    def run():
+        validator.validate_price_data(prices)
+        return len(prices)
+    return run
+
+
+def prepare_transform(symbols: int, days: int, options: dict, stack: ExitStack):
+    from src.transformation.transformers import StockDataTransformer
+
+    companies = synthetic_companies(symbols)
+    prices = synthetic_prices(symbols, days, options["invalid_rate"], options["duplicate_rate"], options["seed"])
+    transformer = StockDataTransformer()
+
+    def run():
+        transformer.transform(companies, prices)
+        return len(prices)
+    return run
+
+
+def prepare_upload(symbols: int, days: int, options: dict, stack: ExitStack):
+    from config.config import AWSConfig
+    from benchmarks.fakes import fake_s3
+    from benchmarks.synthetic import synthetic_fact_prices
+    from src.loading.s3_loader import S3Loader
+
+    AWSConfig.S3_BUCKET = "benchmark-bucket"
+    fact_prices = synthetic_fact_prices(symbols * days, symbols, options["seed"])
+    s3_client = stack.enter_context(fake_s3(AWSConfig.S3_BUCKET, options["s3_backend"]))
+    loader = S3Loader(s3_client=s3_client, run_id="benchmark")
+
+    def run():
+        loader.upload_dataframe(fact_prices, "fact_daily_prices")
+        return len(fact_prices)
+    return run
+
+
+def prepare_snowflake_copy(symbols: int, days: int, options: dict, stack: ExitStack):
+    from benchmarks.fakes import FakeSnowflakeConnector
+    from src.loading.snowflake_loader import SnowflakeLoader
+    from src.loading.snowflake_session import SnowflakeSessionPool
+
+    # One staged file per trading day, as a daily-partitioned fact load would produce
+    staged_files = [
+        {
+            "table": "fact_daily_prices",
+            "key": f"staging/fact_daily_prices/trade_date={d}/fact_daily_prices_{d}_0000.parquet",
+            "row_count": symbols
+        }
+        for d in trading_days(days).strftime("%Y-%m-%d")
+    ]
+    loader = SnowflakeLoader(pool=SnowflakeSessionPool(size=1, connector=FakeSnowflakeConnector()))
+    loader.connect()
+
+    def run():
+        loader.copy_into_tables(staged_files, merge=False)
+        return symbols * days
+    return run
+
+
+PREPARE = {
+    "extract": prepare_extract,
+    "validate": prepare_validate,
+    "transform": prepare_transform,
+    "upload": prepare_upload,
+    "snowflake_copy": prepare_snowflake_copy
+}
+
+
+def run_case(stage: str, size: str, options: dict) -> dict:
+    # Runs in a fresh process so peak RSS belongs to this case alone
+    logging.basicConfig(level=logging.CRITICAL)
+    symbols, days = SIZES[size]
+    with ExitStack() as stack:
+        run = PREPARE[stage](symbols, days, options, stack)
+        rss_before = peak_rss_mb()
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rows = run()
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+
+    return {
+        "stage": stage,
+        "size": size,
+        "symbols": symbols,
+        "days": days,
+        "rows": rows,
+        "wall_seconds": round(wall_seconds, 4),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "rows_per_second": round(rows / wall_seconds, 1) if wall_seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "input_rss_mb": round(rss_before, 1)
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(stages: list, sizes: list, options: dict) -> dict:
+    results = []
+    for size in sizes:
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(run_case, stage, size, options).result()
+            print(
+                f"{stage:>15} {size:>4}: {result['rows']:>10} rows in {result['wall_seconds']:>8.3f}s "
+                f"({result['rows_per_second']:>12.0f} rows/s, peak RSS {result['peak_rss_mb']:.0f} MB)",
+                file=sys.stderr
+            )
+            results.append(result)
+
+    return {
+        "revision": git_revision(),
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": results
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["stage"], result["size"]))
+        if before is None:
+            continue
+        if result["wall_seconds"] > before["wall_seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{result['stage']} {result['size']}: wall time {before['wall_seconds']}s -> {result['wall_seconds']}s"
+            )
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{result['stage']} {result['size']}: peak RSS {before['peak_rss_mb']} MB -> {result['peak_rss_mb']} MB"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages offline on synthetic market data")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k", "1m"])
+    parser.add_argument("--invalid-rate", type=float, default=0.01)
+    parser.add_argument("--duplicate-rate", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--s3-backend", choices=["local", "moto"], default="local")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown/growth vs the baseline")
+    args = parser.parse_args()
+
+    options = {
+        "invalid_rate": args.invalid_rate,
+        "duplicate_rate": args.duplicate_rate,
+        "seed": args.seed,
+        "s3_backend": args.s3_backend
+    }
+    report = run(args.stages, args.sizes, options)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
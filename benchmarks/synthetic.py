@@ -0,0 +1,109 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+START_DATE = "2005-01-03"
+SECTORS = [
+    "Information Technology", "Health Care", "Financials", "Consumer Discretionary", "Communication Services",
+    "Industrials", "Consumer Staples", "Energy", "Utilities", "Real Estate", "Materials"
+]
+
+
+def symbol_names(count: int) -> list:
+    return [f"S{i:05d}" for i in range(count)]
+
+
+def trading_days(days: int) -> pd.DatetimeIndex:
+    return pd.bdate_range(START_DATE, periods=days)
+
+
+def symbol_seed(symbol: str, seed: int) -> int:
+    return zlib.crc32(symbol.encode("utf-8")) ^ seed
+
+
+def synthetic_companies(count: int) -> pd.DataFrame:
+    tickers = symbol_names(count)
+    return pd.DataFrame({
+        "symbol": tickers,
+        "company_name": [f"{t} Holdings" for t in tickers],
+        "sector": [SECTORS[i % len(SECTORS)] for i in range(count)],
+        "sub_industry": "Synthetic",
+        "headquarters": "New York, New York",
+        "date_added": "2005-01-03",
+        "cik": [str(1_000_000 + i) for i in range(count)]
+    })
+
+
+def synthetic_bars(rng: np.random.Generator, rows: int) -> dict:
+    close = np.round(rng.lognormal(4, 1, rows), 4)
+    return {
+        "open": np.round(close * rng.uniform(0.98, 1.02, rows), 4),
+        "high": np.round(close * 1.03, 4),
+        "low": np.round(close * 0.97, 4),
+        "close": close,
+        "volume": rng.integers(1_000, 50_000_000, rows)
+    }
+
+
+def synthetic_prices(
+    symbol_count: int,
+    days: int,
+    invalid_rate: float = 0.0,
+    duplicate_rate: float = 0.0,
+    seed: int = 42
+) -> pd.DataFrame:
+    # Shaped like YahooFinanceExtractor output: one row per symbol per trading day, in date order
+    rng = np.random.default_rng(seed)
+    rows = symbol_count * days
+    df = pd.DataFrame({
+        "symbol": np.tile(np.array(symbol_names(symbol_count), dtype=object), days),
+        "date": np.repeat(trading_days(days).to_numpy(), symbol_count),
+        **synthetic_bars(rng, rows)
+    })
+
+    invalid = rng.choice(rows, int(rows * invalid_rate), replace=False)
+    # Cycle through the kinds of breakage the validator looks for
+    kinds = np.arange(len(invalid)) % 4
+    df.loc[invalid[kinds == 0], "close"] = -1.0
+    df.loc[invalid[kinds == 1], "high"] = df.loc[invalid[kinds == 1], "low"] - 1
+    df.loc[invalid[kinds == 2], "volume"] = -1
+    df.loc[invalid[kinds == 3], "symbol"] = None
+
+    duplicates = rng.choice(rows, int(rows * duplicate_rate), replace=False)
+    if len(duplicates):
+        df = pd.concat([df, df.iloc[np.sort(duplicates)]], ignore_index=True)
+
+    df["extracted_at"] = pd.Timestamp("2024-01-01")
+    return df
+
+
+def synthetic_history(symbol: str, start_date: str, end_date: str, seed: int = 42) -> pd.DataFrame:
+    # Shaped like yfinance Ticker.history(): tz-aware "Date" index and capitalized columns
+    index = pd.bdate_range(start_date, end_date, inclusive="left", tz="America/New_York", name="Date")
+    bars = synthetic_bars(np.random.default_rng(symbol_seed(symbol, seed)), len(index))
+    return pd.DataFrame({
+        "Open": bars["open"],
+        "High": bars["high"],
+        "Low": bars["low"],
+        "Close": bars["close"],
+        "Volume": bars["volume"],
+        "Dividends": 0.0,
+        "Stock Splits": 0.0
+    }, index=index)
+
+
+def synthetic_fact_prices(rows: int, symbols: int = 500, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    days = max(-(-rows // symbols), 1)
+    dates = trading_days(days).strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+    # Arrive in extraction order (by date), not clustering order
+    return pd.DataFrame({
+        "price_id": np.arange(1, rows + 1),
+        "company_id": np.tile(np.arange(1, symbols + 1), days)[:rows],
+        "date": np.repeat(dates, symbols)[:rows],
+        **synthetic_bars(rng, rows),
+        "extracted_at": pd.Timestamp("2024-01-01"),
+        "loaded_at": "2024-01-01T00:00:00"
+    })
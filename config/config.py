@@ -10,6 +10,17 @@ class AWSConfig:
     REGION = os.getenv("AWS_REGION", "us-east-1")
     S3_BUCKET = os.getenv("S3_BUCKET")
     S3_STAGING_PREFIX = os.getenv("S3_STAGING_PREFIX", "staging/")
+    S3_ARTIFACT_PREFIX = os.getenv("S3_ARTIFACT_PREFIX", "artifacts/")
+    MULTIPART_THRESHOLD = 64 * 1024 * 1024
+    MULTIPART_PART_SIZE = 16 * 1024 * 1024
+    MULTIPART_CONCURRENCY = 4
+    STREAMING_ROW_GROUP_SIZE = 250_000
+    PARQUET_WRITE_PROFILE = os.getenv("PARQUET_WRITE_PROFILE", "snappy")
+    UPLOAD_CONCURRENCY = 3
+    FACT_PARTITION_GRANULARITY = os.getenv("FACT_PARTITION_GRANULARITY", "day")
+    INTRADAY_BUCKET_MINUTES = int(os.getenv("INTRADAY_BUCKET_MINUTES", 15))
+    TARGET_FILE_SIZE = 128 * 1024 * 1024
+    CATALOG_WRITE_RETRIES = 8
 
 
 class SnowflakeConfig:
@@ -20,6 +31,14 @@ class SnowflakeConfig:
     SCHEMA = os.getenv("SNOWFLAKE_SCHEMA", "PUBLIC")
     WAREHOUSE = os.getenv("SNOWFLAKE_WAREHOUSE", "COMPUTE_WH")
     ROLE = os.getenv("SNOWFLAKE_ROLE", "ACCOUNTADMIN")
+    PRIVATE_KEY_PATH = os.getenv("SNOWFLAKE_PRIVATE_KEY_PATH")
+    PRIVATE_KEY_PASSPHRASE = os.getenv("SNOWFLAKE_PRIVATE_KEY_PASSPHRASE")
+    QUERY_TAG = os.getenv("SNOWFLAKE_QUERY_TAG", "stock_market_etl")
+    POOL_SIZE = 4
+    POOL_TIMEOUT = 60
+    PIPE_LOAD_TIMEOUT = 900
+    STAGE = os.getenv("SNOWFLAKE_STAGE", "stock_etl_stage")
+    LOAD_MODE = os.getenv("SNOWFLAKE_LOAD_MODE", "snowpipe")
 
 
 class ETLConfig:
@@ -28,3 +47,40 @@ class ETLConfig:
     RETRY_DELAY = 5
     DATA_PERIOD = "1d"
     DATA_INTERVAL = "1d"
+    INTRADAY_INTERVAL = os.getenv("INTRADAY_INTERVAL", "5m")
+    INTRADAY_BATCH_SIZE = 25
+    EXTRACT_MAX_WORKERS = 8
+    EXTRACT_RATE_LIMIT = 8.0
+    EXTRACT_RATE_BURST = 16
+    USE_PRICE_CACHE = True
+    PRICE_CACHE_DIR = os.getenv("PRICE_CACHE_DIR", "/tmp/stock_etl/price_cache")
+    # Fail the transform instead of warning when symbols lack the trailing bars indicators need
+    INDICATOR_REQUIRE_HISTORY = os.getenv("INDICATOR_REQUIRE_HISTORY", "false").lower() == "true"
+    CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "/tmp/stock_etl/checkpoints")
+    DEAD_LETTER_AFTER = 2
+    # Fraction of tickers allowed to fail before the extract task fails and retries from its checkpoint
+    MAX_FAILED_TICKER_RATIO = 0.05
+    ARTIFACT_ROOT = os.getenv("ARTIFACT_ROOT", "/tmp/stock_etl/artifacts")
+    ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "local")
+    # Artifacts and pending state left by runs that never committed are swept after this many seconds
+    ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL", 7 * 24 * 3600))
+    DIMENSION_SNAPSHOT_DIR = os.getenv("DIMENSION_SNAPSHOT_DIR", "/tmp/stock_etl/dimensions")
+    ROLLUP_STATE_DIR = os.getenv("ROLLUP_STATE_DIR", "/tmp/stock_etl/rollups")
+    UNIVERSE_CACHE_DIR = os.getenv("UNIVERSE_CACHE_DIR", "/tmp/stock_etl/universe")
+    UNIVERSE_TTL = int(os.getenv("UNIVERSE_TTL", 24 * 3600))
+    BACKFILL_START_DATE = os.getenv("BACKFILL_START_DATE", "2005-01-01")
+    BACKFILL_TICKERS_PER_SHARD = 50
+    BACKFILL_DAYS_PER_SHARD = 366
+    BACKFILL_PARTITION_GRANULARITY = os.getenv("BACKFILL_PARTITION_GRANULARITY", "month")
+    BACKFILL_POOL = os.getenv("BACKFILL_POOL", "stock_backfill")
+    # Rows per record batch when the backfill validates every shard's bars in one streaming pass
+    VALIDATION_BATCH_ROWS = int(os.getenv("VALIDATION_BATCH_ROWS", 500_000))
+
+
+class MetricsConfig:
+    ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    STATSD_HOST = os.getenv("STATSD_HOST")
+    STATSD_PORT = int(os.getenv("STATSD_PORT", 8125))
+    PREFIX = os.getenv("METRICS_PREFIX", "stock_etl")
+    PROMETHEUS_TEXTFILE_DIR = os.getenv("PROMETHEUS_TEXTFILE_DIR")
+    LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
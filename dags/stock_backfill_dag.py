@@ -0,0 +1,396 @@
+import os
+import shutil
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+
+from config.config import ETLConfig, SnowflakeConfig
+from src.ingestion.checkpoint import ExtractionCheckpoint
+from src.ingestion.price_cache import PriceCache
+from src.ingestion.sp500_tickers import get_sp500_tickers
+from src.ingestion.yahoo_finance import YahooFinanceExtractor
+from src.transformation.dimension_cdc import commit_dimensions, diff_dimensions, expire_pending_dimensions
+from src.transformation.indicators import IndicatorCalculator
+from src.transformation.rollups import RollupBuilder
+from src.transformation.transformers import StockDataTransformer
+from src.transformation.validators import DataValidator
+from src.loading.compaction import StagingCompactor
+from src.loading.s3_loader import S3Loader
+from src.loading.snowflake_loader import SnowflakeLoader
+from src.metrics.instrumentation import publish_task_metrics
+from src.storage.artifact_store import get_artifact_store
+
+logger = logging.getLogger(__name__)
+
+default_args = {
+    "owner": "airflow",
+    "depends_on_past": False,
+    "start_date": datetime(2024, 1, 1),
+    "email_on_failure": False,
+    "email_on_retry": False,
+    "retries": 3,
+    "retry_delay": timedelta(minutes=5),
+    "retry_exponential_backoff": True,
+    "max_retry_delay": timedelta(minutes=30),
+    "on_success_callback": publish_task_metrics,
+    "on_failure_callback": publish_task_metrics
+}
+
+
+def shard_run_id(run_id: str, tag: str) -> str:
+    return f"{run_id}__{tag}"
+
+
+def shard_cache(tag: str) -> PriceCache:
+    return PriceCache(os.path.join(ETLConfig.PRICE_CACHE_DIR, "backfill", tag))
+
+
+def plan_shards(**context):
+    params = context["params"]
+    start_date = params["start_date"]
+    end_date = params["end_date"] or datetime.utcnow().strftime("%Y-%m-%d")
+    tickers_per_shard = params["tickers_per_shard"]
+    days_per_shard = params["days_per_shard"]
+
+    company_data = pd.DataFrame(get_sp500_tickers())
+    tickers = company_data["symbol"].tolist()
+
+    run_id = context["run_id"]
+    store = get_artifact_store()
+    company_manifest = store.write(company_data, run_id, "company_data")
+
+    windows = []
+    window_start = pd.Timestamp(start_date)
+    while window_start < pd.Timestamp(end_date):
+        window_end = min(window_start + pd.Timedelta(days=days_per_shard), pd.Timestamp(end_date))
+        windows.append((window_start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        window_start = window_end
+
+    shards = []
+    for t, offset in enumerate(range(0, len(tickers), tickers_per_shard)):
+        for start, end in windows:
+            shards.append({"shard": {
+                # The tag names the shard in staged keys, so rerunning a backfill overwrites its own files
+                "tag": f"bf{start.replace('-', '')}t{t:03d}",
+                "tickers": tickers[offset:offset + tickers_per_shard],
+                "start_date": start,
+                "end_date": end,
+                "company_data": company_manifest
+            }})
+
+    logger.info(
+        f"Planned {len(shards)} shards: {len(tickers)} tickers x {len(windows)} windows "
+        f"from {start_date} to {end_date}"
+    )
+    return shards
+
+
+def extract_shard(shard: dict, **context):
+    run_id = shard_run_id(context["run_id"], shard["tag"])
+    logger.info(
+        f"Extracting shard {shard['tag']}: {len(shard['tickers'])} tickers, "
+        f"{shard['start_date']} to {shard['end_date']}"
+    )
+
+    checkpoint = ExtractionCheckpoint(run_id)
+    # Shards run in parallel, so each keeps its own cache root instead of racing on the shared
+    # parquet files and watermarks; the stable tag still lets a retried shard reuse its bars.
+    # assemble_staging merges the shard caches into the shared one
+    extractor = YahooFinanceExtractor(cache=shard_cache(shard["tag"]))
+    price_data = extractor.extract_daily_prices(
+        shard["tickers"], shard["start_date"], shard["end_date"], checkpoint=checkpoint
+    )
+
+    store = get_artifact_store()
+    company_data = store.read(shard["company_data"])
+    _, _, fact_prices, validations = StockDataTransformer().transform(company_data, price_data)
+
+    manifest = store.write(fact_prices, run_id, "fact_prices")
+    price_manifest = store.write(price_data, run_id, "price_data")
+    dead_letter = checkpoint.dead_letter
+    checkpoint.clear()
+
+    failed_checks = [v for v in validations if not v["passed"]]
+    if failed_checks:
+        logger.warning(f"Shard {shard['tag']}: {len(failed_checks)} validation checks failed")
+
+    return {"shard": {
+        "tag": shard["tag"], "fact_prices": manifest, "price_data": price_manifest, "dead_letter": dead_letter
+    }}
+
+
+def stage_shard(shard: dict, **context):
+    run_id = shard_run_id(context["run_id"], shard["tag"])
+    fact_prices = get_artifact_store().read(shard["fact_prices"])
+
+    # Shards publish to the catalog's current view together in assemble_staging
+    # A shard holds a few dozen tickers, so day partitions would write tiny files; stage by month instead
+    loader = S3Loader(
+        run_id=run_id, file_tag=shard["tag"], publish=False, granularity=ETLConfig.BACKFILL_PARTITION_GRANULARITY
+    )
+    paths = loader.upload_dataframe(fact_prices, "fact_daily_prices")
+
+    return {
+        "run_id": run_id,
+        "tag": shard["tag"],
+        "files": len(paths),
+        "rows": len(fact_prices),
+        "price_data": shard["price_data"],
+        "dead_letter": shard["dead_letter"]
+    }
+
+
+def assemble_staging(**context):
+    run_id = context["run_id"]
+    shards = list(context["ti"].xcom_pull(task_ids="stage_shard"))
+
+    store = get_artifact_store()
+    plan = context["ti"].xcom_pull(task_ids="plan_shards")
+    company_data = store.read(plan[0]["shard"]["company_data"])
+
+    transformer = StockDataTransformer()
+    dim_sector = transformer.create_dim_sector(company_data)
+    dim_company = transformer.create_dim_company(company_data, dim_sector)
+    changes = diff_dimensions({"dim_sector": dim_sector, "dim_company": dim_company}, run_id)
+
+    loader = S3Loader(run_id=run_id)
+    loader.upload_dataframe(changes["dim_sector"], "dim_sector")
+    loader.upload_dataframe(changes["dim_company"], "dim_company")
+
+    # One writer updates the current view, so parallel shards never race on it
+    for shard in shards:
+        loader.catalog.publish("fact_daily_prices", loader.catalog.get_run(shard["run_id"], "fact_daily_prices"))
+
+    # Each shard only validated its own bars; stream every shard through one validator so duplicate
+    # (symbol, date) keys across shard boundaries are caught while holding just their hashes
+    batches = (
+        batch for shard in shards
+        for batch in store.iter_batches(shard["price_data"], ETLConfig.VALIDATION_BATCH_ROWS)
+    )
+    _, validations = DataValidator().validate_price_batches(batches)
+    failed_checks = [v for v in validations if not v["passed"]]
+    if failed_checks:
+        logger.warning(f"{len(failed_checks)} validation checks failed across shards: {failed_checks}")
+
+    # Fold the shards' private caches into the shared one, so later daily runs and the indicator
+    # history read the backfilled bars
+    caches = [shard_cache(shard["tag"]) for shard in shards]
+    PriceCache().merge(caches)
+    for cache in caches:
+        shutil.rmtree(cache.root, ignore_errors=True)
+
+    dead_letter = sorted({ticker for shard in shards for ticker in shard["dead_letter"]})
+    if dead_letter:
+        logger.warning(f"Dead-lettered tickers across shards: {dead_letter}")
+
+    summary = {
+        "shards": len(shards),
+        "files": sum(s["files"] for s in shards),
+        "rows": sum(s["rows"] for s in shards),
+        "dead_letter": dead_letter,
+        "validations_passed": len(validations) - len(failed_checks)
+    }
+    logger.info(f"Assembled backfill staging: {summary}")
+    return summary
+
+
+def load_to_snowflake(**context):
+    logger.info(f"Starting backfill Snowflake load ({SnowflakeConfig.LOAD_MODE} mode)")
+
+    run_id = context["run_id"]
+    shards = list(context["ti"].xcom_pull(task_ids="stage_shard"))
+
+    catalog = S3Loader(run_id=run_id).catalog
+    staged_files = catalog.get_run(run_id, "dim_sector") + catalog.get_run(run_id, "dim_company")
+    for shard in shards:
+        staged_files.extend(catalog.get_run(shard["run_id"], "fact_daily_prices"))
+
+    loader = SnowflakeLoader(query_tag=f"{SnowflakeConfig.QUERY_TAG}:{run_id}", run_id=run_id)
+    loader.connect()
+
+    try:
+        result = loader.load_staged_files(staged_files)
+        catalog.mark_loaded(staged_files)
+        commit_dimensions(["dim_sector", "dim_company"], run_id)
+        return result
+    finally:
+        loader.disconnect(close_idle=True)
+
+
+def _fact_price_years(loader: SnowflakeLoader):
+    first, last = loader.execute_query("SELECT MIN(YEAR(date)), MAX(YEAR(date)) FROM fact_daily_prices")[0]
+    if first is None:
+        return
+    columns = ["company_id", "date", "open", "high", "low", "close", "volume"]
+    for year in range(first, last + 1):
+        rows = loader.execute_query(f"""
+            SELECT {", ".join(columns)}
+            FROM fact_daily_prices
+            WHERE date >= '{year}-01-01' AND date < '{year + 1}-01-01'
+        """)
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def _prior_bars(fact_prices: pd.DataFrame):
+    def fetch(company_ids, start_date, end_date) -> pd.DataFrame:
+        dates = pd.to_datetime(fact_prices["date"])
+        return fact_prices[
+            fact_prices["company_id"].isin(company_ids) & (dates >= start_date) & (dates < end_date)
+        ]
+    return fetch
+
+
+def compute_indicators(**context):
+    # Shards only stage prices, so indicators for the backfilled dates are computed from everything
+    # loaded into fact_daily_prices, a year at a time, each year seeded with the year before it
+    run_id = context["run_id"]
+    loader = SnowflakeLoader(query_tag=f"{SnowflakeConfig.QUERY_TAG}:{run_id}", run_id=run_id)
+    loader.connect()
+
+    try:
+        rows = loader.execute_query("SELECT company_id, symbol FROM dim_company")
+        dim_company = pd.DataFrame(rows, columns=["company_id", "symbol"])
+
+        s3_loader = S3Loader(run_id=run_id, granularity=ETLConfig.BACKFILL_PARTITION_GRANULARITY)
+        previous = None
+        for fact_prices in _fact_price_years(loader):
+            calculator = IndicatorCalculator(history_source=_prior_bars(previous) if previous is not None else None)
+            indicators = calculator.compute(fact_prices, dim_company)
+            s3_loader.upload_dataframe(indicators, "fact_daily_indicators")
+            previous = fact_prices
+
+        if not s3_loader.staged_files:
+            return {}
+        result = loader.load_staged_files(s3_loader.staged_files)
+        s3_loader.catalog.mark_loaded(s3_loader.staged_files)
+        return result
+    finally:
+        loader.disconnect(close_idle=True)
+
+
+def seed_rollups(**context):
+    # fold() skips dates older than each company's watermark, so backfilled history only reaches the
+    # rollups by rebuilding the state from everything loaded into fact_daily_prices
+    run_id = context["run_id"]
+    loader = SnowflakeLoader(query_tag=f"{SnowflakeConfig.QUERY_TAG}:{run_id}", run_id=run_id)
+    loader.connect()
+
+    try:
+        rows = loader.execute_query("SELECT company_id, sector_id FROM dim_company WHERE is_active")
+        dim_company = pd.DataFrame(rows, columns=["company_id", "sector_id"])
+
+        rollups = RollupBuilder()
+        aggregates = rollups.seed(_fact_price_years(loader), dim_company, run_id)
+
+        s3_loader = S3Loader(run_id=run_id)
+        for table_name, df in aggregates.items():
+            s3_loader.upload_dataframe(df, table_name)
+        result = loader.load_staged_files(s3_loader.staged_files)
+        rollups.commit(run_id)
+        return result
+    finally:
+        loader.disconnect(close_idle=True)
+
+
+def cleanup_artifacts(**context):
+    # Company data lives under the backfill run and each shard's prices under its own run id
+    run_id = context["run_id"]
+    shards = list(context["ti"].xcom_pull(task_ids="stage_shard"))
+
+    store = get_artifact_store()
+    removed = {
+        "run": store.delete_run(run_id) + sum(store.delete_run(shard["run_id"]) for shard in shards),
+        "expired": store.expire(ETLConfig.ARTIFACT_TTL),
+        "pending": expire_pending_dimensions(["dim_sector", "dim_company"], ETLConfig.ARTIFACT_TTL)
+        + RollupBuilder().expire_pending(ETLConfig.ARTIFACT_TTL)
+    }
+    logger.info(f"Cleaned up artifacts: {removed}")
+
+    return removed
+
+
+def compact_staging(**context):
+    compactor = StagingCompactor(S3Loader(run_id=context["run_id"]))
+    compacted = compactor.compact_all()
+    logger.info(f"Compacted staging files: {compacted}")
+
+    return compacted
+
+
+with DAG(
+    dag_id="stock_market_backfill",
+    default_args=default_args,
+    description="Sharded S&P 500 history backfill",
+    schedule_interval=None,
+    catchup=False,
+    max_active_runs=1,
+    params={
+        "start_date": ETLConfig.BACKFILL_START_DATE,
+        "end_date": None,
+        "tickers_per_shard": ETLConfig.BACKFILL_TICKERS_PER_SHARD,
+        "days_per_shard": ETLConfig.BACKFILL_DAYS_PER_SHARD
+    },
+    tags=["etl", "stocks", "backfill", "s3", "snowflake"]
+) as dag:
+
+    plan_task = PythonOperator(
+        task_id="plan_shards",
+        python_callable=plan_shards,
+        provide_context=True
+    )
+
+    # Mapped tasks share the backfill pool, which caps concurrent shards (and Yahoo request rate)
+    extract_task = PythonOperator.partial(
+        task_id="extract_shard",
+        python_callable=extract_shard,
+        pool=ETLConfig.BACKFILL_POOL
+    ).expand(op_kwargs=plan_task.output)
+
+    stage_task = PythonOperator.partial(
+        task_id="stage_shard",
+        python_callable=stage_shard,
+        pool=ETLConfig.BACKFILL_POOL
+    ).expand(op_kwargs=extract_task.output)
+
+    assemble_task = PythonOperator(
+        task_id="assemble_staging",
+        python_callable=assemble_staging,
+        provide_context=True
+    )
+
+    snowflake_task = PythonOperator(
+        task_id="load_snowflake",
+        python_callable=load_to_snowflake,
+        provide_context=True
+    )
+
+    indicator_task = PythonOperator(
+        task_id="compute_indicators",
+        python_callable=compute_indicators,
+        provide_context=True
+    )
+
+    rollup_task = PythonOperator(
+        task_id="seed_rollups",
+        python_callable=seed_rollups,
+        provide_context=True
+    )
+
+    compact_task = PythonOperator(
+        task_id="compact_staging",
+        python_callable=compact_staging,
+        provide_context=True
+    )
+
+    cleanup_task = PythonOperator(
+        task_id="cleanup_artifacts",
+        python_callable=cleanup_artifacts,
+        provide_context=True
+    )
+
+    plan_task >> extract_task >> stage_task >> assemble_task >> snowflake_task >> indicator_task >> rollup_task
+    rollup_task >> compact_task
+    snowflake_task >> cleanup_task
@@ -1,15 +1,24 @@
-import json
 import logging
 from datetime import datetime, timedelta
 
+import pandas as pd
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 
+from config.config import ETLConfig, SnowflakeConfig
+from src.ingestion.checkpoint import ExtractionCheckpoint
 from src.ingestion.sp500_tickers import get_sp500_tickers
+from src.ingestion.universe_cache import UniverseCache
 from src.ingestion.yahoo_finance import YahooFinanceExtractor
+from src.transformation.dimension_cdc import commit_dimensions, diff_dimensions, expire_pending_dimensions
+from src.transformation.indicators import IndicatorCalculator
+from src.transformation.rollups import RollupBuilder
 from src.transformation.transformers import StockDataTransformer
+from src.loading.compaction import StagingCompactor
 from src.loading.s3_loader import S3Loader
 from src.loading.snowflake_loader import SnowflakeLoader
+from src.metrics.instrumentation import publish_task_metrics
+from src.storage.artifact_store import get_artifact_store
 
 logger = logging.getLogger(__name__)
 
@@ -22,42 +31,92 @@ default_args = {
     "retries": 3,
     "retry_delay": timedelta(minutes=5),
     "retry_exponential_backoff": True,
-    "max_retry_delay": timedelta(minutes=30)
+    "max_retry_delay": timedelta(minutes=30),
+    "on_success_callback": publish_task_metrics,
+    "on_failure_callback": publish_task_metrics
 }
 
 
 def extract_data(**context):
     logger.info("Starting data extraction")
 
-    company_data = get_sp500_tickers()
+    universe = UniverseCache()
+    company_data = get_sp500_tickers(universe)
     logger.info(f"Fetched {len(company_data)} S&P 500 companies")
 
     tickers = [c["symbol"] for c in company_data]
 
+    run_id = context["run_id"]
+    checkpoint = ExtractionCheckpoint(run_id)
+
     extractor = YahooFinanceExtractor()
-    price_data = extractor.extract_for_date_range(tickers, days_back=1)
+    price_data = extractor.extract_for_date_range(tickers, days_back=1, checkpoint=checkpoint)
     logger.info(f"Extracted {len(price_data)} price records")
 
-    context["ti"].xcom_push(key="company_data", value=company_data)
-    context["ti"].xcom_push(key="price_data", value=price_data)
+    if checkpoint.dead_letter:
+        logger.warning(f"Dead-lettered tickers: {checkpoint.dead_letter}")
+
+    store = get_artifact_store()
+    context["ti"].xcom_push(key="company_data", value=store.write(pd.DataFrame(company_data), run_id, "company_data"))
+    context["ti"].xcom_push(key="price_data", value=store.write(price_data, run_id, "price_data"))
+    context["ti"].xcom_push(key="dead_letter", value=checkpoint.dead_letter)
+    context["ti"].xcom_push(key="universe_diff", value=universe.diff)
+    checkpoint.clear()
+
+    return {"companies": len(company_data), "prices": len(price_data), "dead_letter": checkpoint.dead_letter}
+
 
-    return {"companies": len(company_data), "prices": len(price_data)}
+def _fact_price_history(loader: SnowflakeLoader):
+    columns = ["company_id", "date", "high", "low", "close", "volume"]
+
+    def fetch(company_ids, start_date, end_date) -> pd.DataFrame:
+        # Connects on first use, so runs whose cache covers every symbol never open a session
+        if loader.conn is None:
+            loader.connect()
+        rows = loader.execute_query(f"""
+            SELECT {", ".join(columns)}
+            FROM fact_daily_prices
+            WHERE company_id IN ({", ".join(str(c) for c in company_ids)})
+              AND date >= '{start_date}' AND date < '{end_date}'
+        """)
+        return pd.DataFrame(rows, columns=columns)
+
+    return fetch
 
 
 def transform_data(**context):
     logger.info("Starting data transformation")
 
-    company_data = context["ti"].xcom_pull(key="company_data", task_ids="extract")
-    price_data = context["ti"].xcom_pull(key="price_data", task_ids="extract")
+    store = get_artifact_store()
+    company_data = store.read(context["ti"].xcom_pull(key="company_data", task_ids="extract"))
+    price_data = store.read(context["ti"].xcom_pull(key="price_data", task_ids="extract"))
 
     transformer = StockDataTransformer()
     dim_sector, dim_company, fact_prices, validations = transformer.transform(
         company_data, price_data
     )
 
-    context["ti"].xcom_push(key="dim_sector", value=dim_sector.to_dict("records"))
-    context["ti"].xcom_push(key="dim_company", value=dim_company.to_dict("records"))
-    context["ti"].xcom_push(key="fact_prices", value=fact_prices.to_dict("records"))
+    # Trailing history comes from the worker's price cache, and from fact_daily_prices when that is short
+    history_loader = SnowflakeLoader(
+        query_tag=f"{SnowflakeConfig.QUERY_TAG}:{context['run_id']}", run_id=context["run_id"]
+    )
+    try:
+        fact_indicators = IndicatorCalculator(history_source=_fact_price_history(history_loader)).compute(
+            fact_prices, dim_company
+        )
+    finally:
+        history_loader.disconnect(close_idle=True)
+
+    # Only inserted, updated and soft-deleted dimension rows move on to staging
+    run_id = context["run_id"]
+    aggregates = RollupBuilder().fold(fact_prices, dim_company, run_id)
+    changes = diff_dimensions({"dim_sector": dim_sector, "dim_company": dim_company}, run_id)
+    context["ti"].xcom_push(key="dim_sector", value=store.write(changes["dim_sector"], run_id, "dim_sector"))
+    context["ti"].xcom_push(key="dim_company", value=store.write(changes["dim_company"], run_id, "dim_company"))
+    context["ti"].xcom_push(key="fact_prices", value=store.write(fact_prices, run_id, "fact_prices"))
+    context["ti"].xcom_push(key="fact_indicators", value=store.write(fact_indicators, run_id, "fact_indicators"))
+    for table_name, df in aggregates.items():
+        context["ti"].xcom_push(key=table_name, value=store.write(df, run_id, table_name))
     context["ti"].xcom_push(key="validations", value=validations)
 
     failed_checks = [v for v in validations if not v["passed"]]
@@ -65,9 +124,11 @@ def transform_data(**context):
         logger.warning(f"{len(failed_checks)} validation checks failed")
 
     return {
-        "dim_sector": len(dim_sector),
-        "dim_company": len(dim_company),
+        "dim_sector": len(changes["dim_sector"]),
+        "dim_company": len(changes["dim_company"]),
         "fact_prices": len(fact_prices),
+        "fact_indicators": len(fact_indicators),
+        **{table_name: len(df) for table_name, df in aggregates.items()},
         "validations_passed": len(validations) - len(failed_checks)
     }
 
@@ -75,46 +136,68 @@ def transform_data(**context):
 def load_to_s3(**context):
     logger.info("Starting S3 load")
 
-    import pandas as pd
-
-    dim_sector = pd.DataFrame(context["ti"].xcom_pull(key="dim_sector", task_ids="transform"))
-    dim_company = pd.DataFrame(context["ti"].xcom_pull(key="dim_company", task_ids="transform"))
-    fact_prices = pd.DataFrame(context["ti"].xcom_pull(key="fact_prices", task_ids="transform"))
+    store = get_artifact_store()
+    dim_sector = store.read(context["ti"].xcom_pull(key="dim_sector", task_ids="transform"))
+    dim_company = store.read(context["ti"].xcom_pull(key="dim_company", task_ids="transform"))
+    fact_prices = store.read(context["ti"].xcom_pull(key="fact_prices", task_ids="transform"))
+    fact_indicators = store.read(context["ti"].xcom_pull(key="fact_indicators", task_ids="transform"))
+    aggregates = {
+        table_name: store.read(context["ti"].xcom_pull(key=table_name, task_ids="transform"))
+        for table_name in ("agg_company_ohlcv", "agg_sector_ohlcv")
+    }
 
-    loader = S3Loader()
-    paths = loader.upload_all_tables(dim_sector, dim_company, fact_prices)
+    loader = S3Loader(run_id=context["run_id"])
+    paths = loader.upload_all_tables(dim_sector, dim_company, fact_prices, fact_indicators, aggregates)
 
     context["ti"].xcom_push(key="s3_paths", value=paths)
+    context["ti"].xcom_push(key="staged_files", value=loader.staged_files)
     logger.info(f"Loaded {len(paths)} tables to S3")
 
     return {"s3_paths": paths}
 
 
-def notify_snowpipe(**context):
-    logger.info("Starting Snowpipe notification")
+def load_to_snowflake(**context):
+    logger.info(f"Starting Snowflake load ({SnowflakeConfig.LOAD_MODE} mode)")
 
-    s3_paths = context["ti"].xcom_pull(key="s3_paths", task_ids="load_s3")
+    staged_files = context["ti"].xcom_pull(key="staged_files", task_ids="load_s3")
 
-    loader = SnowflakeLoader()
+    loader = SnowflakeLoader(
+        query_tag=f"{SnowflakeConfig.QUERY_TAG}:{context['run_id']}", run_id=context["run_id"]
+    )
     loader.connect()
 
     try:
-        pipes = {
-            "dim_sector": "STOCK_MARKET.PUBLIC.DIM_SECTOR_PIPE",
-            "dim_company": "STOCK_MARKET.PUBLIC.DIM_COMPANY_PIPE",
-            "fact_daily_prices": "STOCK_MARKET.PUBLIC.FACT_DAILY_PRICES_PIPE"
-        }
-
-        for table_name, pipe_name in pipes.items():
-            matching_path = next((p for p in s3_paths if table_name in p), None)
-            if matching_path:
-                loader.refresh_snowpipe(pipe_name, matching_path)
-                status = loader.check_pipe_status(pipe_name)
-                logger.info(f"Pipe {pipe_name} status: {status}")
+        result = loader.load_staged_files(staged_files)
+        S3Loader(run_id=context["run_id"]).catalog.mark_loaded(staged_files)
+        commit_dimensions(["dim_sector", "dim_company"], context["run_id"])
+        RollupBuilder().commit(context["run_id"])
+        return result
     finally:
-        loader.disconnect()
+        loader.disconnect(close_idle=True)
 
-    return {"pipes_refreshed": list(pipes.keys())}
+
+def cleanup_artifacts(**context):
+    # Runs only after load_snowflake commits, so nothing downstream still needs this run's artifacts
+    store = get_artifact_store()
+    removed = {
+        "run": store.delete_run(context["run_id"]),
+        "expired": store.expire(ETLConfig.ARTIFACT_TTL),
+        "pending": expire_pending_dimensions(["dim_sector", "dim_company"], ETLConfig.ARTIFACT_TTL)
+        + RollupBuilder().expire_pending(ETLConfig.ARTIFACT_TTL)
+    }
+    logger.info(f"Cleaned up artifacts: {removed}")
+
+    return removed
+
+
+def compact_staging(**context):
+    logger.info("Starting staging compaction")
+
+    compactor = StagingCompactor(S3Loader(run_id=context["run_id"]))
+    compacted = compactor.compact_all()
+    logger.info(f"Compacted staging files: {compacted}")
+
+    return compacted
 
 
 with DAG(
@@ -123,6 +206,9 @@ with DAG(
     description="Daily S&P 500 stock data ETL pipeline",
     schedule_interval="0 18 * * 1-5",
     catchup=False,
+    # Rollup state is folded in transform and committed after the load; overlapping runs would fold
+    # from the same base and the later commit would drop the earlier run's days
+    max_active_runs=1,
     tags=["etl", "stocks", "s3", "snowflake"]
 ) as dag:
 
@@ -144,10 +230,22 @@ with DAG(
         provide_context=True
     )
 
-    snowpipe_task = PythonOperator(
-        task_id="notify_snowpipe",
-        python_callable=notify_snowpipe,
+    snowflake_task = PythonOperator(
+        task_id="load_snowflake",
+        python_callable=load_to_snowflake,
+        provide_context=True
+    )
+
+    compact_task = PythonOperator(
+        task_id="compact_staging",
+        python_callable=compact_staging,
+        provide_context=True
+    )
+
+    cleanup_task = PythonOperator(
+        task_id="cleanup_artifacts",
+        python_callable=cleanup_artifacts,
         provide_context=True
     )
 
-    extract_task >> transform_task >> load_s3_task >> snowpipe_task
+    extract_task >> transform_task >> load_s3_task >> snowflake_task >> [compact_task, cleanup_task]
@@ -0,0 +1,114 @@
+import logging
+from datetime import timedelta
+
+import pandas as pd
+import pendulum
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+
+from config.config import ETLConfig, SnowflakeConfig
+from src.ingestion.sp500_tickers import get_sp500_tickers
+from src.ingestion.universe_cache import UniverseCache
+from src.ingestion.yahoo_finance import YahooFinanceExtractor
+from src.transformation.transformers import StockDataTransformer
+from src.loading.s3_loader import S3Loader
+from src.loading.snowflake_loader import SnowflakeLoader
+from src.metrics.instrumentation import publish_task_metrics
+
+logger = logging.getLogger(__name__)
+
+default_args = {
+    "owner": "airflow",
+    "depends_on_past": False,
+    # Cron fields are evaluated in exchange time, so the session hours hold across EST and EDT
+    "start_date": pendulum.datetime(2024, 1, 1, tz="America/New_York"),
+    "email_on_failure": False,
+    "email_on_retry": False,
+    "retries": 2,
+    "retry_delay": timedelta(minutes=1),
+    "on_success_callback": publish_task_metrics,
+    "on_failure_callback": publish_task_metrics
+}
+
+
+def _utc(timestamp) -> pd.Timestamp:
+    return pd.Timestamp(timestamp).tz_convert("UTC").tz_localize(None)
+
+
+def stream_bars(**context):
+    # Lag the window by one bar, so the newest bar fetched has closed and settled at the source
+    lag = pd.Timedelta(ETLConfig.INTRADAY_INTERVAL)
+    start, end = _utc(context["data_interval_start"]) - lag, _utc(context["data_interval_end"]) - lag
+    logger.info(f"Streaming {ETLConfig.INTRADAY_INTERVAL} bars from {start} to {end} UTC")
+
+    company_data = get_sp500_tickers(UniverseCache())
+    tickers = [c["symbol"] for c in company_data]
+
+    # Surrogate keys are hashes of the natural keys, so they match the daily DAG's dimensions
+    transformer = StockDataTransformer()
+    dim_sector = transformer.create_dim_sector(company_data)
+    dim_company = transformer.create_dim_company(company_data, dim_sector)
+
+    # Extract, transform and stage are chained generators: one micro-batch is in flight at a time
+    batches = YahooFinanceExtractor().iter_intraday_batches(tickers, start, end)
+    fact_batches = transformer.transform_intraday_batches(batches, dim_company)
+    loader = S3Loader(run_id=context["run_id"], publish=False)
+    staged = list(loader.stream_batches(fact_batches, "fact_intraday_prices", start.strftime("w%Y%m%d%H%M")))
+
+    summary = {
+        "batches": [s["run_id"] for s in staged],
+        "files": sum(s["files"] for s in staged),
+        "rows": sum(s["rows"] for s in staged)
+    }
+    logger.info(f"Staged {summary['rows']} intraday bars in {summary['files']} files")
+    return summary
+
+
+def load_to_snowflake(**context):
+    logger.info(f"Starting intraday Snowflake load ({SnowflakeConfig.LOAD_MODE} mode)")
+
+    summary = context["ti"].xcom_pull(task_ids="stream_bars")
+    catalog = S3Loader(run_id=context["run_id"]).catalog
+    staged_files = [
+        entry for run_id in summary["batches"] for entry in catalog.get_run(run_id, "fact_intraday_prices")
+    ]
+    if not staged_files:
+        logger.info("No intraday bars staged in this window")
+        return {}
+
+    loader = SnowflakeLoader(
+        query_tag=f"{SnowflakeConfig.QUERY_TAG}:{context['run_id']}", run_id=context["run_id"]
+    )
+    loader.connect()
+
+    try:
+        return loader.load_staged_files(staged_files)
+    finally:
+        loader.disconnect(close_idle=True)
+
+
+with DAG(
+    dag_id="stock_market_intraday",
+    default_args=default_args,
+    description="Intraday S&P 500 bars streamed to S3 in micro-batches",
+    # Each run covers the previous 15 minutes, lagged by one bar; 9:00-17:00 New York time spans the
+    # 9:30-16:00 regular session plus the lag
+    schedule_interval="*/15 9-16 * * 1-5",
+    catchup=False,
+    max_active_runs=1,
+    tags=["etl", "stocks", "intraday", "s3", "snowflake"]
+) as dag:
+
+    stream_task = PythonOperator(
+        task_id="stream_bars",
+        python_callable=stream_bars,
+        provide_context=True
+    )
+
+    snowflake_task = PythonOperator(
+        task_id="load_snowflake",
+        python_callable=load_to_snowflake,
+        provide_context=True
+    )
+
+    stream_task >> snowflake_task
@@ -0,0 +1,105 @@
+-- One-off: move tables loaded with the old range() surrogate keys onto the hashed keys.
+-- Render with `python -m src.loading.key_remap`, which fills in the hashed ids for every
+-- sector and symbol in the dimension tables. Pause the pipes and the DAGs while it runs.
+USE DATABASE STOCK_MARKET;
+USE SCHEMA PUBLIC;
+
+ALTER TABLE dim_sector ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+ALTER TABLE dim_company ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+
+CREATE OR REPLACE TEMPORARY TABLE sector_keys (sector VARCHAR, new_id INTEGER);
+INSERT INTO sector_keys VALUES {sector_keys};
+
+CREATE OR REPLACE TEMPORARY TABLE company_keys (symbol VARCHAR, new_id INTEGER);
+INSERT INTO company_keys VALUES {company_keys};
+
+-- Old ids were reassigned on every run, so the same old id named different symbols over time. Each
+-- row maps through the dimension row its own run loaded: the latest one carrying its old id that was
+-- written at or before it (a run stamped dim_sector, then dim_company, then loaded its prices)
+CREATE OR REPLACE TEMPORARY TABLE sector_versions AS
+SELECT d.sector_id AS old_id, k.new_id, d.created_at AS valid_from
+FROM dim_sector d
+JOIN sector_keys k ON d.sector = k.sector;
+
+CREATE OR REPLACE TEMPORARY TABLE company_versions AS
+SELECT d.company_id AS old_id, k.new_id, COALESCE(d.updated_at, d.created_at) AS valid_from
+FROM dim_company d
+JOIN company_keys k ON d.symbol = k.symbol;
+
+CREATE OR REPLACE TEMPORARY TABLE remapped_prices AS
+SELECT
+    v.new_id AS company_id, f.company_id AS old_company_id,
+    f.date, f.open, f.high, f.low, f.close, f.volume, f.extracted_at, f.loaded_at
+FROM fact_daily_prices f
+ASOF JOIN company_versions v
+    MATCH_CONDITION (f.loaded_at >= v.valid_from)
+    ON f.company_id = v.old_id;
+
+CREATE OR REPLACE TEMPORARY TABLE remapped_companies AS
+SELECT
+    k.new_id AS company_id,
+    d.symbol, d.company_name, s.new_id AS sector_id, d.sector_id AS old_sector_id, d.sub_industry,
+    d.headquarters, d.date_added, d.cik, d.created_at, d.updated_at, COALESCE(d.is_active, TRUE) AS is_active
+FROM dim_company d
+ASOF JOIN sector_versions s
+    MATCH_CONDITION (d.created_at >= s.valid_from)
+    ON d.sector_id = s.old_id
+JOIN company_keys k ON d.symbol = k.symbol
+QUALIFY ROW_NUMBER() OVER (PARTITION BY d.symbol ORDER BY d.updated_at DESC) = 1;
+
+-- Rows with no dimension row at or before them cannot be remapped, and INSERT OVERWRITE would drop
+-- them. Report them, and stop before anything is rewritten if there are any
+SELECT
+    (SELECT COUNT(*) FROM remapped_prices WHERE company_id IS NULL) AS unmapped_prices,
+    (SELECT COUNT(*) FROM remapped_companies WHERE sector_id IS NULL AND old_sector_id IS NOT NULL)
+        AS unmapped_companies;
+
+EXECUTE IMMEDIATE $$
+DECLARE
+    unmapped INTEGER;
+    unmapped_rows EXCEPTION (-20001, 'Unmapped rows; see remapped_prices and remapped_companies');
+BEGIN
+    SELECT (SELECT COUNT(*) FROM remapped_prices WHERE company_id IS NULL)
+        + (SELECT COUNT(*) FROM remapped_companies WHERE sector_id IS NULL AND old_sector_id IS NOT NULL)
+    INTO :unmapped;
+    IF (unmapped > 0) THEN
+        RAISE unmapped_rows;
+    END IF;
+    RETURN 'All rows remapped';
+END;
+$$;
+
+BEGIN;
+
+-- price_id packs company_id with the day number (PRICE_ID_DAY_BITS = 20); one row per (company_id, date)
+INSERT OVERWRITE INTO fact_daily_prices
+SELECT
+    company_id * 1048576 + DATEDIFF(day, '1970-01-01'::DATE, date) AS price_id,
+    company_id, date, open, high, low, close, volume, extracted_at, loaded_at
+FROM remapped_prices
+QUALIFY ROW_NUMBER() OVER (PARTITION BY company_id, date ORDER BY extracted_at DESC) = 1;
+
+INSERT OVERWRITE INTO dim_company
+SELECT
+    company_id, symbol, company_name, sector_id, sub_industry, headquarters,
+    date_added, cik, created_at, updated_at, is_active
+FROM remapped_companies;
+
+INSERT OVERWRITE INTO dim_sector
+SELECT k.new_id AS sector_id, d.sector, d.created_at, COALESCE(d.is_active, TRUE)
+FROM dim_sector d
+JOIN sector_keys k ON d.sector = k.sector
+QUALIFY ROW_NUMBER() OVER (PARTITION BY d.sector ORDER BY d.created_at DESC) = 1;
+
+COMMIT;
+
+-- Sanity checks: both should return 0
+SELECT COUNT(*) AS orphaned_prices
+FROM fact_daily_prices f
+LEFT JOIN dim_company d ON f.company_id = d.company_id
+WHERE d.company_id IS NULL;
+
+SELECT COUNT(*) AS orphaned_companies
+FROM dim_company c
+LEFT JOIN dim_sector s ON c.sector_id = s.sector_id
+WHERE s.sector_id IS NULL;
@@ -7,7 +7,8 @@ CREATE SCHEMA IF NOT EXISTS PUBLIC;
 CREATE OR REPLACE TABLE dim_sector (
     sector_id INTEGER PRIMARY KEY,
     sector VARCHAR(100) NOT NULL,
-    created_at TIMESTAMP_NTZ
+    created_at TIMESTAMP_NTZ,
+    is_active BOOLEAN DEFAULT TRUE
 );
 
 -- Dimension: Company
@@ -21,7 +22,8 @@ CREATE OR REPLACE TABLE dim_company (
     date_added DATE,
     cik VARCHAR(20),
     created_at TIMESTAMP_NTZ,
-    updated_at TIMESTAMP_NTZ
+    updated_at TIMESTAMP_NTZ,
+    is_active BOOLEAN DEFAULT TRUE
 );
 
 -- Fact: Daily Prices
@@ -36,9 +38,75 @@ CREATE OR REPLACE TABLE fact_daily_prices (
     volume BIGINT,
     extracted_at TIMESTAMP_NTZ,
     loaded_at TIMESTAMP_NTZ
+)
+CLUSTER BY (date);
+
+-- Fact: Daily Indicators (derived from fact_daily_prices by the transform stage)
+CREATE OR REPLACE TABLE fact_daily_indicators (
+    company_id INTEGER REFERENCES dim_company(company_id),
+    date DATE NOT NULL,
+    close DECIMAL(18,4),
+    return_1d FLOAT,
+    log_return_1d FLOAT,
+    sma_20 FLOAT,
+    sma_50 FLOAT,
+    sma_200 FLOAT,
+    volatility_20 FLOAT,
+    vwap_20 FLOAT,
+    computed_at TIMESTAMP_NTZ,
+    PRIMARY KEY (company_id, date)
+)
+CLUSTER BY (date);
+
+-- Fact: Intraday Prices (INTRADAY_INTERVAL bars, streamed in micro-batches by stock_market_intraday)
+CREATE OR REPLACE TABLE fact_intraday_prices (
+    company_id INTEGER REFERENCES dim_company(company_id),
+    bar_time TIMESTAMP_NTZ NOT NULL,
+    date DATE NOT NULL,
+    open DECIMAL(18,4),
+    high DECIMAL(18,4),
+    low DECIMAL(18,4),
+    close DECIMAL(18,4),
+    volume BIGINT,
+    extracted_at TIMESTAMP_NTZ,
+    loaded_at TIMESTAMP_NTZ,
+    PRIMARY KEY (company_id, bar_time)
+)
+CLUSTER BY (date);
+
+-- Aggregates: weekly/monthly OHLCV rollups, restated per period and always loaded by MERGE
+CREATE OR REPLACE TABLE agg_company_ohlcv (
+    company_id INTEGER REFERENCES dim_company(company_id),
+    period_type VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    first_date DATE,
+    last_date DATE,
+    open DECIMAL(18,4),
+    high DECIMAL(18,4),
+    low DECIMAL(18,4),
+    close DECIMAL(18,4),
+    volume BIGINT,
+    turnover FLOAT,
+    vwap FLOAT,
+    trading_days INTEGER,
+    updated_at TIMESTAMP_NTZ,
+    PRIMARY KEY (company_id, period_type, period_start)
+);
+
+CREATE OR REPLACE TABLE agg_sector_ohlcv (
+    sector_id INTEGER REFERENCES dim_sector(sector_id),
+    period_type VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    companies INTEGER,
+    volume BIGINT,
+    turnover FLOAT,
+    vwap FLOAT,
+    vw_return FLOAT,
+    updated_at TIMESTAMP_NTZ,
+    PRIMARY KEY (sector_id, period_type, period_start)
 );
 
 CREATE OR REPLACE STAGE stock_etl_stage
     STORAGE_INTEGRATION = s3_stock_etl_integration
     URL = 's3://stock-market-etl-bucket/staging/'
-    FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'SNAPPY');
+    FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'AUTO');
@@ -1,50 +1,45 @@
 USE DATABASE STOCK_MARKET;
 USE SCHEMA PUBLIC;
 
--- Snowpipe for dim_sector
-CREATE OR REPLACE PIPE dim_sector_pipe
-    AUTO_INGEST = TRUE
-AS
-COPY INTO dim_sector
-FROM (
-    SELECT
-        $1:sector_id::INTEGER,
-        $1:sector::VARCHAR,
-        $1:created_at::TIMESTAMP_NTZ
-    FROM @stock_etl_stage/dim_sector/
-)
-FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'SNAPPY');
+-- Dimensions are staged as change sets (updates and soft deletes) and always loaded by MERGE,
+-- so they have no pipe; appending them would duplicate the changed rows.
+DROP PIPE IF EXISTS dim_sector_pipe;
+DROP PIPE IF EXISTS dim_company_pipe;
+
+-- Indicators are recomputed when late history arrives (a backfill restates every date), so they are
+-- always loaded by MERGE as well.
+DROP PIPE IF EXISTS fact_daily_indicators_pipe;
 
--- Snowpipe for dim_company
-CREATE OR REPLACE PIPE dim_company_pipe
+-- Snowpipe for fact_daily_prices
+CREATE OR REPLACE PIPE fact_daily_prices_pipe
     AUTO_INGEST = TRUE
 AS
-COPY INTO dim_company
+COPY INTO fact_daily_prices
 FROM (
     SELECT
+        $1:price_id::INTEGER,
         $1:company_id::INTEGER,
-        $1:symbol::VARCHAR,
-        $1:company_name::VARCHAR,
-        $1:sector_id::INTEGER,
-        $1:sub_industry::VARCHAR,
-        $1:headquarters::VARCHAR,
-        $1:date_added::DATE,
-        $1:cik::VARCHAR,
-        $1:created_at::TIMESTAMP_NTZ,
-        $1:updated_at::TIMESTAMP_NTZ
-    FROM @stock_etl_stage/dim_company/
+        $1:date::DATE,
+        $1:open::DECIMAL(18,4),
+        $1:high::DECIMAL(18,4),
+        $1:low::DECIMAL(18,4),
+        $1:close::DECIMAL(18,4),
+        $1:volume::BIGINT,
+        $1:extracted_at::TIMESTAMP_NTZ,
+        $1:loaded_at::TIMESTAMP_NTZ
+    FROM @stock_etl_stage/fact_daily_prices/
 )
-FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'SNAPPY');
+FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'AUTO');
 
--- Snowpipe for fact_daily_prices
-CREATE OR REPLACE PIPE fact_daily_prices_pipe
+-- Snowpipe for fact_intraday_prices (files land continuously in time-bucketed prefixes)
+CREATE OR REPLACE PIPE fact_intraday_prices_pipe
     AUTO_INGEST = TRUE
 AS
-COPY INTO fact_daily_prices
+COPY INTO fact_intraday_prices
 FROM (
     SELECT
-        $1:price_id::INTEGER,
         $1:company_id::INTEGER,
+        $1:bar_time::TIMESTAMP_NTZ,
         $1:date::DATE,
         $1:open::DECIMAL(18,4),
         $1:high::DECIMAL(18,4),
@@ -53,12 +48,17 @@ FROM (
         $1:volume::BIGINT,
         $1:extracted_at::TIMESTAMP_NTZ,
         $1:loaded_at::TIMESTAMP_NTZ
-    FROM @stock_etl_stage/fact_daily_prices/
+    FROM @stock_etl_stage/fact_intraday_prices/
 )
-FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'SNAPPY');
+FILE_FORMAT = (TYPE = 'PARQUET', COMPRESSION = 'AUTO');
 
 -- Get notification channel ARN for S3 event setup
 SHOW PIPES;
-SELECT SYSTEM$PIPE_STATUS('dim_sector_pipe');
-SELECT SYSTEM$PIPE_STATUS('dim_company_pipe');
 SELECT SYSTEM$PIPE_STATUS('fact_daily_prices_pipe');
+SELECT SYSTEM$PIPE_STATUS('fact_intraday_prices_pipe');
+
+-- With SNOWFLAKE_LOAD_MODE=copy or merge the DAG loads each run's files itself.
+-- merge copies them into a transient <table>_staging_<run id> table and MERGEs on the natural keys.
+-- Pause the pipes so auto-ingest does not load the same files a second time.
+-- ALTER PIPE fact_daily_prices_pipe SET PIPE_EXECUTION_PAUSED = TRUE;
+-- ALTER PIPE fact_intraday_prices_pipe SET PIPE_EXECUTION_PAUSED = TRUE;
@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import shutil
+import logging
+from typing import Dict, List
+
+import pandas as pd
+
+from config.config import ETLConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCheckpoint:
+    def __init__(self, run_key: str, root: str = None):
+        root = root or ETLConfig.CHECKPOINT_DIR
+        self.path = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", run_key))
+        self.state_path = os.path.join(self.path, "state.json")
+        self.dead_letter_after = ETLConfig.DEAD_LETTER_AFTER
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return {"completed": [], "failures": {}, "dead_letter": [], "chunks": []}
+        with open(self.state_path) as f:
+            state = json.load(f)
+        logger.info(
+            f"Resuming extraction from checkpoint: {len(state['completed'])} tickers done, "
+            f"{len(state['dead_letter'])} dead-lettered"
+        )
+        return state
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def dead_letter(self) -> List[str]:
+        return list(self.state["dead_letter"])
+
+    def pending(self, tickers: List[str]) -> List[str]:
+        done = set(self.state["completed"]) | set(self.state["dead_letter"])
+        return [t for t in tickers if t not in done]
+
+    def load_chunks(self) -> List[pd.DataFrame]:
+        frames = []
+        for name in self.state["chunks"]:
+            df = pd.read_parquet(os.path.join(self.path, name))
+            df["date"] = df["date"].astype("datetime64[ns]")
+            frames.append(df)
+        return frames
+
+    def save_chunk(self, frame: pd.DataFrame, completed: List[str], failed: List[str]) -> List[str]:
+        os.makedirs(self.path, exist_ok=True)
+
+        if len(frame):
+            name = f"chunk_{len(self.state['chunks']):05d}.parquet"
+            tmp_path = os.path.join(self.path, f"{name}.tmp")
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(self.path, name))
+            self.state["chunks"].append(name)
+
+        self.state["completed"].extend(completed)
+
+        retryable = []
+        for ticker in failed:
+            count = self.state["failures"].get(ticker, 0) + 1
+            self.state["failures"][ticker] = count
+            if count >= self.dead_letter_after:
+                logger.error(f"Dead-lettering {ticker} after {count} failed attempts")
+                self.state["dead_letter"].append(ticker)
+            else:
+                retryable.append(ticker)
+
+        self._save_state()
+        return retryable
+
+    def dead_letter_tickers(self, tickers: List[str]):
+        for ticker in tickers:
+            if ticker not in self.state["dead_letter"]:
+                self.state["dead_letter"].append(ticker)
+        self._save_state()
+        logger.error(f"Dead-lettering {len(tickers)} tickers: {tickers}")
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,133 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config.config import ETLConfig
+
+logger = logging.getLogger(__name__)
+
+
+class PriceCache:
+    def __init__(self, root: str = None):
+        self.root = root or ETLConfig.PRICE_CACHE_DIR
+        self.index_path = os.path.join(self.root, "watermarks.json")
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump(self.index, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+
+    def _symbol_path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"symbol={symbol}", "bars.parquet")
+
+    @staticmethod
+    def _read_bars(path: str) -> pd.DataFrame:
+        bars = pd.read_parquet(path)
+        bars["date"] = bars["date"].astype("datetime64[ns]")
+        return bars
+
+    def get_watermark(self, symbol: str) -> Optional[str]:
+        entry = self.index.get(symbol)
+        return entry["last_bar"] if entry else None
+
+    def missing_range(self, symbol: str, start_date: str, end_date: str) -> Optional[Tuple[str, str]]:
+        entry = self.index.get(symbol)
+        if entry is None or start_date < entry["fetched_from"]:
+            return start_date, end_date
+
+        fetch_start = max(start_date, entry["fetched_through"])
+        if fetch_start >= end_date:
+            return None
+        return fetch_start, end_date
+
+    def read(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        path = self._symbol_path(symbol)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        bars = self._read_bars(path)
+        mask = (bars["date"] >= pd.Timestamp(start_date)) & (bars["date"] < pd.Timestamp(end_date))
+        return bars[mask].reset_index(drop=True)
+
+    def _store_bars(self, symbol: str, bars: pd.DataFrame) -> pd.DataFrame:
+        path = self._symbol_path(symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        bars = bars.drop_duplicates(subset=["date"], keep="last").sort_values("date")
+
+        # Ranges with no trading days still advance the watermark, but leave no file behind
+        if len(bars):
+            tmp_path = f"{path}.tmp"
+            bars.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        return bars
+
+    @staticmethod
+    def _entry(start_date: str, end_date: str, bars: pd.DataFrame) -> Dict[str, str]:
+        return {
+            "fetched_from": start_date,
+            "fetched_through": end_date,
+            "last_bar": bars["date"].max().strftime("%Y-%m-%d") if len(bars) else None,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+    def write(self, symbol: str, bars: pd.DataFrame, start_date: str, end_date: str):
+        path = self._symbol_path(symbol)
+        if os.path.exists(path):
+            bars = pd.concat([self._read_bars(path), bars], ignore_index=True)
+        bars = self._store_bars(symbol, bars)
+
+        with self._lock:
+            entry = self.index.get(symbol)
+            if entry and start_date <= entry["fetched_through"] and end_date >= entry["fetched_from"]:
+                start_date = min(start_date, entry["fetched_from"])
+                end_date = max(end_date, entry["fetched_through"])
+
+            self.index[symbol] = self._entry(start_date, end_date, bars)
+
+    @staticmethod
+    def _latest_range(entries: List[Dict[str, str]]) -> Tuple[str, str]:
+        # Overlapping or adjacent ranges collapse into one; the index holds a single range per symbol, so
+        # keep the stretch reaching furthest, which is where incremental extraction resumes
+        stretches = []
+        for entry in sorted(entries, key=lambda e: e["fetched_from"]):
+            if stretches and entry["fetched_from"] <= stretches[-1][1]:
+                stretches[-1][1] = max(stretches[-1][1], entry["fetched_through"])
+            else:
+                stretches.append([entry["fetched_from"], entry["fetched_through"]])
+        return tuple(max(stretches, key=lambda stretch: stretch[1]))
+
+    def merge(self, others: List["PriceCache"]) -> int:
+        # Backfill shards fill private caches in parallel; one writer then folds them in, so the shards
+        # never race on this cache's files. Bars from the merged caches win on the same date
+        symbols = sorted({symbol for other in others for symbol in other.index})
+        for symbol in symbols:
+            sources = [self] + [other for other in others if symbol in other.index]
+            paths = [cache._symbol_path(symbol) for cache in sources]
+            frames = [self._read_bars(path) for path in paths if os.path.exists(path)]
+            bars = self._store_bars(symbol, pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+                {"date": pd.Series(dtype="datetime64[ns]")}
+            ))
+
+            entries = [cache.index[symbol] for cache in sources if symbol in cache.index]
+            with self._lock:
+                self.index[symbol] = self._entry(*self._latest_range(entries), bars)
+
+        self.save_index()
+        logger.info(f"Merged {len(others)} price caches into {self.root}: {len(symbols)} symbols")
+        return len(symbols)
@@ -1,27 +1,59 @@
+import logging
 import requests
 import pandas as pd
 from typing import List, Dict
 from io import StringIO
 
+from src.ingestion.universe_cache import UniverseCache
 
-def get_sp500_tickers() -> List[Dict[str, str]]:
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    headers = {"User-Agent": "stock-market-etl/1.0"}
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    tables = pd.read_html(StringIO(response.text))
-    df = tables[0]
-
-    tickers = []
-    for _, row in df.iterrows():
-        tickers.append({
-            "symbol": row["Symbol"].replace(".", "-"),
-            "company_name": row["Security"],
-            "sector": row["GICS Sector"],
-            "sub_industry": row["GICS Sub-Industry"],
-            "headquarters": row["Headquarters Location"],
-            "date_added": str(row["Date added"]) if pd.notna(row["Date added"]) else None,
-            "cik": str(row["CIK"]) if pd.notna(row["CIK"]) else None
-        })
-
-    return tickers
+logger = logging.getLogger(__name__)
+
+SP500_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+
+SP500_COLUMNS = {
+    "Symbol": "symbol",
+    "Security": "company_name",
+    "GICS Sector": "sector",
+    "GICS Sub-Industry": "sub_industry",
+    "Headquarters Location": "headquarters",
+    "Date added": "date_added",
+    "CIK": "cik"
+}
+
+
+def parse_sp500_table(html: str) -> pd.DataFrame:
+    df = pd.read_html(StringIO(html))[0]
+    df = df[list(SP500_COLUMNS)].rename(columns=SP500_COLUMNS)
+    df["symbol"] = df["symbol"].str.replace(".", "-", regex=False)
+
+    df = df.astype("string")
+    return df.astype(object).where(df.notna(), None)
+
+
+def _to_records(df: pd.DataFrame) -> List[Dict[str, str]]:
+    return df.to_dict("records")
+
+
+def get_sp500_tickers(cache: UniverseCache = None) -> List[Dict[str, str]]:
+    cache = cache or UniverseCache()
+    if cache.is_fresh():
+        return _to_records(cache.read())
+
+    headers = {"User-Agent": "stock-market-etl/1.0", **cache.conditional_headers()}
+    try:
+        response = requests.get(SP500_URL, headers=headers, timeout=30)
+        if response.status_code == 304:
+            logger.info("S&P 500 list not modified since last fetch")
+            cache.touch()
+            return _to_records(cache.read())
+
+        response.raise_for_status()
+        df = parse_sp500_table(response.text)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        if not cache.has_snapshot():
+            raise
+        logger.warning(f"S&P 500 fetch failed, using last snapshot from {cache.meta.get('fetched_at')}: {e}")
+        return _to_records(cache.read())
+
+    cache.write(df, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return _to_records(df)
@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config.config import ETLConfig
+
+logger = logging.getLogger(__name__)
+
+
+class UniverseCache:
+    def __init__(self, root: str = None, ttl: int = None):
+        self.root = root or ETLConfig.UNIVERSE_CACHE_DIR
+        self.ttl = ttl if ttl is not None else ETLConfig.UNIVERSE_TTL
+        self.snapshot_path = os.path.join(self.root, "sp500.parquet")
+        self.meta_path = os.path.join(self.root, "meta.json")
+        self.meta = self._load_meta()
+        # Only a snapshot written by this instance is news; fresh hits and fallbacks changed nothing
+        self.refetched = False
+
+    def _load_meta(self) -> Dict:
+        if not os.path.exists(self.meta_path):
+            return {}
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def _save_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    @property
+    def diff(self) -> Dict[str, List[str]]:
+        if not self.refetched:
+            return {"added": [], "removed": [], "changed": []}
+        return self.meta.get("diff", {"added": [], "removed": [], "changed": []})
+
+    def has_snapshot(self) -> bool:
+        return os.path.exists(self.snapshot_path)
+
+    def is_fresh(self) -> bool:
+        if not self.has_snapshot() or "fetched_at" not in self.meta:
+            return False
+        age = (datetime.utcnow() - datetime.fromisoformat(self.meta["fetched_at"])).total_seconds()
+        return age < self.ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        if not self.has_snapshot():
+            return {}
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+    def read(self) -> Optional[pd.DataFrame]:
+        if not self.has_snapshot():
+            return None
+        return pd.read_parquet(self.snapshot_path)
+
+    def touch(self):
+        # 304 Not Modified: the snapshot is still current, so restart the TTL and clear the diff
+        self.meta["fetched_at"] = datetime.utcnow().isoformat()
+        self.meta["diff"] = {"added": [], "removed": [], "changed": []}
+        self._save_meta()
+
+    @staticmethod
+    def _compute_diff(previous: Optional[pd.DataFrame], current: pd.DataFrame) -> Dict[str, List[str]]:
+        if previous is None:
+            return {"added": sorted(current["symbol"]), "removed": [], "changed": []}
+
+        prev = previous.set_index("symbol")
+        curr = current.set_index("symbol")
+        common = curr.index.intersection(prev.index)
+        columns = [c for c in curr.columns if c in prev.columns]
+
+        prev_hashes = pd.util.hash_pandas_object(prev.loc[common, columns], index=False).to_numpy()
+        curr_hashes = pd.util.hash_pandas_object(curr.loc[common, columns], index=False).to_numpy()
+
+        return {
+            "added": sorted(curr.index.difference(prev.index)),
+            "removed": sorted(prev.index.difference(curr.index)),
+            "changed": sorted(common[prev_hashes != curr_hashes])
+        }
+
+    def write(self, df: pd.DataFrame, etag: str = None, last_modified: str = None) -> Dict[str, List[str]]:
+        os.makedirs(self.root, exist_ok=True)
+        diff = self._compute_diff(self.read(), df)
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+        self.meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": datetime.utcnow().isoformat(),
+            "row_count": len(df),
+            "diff": diff
+        }
+        self._save_meta()
+        self.refetched = True
+
+        logger.info(
+            f"S&P 500 universe updated: {len(diff['added'])} added, "
+            f"{len(diff['removed'])} removed, {len(diff['changed'])} changed"
+        )
+        return diff
@@ -1,74 +1,261 @@
 import time
+import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Optional
 
 import yfinance as yf
 import pandas as pd
 
 from config.config import ETLConfig
+from src.ingestion.checkpoint import ExtractionCheckpoint
+from src.ingestion.price_cache import PriceCache
+from src.ingestion.rate_limiter import TokenBucket
+from src.metrics import instrumentation as metrics
 
 logger = logging.getLogger(__name__)
 
+PRICE_COLUMNS = {
+    "symbol": "object",
+    "date": "datetime64[ns]",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "int64"
+}
+
+# Bars shorter than a day keep their time of day; yfinance returns them under "Datetime"
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+PriceSource = Callable[[str, str, str, str], pd.DataFrame]
+
+
+def _empty_price_frame() -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in PRICE_COLUMNS.items()})
+
+
+def yahoo_price_source(ticker: str, start_date: str, end_date: str, interval: str) -> pd.DataFrame:
+    return yf.Ticker(ticker).history(start=start_date, end=end_date, interval=interval)
+
 
 class YahooFinanceExtractor:
-    def __init__(self):
+    def __init__(
+        self,
+        price_source: Optional[PriceSource] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[PriceCache] = None
+    ):
         self.max_retries = ETLConfig.MAX_RETRIES
         self.retry_delay = ETLConfig.RETRY_DELAY
         self.batch_size = ETLConfig.BATCH_SIZE
+        self.max_workers = max_workers or ETLConfig.EXTRACT_MAX_WORKERS
+        self.price_source = price_source or yahoo_price_source
+        self.rate_limiter = TokenBucket(ETLConfig.EXTRACT_RATE_LIMIT, ETLConfig.EXTRACT_RATE_BURST)
+        if cache is None and ETLConfig.USE_PRICE_CACHE:
+            cache = PriceCache()
+        self.cache = cache
 
-    def _fetch_with_retry(self, ticker: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+    def _fetch_with_retry(
+        self,
+        ticker: str,
+        start_date: str,
+        end_date: str,
+        interval: str = None
+    ) -> Optional[pd.DataFrame]:
+        interval = interval or ETLConfig.DATA_INTERVAL
         for attempt in range(self.max_retries):
             try:
-                stock = yf.Ticker(ticker)
-                df = stock.history(start=start_date, end=end_date, interval="1d")
-
-                if df.empty:
-                    logger.warning(f"No data returned for {ticker}")
-                    return None
-
-                df = df.reset_index()
-                df["symbol"] = ticker
-                return df
+                with metrics.timer("extract", "rate_limit_wait_seconds"):
+                    self.rate_limiter.acquire()
+                with metrics.timer("extract", "upstream_latency_seconds"):
+                    df = self.price_source(ticker, start_date, end_date, interval)
+                break
 
             except Exception as e:
-                wait_time = self.retry_delay * (2 ** attempt)
-                logger.warning(f"Attempt {attempt + 1} failed for {ticker}: {e}. Retrying in {wait_time}s")
+                metrics.count("extract", "retries")
+                # Backoff is per worker so one throttled ticker doesn't stall the others
+                wait_time = self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"Attempt {attempt + 1} failed for {ticker}: {e}. Retrying in {wait_time:.1f}s")
                 time.sleep(wait_time)
+        else:
+            logger.error(f"All retries exhausted for {ticker}")
+            metrics.count("extract", "failed_tickers")
+            return None
+
+        # Converted outside the retry loop, so a malformed response is not fetched again
+        if df is None or df.empty:
+            logger.warning(f"No data returned for {ticker}")
+            return _empty_price_frame()
+
+        df = df.reset_index()
+        df["symbol"] = ticker
+        return self._to_price_frame(df, intraday=interval in INTRADAY_INTERVALS)
+
+    def _extract_ticker(self, ticker: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        if self.cache is None:
+            return self._fetch_with_retry(ticker, start_date, end_date)
+
+        missing = self.cache.missing_range(ticker, start_date, end_date)
+        if missing is None:
+            metrics.count("extract", "cache_hits")
+            return self.cache.read(ticker, start_date, end_date)
+
+        df = self._fetch_with_retry(ticker, *missing)
+        if df is None:
+            # Fall back to whatever was already cached for the requested window
+            cached = self.cache.read(ticker, start_date, end_date)
+            return cached if len(cached) else None
 
-        logger.error(f"All retries exhausted for {ticker}")
-        return None
+        self.cache.write(ticker, df, *missing)
+        return self.cache.read(ticker, start_date, end_date)
 
-    def extract_daily_prices(self, tickers: List[str], start_date: str, end_date: str) -> List[Dict]:
-        all_records = []
+    def _fetch_batch(
+        self,
+        tickers: List[str],
+        start_date: str,
+        end_date: str,
+        interval: str = None
+    ) -> List[pd.DataFrame]:
+        # The price cache holds daily bars only, so intraday fetches go straight to the source
+        if interval is None:
+            fetch = lambda t: self._extract_ticker(t, start_date, end_date)
+        else:
+            fetch = lambda t: self._fetch_with_retry(t, start_date, end_date, interval)
+
+        if self.max_workers <= 1:
+            return [fetch(t) for t in tickers]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fetch, tickers))
+
+    def _to_price_frame(self, df: pd.DataFrame, intraday: bool = False) -> pd.DataFrame:
+        dates = pd.to_datetime(df["Datetime"] if "Datetime" in df.columns else df["Date"])
+        if intraday:
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+        else:
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_localize(None)
+            dates = dates.dt.normalize()
+
+        # Yahoo reports missing volume as NaN, which int64 cannot hold
+        volume = df["Volume"]
+        missing_volume = int(volume.isna().sum())
+        if missing_volume:
+            logger.warning(f"Filling {missing_volume} missing volumes with 0 for {df['symbol'].iloc[0]}")
+            volume = volume.fillna(0)
+
+        return pd.DataFrame({
+            "symbol": df["symbol"].to_numpy(),
+            "date": dates.to_numpy(),
+            "open": df["Open"].to_numpy(dtype="float64"),
+            "high": df["High"].to_numpy(dtype="float64"),
+            "low": df["Low"].to_numpy(dtype="float64"),
+            "close": df["Close"].to_numpy(dtype="float64"),
+            "volume": volume.to_numpy(dtype="int64")
+        })
+
+    @metrics.instrument("extract")
+    def extract_daily_prices(
+        self,
+        tickers: List[str],
+        start_date: str,
+        end_date: str,
+        checkpoint: Optional[ExtractionCheckpoint] = None
+    ) -> pd.DataFrame:
+        frames = []
+        retryable = []
+        total_tickers = len(tickers)
+        metrics.count("extract", "tickers", total_tickers)
+
+        if checkpoint is not None:
+            frames.extend(checkpoint.load_chunks())
+            tickers = checkpoint.pending(tickers)
 
         for i in range(0, len(tickers), self.batch_size):
             batch = tickers[i:i + self.batch_size]
             logger.info(f"Processing batch {i // self.batch_size + 1}: {len(batch)} tickers")
 
-            for ticker in batch:
-                df = self._fetch_with_retry(ticker, start_date, end_date)
+            batch_frames = []
+            failed = []
+            for ticker, df in zip(batch, self._fetch_batch(batch, start_date, end_date)):
+                if df is None:
+                    failed.append(ticker)
+                elif len(df):
+                    batch_frames.append(df)
+            frames.extend(batch_frames)
 
-                if df is not None:
-                    for _, row in df.iterrows():
-                        all_records.append({
-                            "symbol": ticker,
-                            "date": row["Date"].strftime("%Y-%m-%d"),
-                            "open": float(row["Open"]),
-                            "high": float(row["High"]),
-                            "low": float(row["Low"]),
-                            "close": float(row["Close"]),
-                            "volume": int(row["Volume"]),
-                            "extracted_at": datetime.utcnow().isoformat()
-                        })
+            if checkpoint is not None:
+                completed = [t for t in batch if t not in failed]
+                chunk = pd.concat(batch_frames, ignore_index=True) if batch_frames else _empty_price_frame()
+                retryable.extend(checkpoint.save_chunk(chunk, completed, failed))
 
-            time.sleep(1)
+        if self.cache is not None:
+            self.cache.save_index()
 
-        logger.info(f"Extracted {len(all_records)} records for {len(tickers)} tickers")
-        return all_records
+        # A few failing tickers are dead-lettered; only a widespread failure fails the task. Tickers that
+        # save_chunk already dead-lettered, on this attempt or an earlier one, count as failed too, or a
+        # retry of a total outage would dead-letter everything and succeed with no rows
+        if checkpoint is not None:
+            failed_tickers = retryable + checkpoint.dead_letter
+            if len(failed_tickers) > total_tickers * ETLConfig.MAX_FAILED_TICKER_RATIO:
+                raise RuntimeError(
+                    f"{len(failed_tickers)} of {total_tickers} tickers failed "
+                    f"({len(retryable)} will be retried from the checkpoint): {failed_tickers}"
+                )
+            if retryable:
+                checkpoint.dead_letter_tickers(retryable)
 
-    def extract_for_date_range(self, tickers: List[str], days_back: int = 1) -> List[Dict]:
+        prices = pd.concat(frames, ignore_index=True) if frames else _empty_price_frame()
+        prices["extracted_at"] = pd.Timestamp.utcnow().tz_localize(None)
+
+        logger.info(f"Extracted {len(prices)} records for {total_tickers} tickers")
+        return prices
+
+    def extract_for_date_range(
+        self,
+        tickers: List[str],
+        days_back: int = 1,
+        checkpoint: Optional[ExtractionCheckpoint] = None
+    ) -> pd.DataFrame:
         end_date = datetime.now().strftime("%Y-%m-%d")
         # Look back extra days to account for weekends/holidays
         start_date = (datetime.now() - timedelta(days=max(days_back, 5))).strftime("%Y-%m-%d")
-        return self.extract_daily_prices(tickers, start_date, end_date)
+        return self.extract_daily_prices(tickers, start_date, end_date, checkpoint=checkpoint)
+
+    def iter_intraday_batches(
+        self,
+        tickers: List[str],
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        interval: str = None
+    ) -> Iterator[pd.DataFrame]:
+        # One micro-batch of tickers is in memory at a time, however many the session covers
+        interval = interval or ETLConfig.INTRADAY_INTERVAL
+        batch_size = ETLConfig.INTRADAY_BATCH_SIZE
+        # Price sources take whole dates, so fetch the covering days and keep bars in [start, end) UTC
+        start_date = start.strftime("%Y-%m-%d")
+        end_date = (end + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        failed = []
+
+        for i in range(0, len(tickers), batch_size):
+            batch = tickers[i:i + batch_size]
+            frames = []
+            with metrics.stage("extract"):
+                for ticker, df in zip(batch, self._fetch_batch(batch, start_date, end_date, interval)):
+                    if df is None:
+                        failed.append(ticker)
+                    elif len(df):
+                        frames.append(df[(df["date"] >= start) & (df["date"] < end)])
+                metrics.count("extract", "tickers", len(batch))
+
+            bars = pd.concat(frames, ignore_index=True) if frames else _empty_price_frame()
+            if len(bars):
+                bars["extracted_at"] = pd.Timestamp.utcnow().tz_localize(None)
+                logger.info(f"Extracted {len(bars)} {interval} bars for {len(batch)} tickers")
+                yield bars
+
+        if failed:
+            logger.warning(f"No {interval} bars for {len(failed)} tickers after retries: {failed}")
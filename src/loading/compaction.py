@@ -0,0 +1,74 @@
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from src.loading.s3_loader import S3Loader
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_KEYS = {
+    "dim_sector": ["sector_id"],
+    "dim_company": ["company_id"],
+    "fact_daily_prices": ["company_id", "date"],
+    "fact_daily_indicators": ["company_id", "date"]
+}
+
+
+def partition_month(partition: str) -> str:
+    values = dict(segment.split("=", 1) for segment in partition.split("/"))
+    if "year" in values:
+        return f"{values['year']}-{values['month']}"
+    return next(iter(values.values()))[:7]
+
+
+class StagingCompactor:
+    def __init__(self, loader: S3Loader = None):
+        self.loader = loader or S3Loader()
+        self.catalog = self.loader.catalog
+        self.compacted_prefix = f"{self.loader.staging_prefix}_compacted/"
+
+    def _compact_month(self, table_name: str, month: str, entries: List[Dict]) -> List[Dict]:
+        # Later stagings win when the same key appears in several files
+        entries = sorted(entries, key=lambda e: e["staged_at"])
+        df = pd.concat([self.loader.read_staged(e["key"]) for e in entries], ignore_index=True)
+
+        keys = COMPACTION_KEYS[table_name]
+        df = df.drop_duplicates(subset=keys, keep="last").sort_values(keys, kind="stable")
+
+        # Compacted rows are already loaded; keeping the newest input's staged_at lets a file staged
+        # after it, but loaded later, still win the next compaction
+        added = [
+            {**entry, "staged_at": entries[-1]["staged_at"], "loaded_at": datetime.utcnow().isoformat()}
+            for entry in self.loader.stage_partition(df, table_name, f"month={month}", self.compacted_prefix)
+        ]
+        self.catalog.swap(table_name, [e["key"] for e in entries], added)
+
+        for entry in entries:
+            if entry["key"] not in {a["key"] for a in added}:
+                self.loader.s3_client.delete_object(Bucket=self.loader.bucket, Key=entry["key"])
+
+        logger.info(f"Compacted {len(entries)} {table_name} files for {month} into {len(added)} ({len(df)} rows)")
+        return added
+
+    def compact(self, table_name: str, before_month: str = None) -> List[Dict]:
+        before_month = before_month or datetime.utcnow().strftime("%Y-%m")
+
+        by_month: Dict[str, List[Dict]] = {}
+        for entry in self.catalog.current_files(table_name):
+            # Published files wait here until their load commits; the backfill publishes before loading
+            if not entry.get("loaded_at"):
+                continue
+            by_month.setdefault(partition_month(entry["partition"]), []).append(entry)
+
+        added = []
+        for month, entries in sorted(by_month.items()):
+            # The open month is still receiving daily files, and single-file months are already compact
+            if month >= before_month or len(entries) < 2:
+                continue
+            added.extend(self._compact_month(table_name, month, entries))
+        return added
+
+    def compact_all(self, before_month: str = None) -> Dict[str, int]:
+        return {table: len(self.compact(table, before_month)) for table in COMPACTION_KEYS}
@@ -0,0 +1,55 @@
+import os
+import argparse
+import logging
+
+import pandas as pd
+
+from src.loading.snowflake_loader import SnowflakeLoader
+from src.transformation.transformers import StockDataTransformer
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "sql", "migrations", "001_remap_surrogate_keys.sql"
+)
+
+
+def _values(keys: pd.Series) -> str:
+    ids = StockDataTransformer._stable_ids(keys)
+    return ",\n    ".join(
+        "('{}', {})".format(str(key).replace("'", "''"), int(key_id)) for key, key_id in zip(keys, ids)
+    )
+
+
+def render_remap_sql(sectors: list, symbols: list) -> str:
+    # Hashed ids come from the transformer itself, so the remap matches what the DAGs load from now on
+    with open(TEMPLATE_PATH) as f:
+        template = f.read()
+    return template.replace(
+        "{sector_keys}", _values(pd.Series(sorted(set(sectors)), dtype=object))
+    ).replace(
+        "{company_keys}", _values(pd.Series(sorted(set(symbols)), dtype=object))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the surrogate key remap for existing Snowflake tables")
+    parser.add_argument("--output", default="remap_surrogate_keys.sql")
+    args = parser.parse_args()
+
+    loader = SnowflakeLoader()
+    loader.connect()
+    try:
+        sectors = [row[0] for row in loader.execute_query("SELECT DISTINCT sector FROM dim_sector")]
+        symbols = [row[0] for row in loader.execute_query("SELECT DISTINCT symbol FROM dim_company")]
+    finally:
+        loader.disconnect(close_idle=True)
+
+    with open(args.output, "w") as f:
+        f.write(render_remap_sql(sectors, symbols))
+    logger.info(f"Wrote remap for {len(sectors)} sectors and {len(symbols)} symbols to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,93 @@
+import io
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUploadStream(io.RawIOBase):
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int, concurrency: int):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.bytes_written = 0
+        self.sha256 = hashlib.sha256()
+
+        self._buffer = bytearray()
+        self._parts: List[Dict] = []
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self.sha256.update(data)
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _submit_part(self, body: bytes):
+        # Blocks once `concurrency` parts are in flight, which bounds memory to roughly
+        # (concurrency + 1) * part_size regardless of the payload size
+        self._slots.acquire()
+        part_number = len(self._futures) + 1
+        future = self._executor.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number: int, body: bytes) -> Dict:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._futures:
+                self._submit_part(bytes(self._buffer))
+                self._buffer.clear()
+            parts = [f.result() for f in self._futures]
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+            logger.info(f"Completed multipart upload of {self.key}: {len(parts)} parts, {self.bytes_written} bytes")
+        except Exception:
+            self.abort()
+            raise
+        self._executor.shutdown(wait=True)
+        super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        super().close()
+        logger.warning(f"Aborted multipart upload of {self.key}")
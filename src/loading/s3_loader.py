@@ -1,21 +1,52 @@
 import io
+import re
+import time
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import boto3
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
 from config.config import AWSConfig
+from src.loading.multipart import MultipartUploadStream
+from src.loading.staging_catalog import StagingCatalog
+from src.loading.write_profile import ParquetWriteProfile, SORT_KEYS, get_write_profile
+from src.metrics import instrumentation as metrics
 
 logger = logging.getLogger(__name__)
 
+# Tables staged by trade date rather than by upload date
+PARTITION_COLUMNS = {
+    "fact_daily_prices": "date",
+    "fact_daily_indicators": "date",
+    "fact_intraday_prices": "bar_time"
+}
+
+# Intraday bars land in fixed time buckets, so Snowpipe auto-ingests small files continuously
+PARTITION_GRANULARITY = {
+    "fact_intraday_prices": "bucket"
+}
+
+SIZE_SAMPLE_ROWS = 50_000
+
 
 class S3Loader:
-    def __init__(self):
-        self.s3_client = boto3.client(
+    def __init__(
+        self,
+        s3_client=None,
+        write_profile: ParquetWriteProfile = None,
+        run_id: str = None,
+        file_tag: str = None,
+        publish: bool = True,
+        granularity: str = None
+    ):
+        self.s3_client = s3_client or boto3.client(
             "s3",
             aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
             aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY,
@@ -23,56 +54,248 @@ class S3Loader:
         )
         self.bucket = AWSConfig.S3_BUCKET
         self.staging_prefix = AWSConfig.S3_STAGING_PREFIX
+        self.write_profile = write_profile or get_write_profile()
+        self.run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        # Tagged loaders (backfill shards) write alongside other tags in a partition instead of replacing it
+        self.file_tag = file_tag
+        self.publish = publish
+        self.granularity = granularity or AWSConfig.FACT_PARTITION_GRANULARITY
+        self.catalog = StagingCatalog(self.s3_client, self.bucket, self.staging_prefix)
+        self.staged_files: List[Dict] = []
+
+    def _generate_key(self, table_name: str, partition: str, part: int = 0, base_prefix: str = None) -> str:
+        base_prefix = base_prefix or self.staging_prefix
+        label = "-".join(segment.split("=", 1)[-1] for segment in partition.split("/"))
+        if self.file_tag:
+            label = f"{label}_{self.file_tag}"
+        return f"{base_prefix}{table_name}/{partition}/{table_name}_{label}_{part:04d}.parquet"
+
+    @staticmethod
+    def _partition_labels(dates: pd.Series, granularity: str) -> np.ndarray:
+        # Format each distinct trade date once and broadcast back to the rows
+        codes, uniques = pd.factorize(pd.to_datetime(dates))
+        uniques = pd.DatetimeIndex(uniques)
+        if granularity == "month":
+            labels = uniques.strftime("year=%Y/month=%m")
+        elif granularity == "bucket":
+            buckets = uniques.floor(f"{AWSConfig.INTRADAY_BUCKET_MINUTES}min")
+            labels = buckets.strftime("trade_date=%Y-%m-%d/bucket=%H%M")
+        else:
+            labels = uniques.strftime("trade_date=%Y-%m-%d")
+        return np.append(labels.to_numpy(dtype=object), "trade_date=unknown")[codes]
+
+    def _split_partitions(self, df: pd.DataFrame, table_name: str) -> List[Tuple[str, pd.DataFrame]]:
+        partition_column = PARTITION_COLUMNS.get(table_name)
+        if partition_column is None:
+            # Change sets (dimension CDC) are per run, so a second run on the same day must not replace them
+            run_label = re.sub(r"[^A-Za-z0-9_.-]", "_", self.run_id)
+            return [(f"date={datetime.utcnow().strftime('%Y-%m-%d')}/run={run_label}", df)]
+
+        granularity = PARTITION_GRANULARITY.get(table_name, self.granularity)
+        labels = self._partition_labels(df[partition_column], granularity)
+        return [(label, group) for label, group in df.groupby(labels, sort=True)]
 
-    def _generate_key(self, table_name: str, partition_date: str) -> str:
-        return f"{self.staging_prefix}{table_name}/date={partition_date}/{table_name}_{partition_date}.parquet"
+    def _rows_per_file(self, df: pd.DataFrame) -> int:
+        # Encode a sample with the active profile to estimate compressed bytes per row
+        sample = df.head(SIZE_SAMPLE_ROWS)
+        if len(sample) == 0:
+            return 1
+        buffer = io.BytesIO()
+        self.write_profile.write_table(pa.Table.from_pandas(sample, preserve_index=False), buffer)
+        bytes_per_row = max(buffer.getbuffer().nbytes / len(sample), 1)
+        return max(int(AWSConfig.TARGET_FILE_SIZE / bytes_per_row), 1)
 
-    def upload_dataframe(self, df: pd.DataFrame, table_name: str) -> str:
-        partition_date = datetime.utcnow().strftime("%Y-%m-%d")
-        key = self._generate_key(table_name, partition_date)
+    def _remove_stale_parts(self, table_name: str, partition: str, keep: List[str]):
+        # Tagged and untagged parts share a prefix in month partitions; only replace this loader's own label
+        stem = self._generate_key(table_name, partition).rsplit("_", 1)[0]
+        own_part = re.compile(rf"{re.escape(stem)}_\d{{4}}\.parquet")
+        stale = [k for k in self._list_keys(f"{stem}_") if own_part.fullmatch(k) and k not in keep]
+        for key in stale:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=key)
+            logger.info(f"Removed stale staged file {key}")
 
+    def _put_parquet(self, df: pd.DataFrame, key: str) -> Tuple[int, str]:
         buffer = io.BytesIO()
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, buffer)
+        with metrics.timer("load_s3", "parquet_encode_seconds"):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.write_profile.write_table(table, buffer)
+        checksum = hashlib.sha256(buffer.getbuffer()).hexdigest()
         buffer.seek(0)
 
-        self.s3_client.put_object(
-            Bucket=self.bucket,
-            Key=key,
-            Body=buffer.getvalue()
+        with metrics.timer("load_s3", "upload_latency_seconds"):
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=buffer
+            )
+        return buffer.getbuffer().nbytes, checksum
+
+    def _stream_parquet(self, df: pd.DataFrame, key: str) -> Tuple[int, str]:
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        row_group_size = self.write_profile.row_group_size or AWSConfig.STREAMING_ROW_GROUP_SIZE
+        started = time.perf_counter()
+        stream = MultipartUploadStream(
+            self.s3_client, self.bucket, key,
+            part_size=AWSConfig.MULTIPART_PART_SIZE,
+            concurrency=AWSConfig.MULTIPART_CONCURRENCY
         )
 
-        s3_path = f"s3://{self.bucket}/{key}"
-        logger.info(f"Uploaded {table_name} to {s3_path}")
-        return s3_path
+        try:
+            with pq.ParquetWriter(stream, schema, **self.write_profile.writer_options(schema)) as writer:
+                for start in range(0, len(df), row_group_size):
+                    chunk = df.iloc[start:start + row_group_size]
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        except Exception:
+            stream.abort()
+            raise
+        stream.close()
+        metrics.observe("load_s3", "stream_upload_seconds", time.perf_counter() - started)
+        return stream.bytes_written, stream.sha256.hexdigest()
+
+    @staticmethod
+    def _file_stats(df: pd.DataFrame) -> Dict:
+        # Rollups have no trade date, so their rows are checked by the period_start range instead
+        column = next((c for c in ("date", "period_start") if c in df.columns), None)
+        if column is None or len(df) == 0:
+            return {}
+        dates = pd.to_datetime(df[column])
+        stats = {"min_date": dates.min().strftime("%Y-%m-%d"), "max_date": dates.max().strftime("%Y-%m-%d")}
+        if column != "date":
+            stats["date_column"] = column
+        if "volume" in df.columns:
+            stats["sum_volume"] = int(df["volume"].sum())
+        return stats
+
+    def _upload_object(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        partition: str,
+        key: str,
+        streaming: bool = None
+    ) -> Dict:
+        if streaming is None:
+            streaming = df.memory_usage(index=False).sum() > AWSConfig.MULTIPART_THRESHOLD
+
+        if streaming:
+            size, checksum = self._stream_parquet(df, key)
+        else:
+            size, checksum = self._put_parquet(df, key)
+
+        return {
+            "table": table_name,
+            "partition": partition,
+            "key": key,
+            "row_count": len(df),
+            "bytes": size,
+            "checksum": checksum,
+            "stats": self._file_stats(df),
+            "file_tag": self.file_tag,
+            "run_id": self.run_id,
+            "staged_at": datetime.utcnow().isoformat()
+        }
+
+    @metrics.instrument("load_s3")
+    def upload_dataframe(self, df: pd.DataFrame, table_name: str, streaming: bool = None) -> List[str]:
+        if df.empty:
+            logger.info(f"No rows to stage for {table_name}")
+            return []
+
+        sort_keys = SORT_KEYS.get(table_name)
+        if self.write_profile.presort and sort_keys:
+            df = df.sort_values(sort_keys, kind="stable")
+
+        rows_per_file = self._rows_per_file(df)
+        uploads = []
+        for partition, partition_df in self._split_partitions(df, table_name):
+            for part, start in enumerate(range(0, max(len(partition_df), 1), rows_per_file)):
+                key = self._generate_key(table_name, partition, part)
+                uploads.append((partition, key, partition_df.iloc[start:start + rows_per_file]))
+
+        with ThreadPoolExecutor(max_workers=AWSConfig.UPLOAD_CONCURRENCY) as executor:
+            entries = list(executor.map(
+                lambda u: self._upload_object(u[2], table_name, u[0], u[1], streaming), uploads
+            ))
+
+        for partition in sorted({u[0] for u in uploads}):
+            self._remove_stale_parts(table_name, partition, [u[1] for u in uploads if u[0] == partition])
+
+        self.catalog.record(self.run_id, table_name, entries, publish=self.publish)
+        metrics.count("load_s3", "rows_in", len(df))
+        metrics.count("load_s3", "files_written", len(entries))
+        metrics.count("load_s3", "bytes_written", sum(e["bytes"] for e in entries))
+        self.staged_files.extend(entries)
+        paths = [f"s3://{self.bucket}/{e['key']}" for e in entries]
+
+        logger.info(f"Uploaded {table_name} to {len(paths)} files in s3://{self.bucket}")
+        return paths
+
+    def stage_partition(self, df: pd.DataFrame, table_name: str, partition: str, base_prefix: str) -> List[Dict]:
+        rows_per_file = self._rows_per_file(df)
+        return [
+            self._upload_object(
+                df.iloc[start:start + rows_per_file], table_name, partition,
+                self._generate_key(table_name, partition, part, base_prefix)
+            )
+            for part, start in enumerate(range(0, max(len(df), 1), rows_per_file))
+        ]
+
+    def read_staged(self, key: str) -> pd.DataFrame:
+        body = self.s3_client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return pq.read_table(io.BytesIO(body)).to_pandas()
 
     def upload_all_tables(
         self,
         dim_sector: pd.DataFrame,
         dim_company: pd.DataFrame,
-        fact_prices: pd.DataFrame
+        fact_prices: pd.DataFrame,
+        fact_indicators: pd.DataFrame = None,
+        aggregates: Dict[str, pd.DataFrame] = None
     ) -> List[str]:
-        paths = []
+        tables = [
+            (dim_sector, "dim_sector"),
+            (dim_company, "dim_company"),
+            (fact_prices, "fact_daily_prices")
+        ]
+        if fact_indicators is not None:
+            tables.append((fact_indicators, "fact_daily_indicators"))
+        tables.extend((df, table_name) for table_name, df in (aggregates or {}).items())
 
-        paths.append(self.upload_dataframe(dim_sector, "dim_sector"))
-        paths.append(self.upload_dataframe(dim_company, "dim_company"))
-        paths.append(self.upload_dataframe(fact_prices, "fact_daily_prices"))
+        with ThreadPoolExecutor(max_workers=AWSConfig.UPLOAD_CONCURRENCY) as executor:
+            table_paths = list(executor.map(lambda t: self.upload_dataframe(*t), tables))
 
-        logger.info(f"Uploaded {len(paths)} tables to S3")
+        paths = [path for table in table_paths for path in table]
+        logger.info(f"Uploaded {len(tables)} tables to S3 in {len(paths)} files")
         return paths
 
-    def list_staging_files(self, table_name: str = None) -> List[str]:
+    def stream_batches(self, batches: Iterable[pd.DataFrame], table_name: str, tag_prefix: str) -> Iterator[Dict]:
+        # Each micro-batch gets its own tag and run manifest, so its files never replace an earlier batch's
+        for seq, df in enumerate(batches):
+            tag = f"{tag_prefix}b{seq:04d}"
+            loader = S3Loader(
+                s3_client=self.s3_client,
+                write_profile=self.write_profile,
+                run_id=f"{self.run_id}__{tag}",
+                file_tag=tag,
+                publish=self.publish,
+                granularity=self.granularity
+            )
+            loader.upload_dataframe(df, table_name)
+            yield {"run_id": loader.run_id, "files": len(loader.staged_files), "rows": len(df)}
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return keys
+
+    def list_staging_files(self, table_name: str = None, run_id: str = None) -> List[str]:
+        if table_name and run_id:
+            return [entry["key"] for entry in self.catalog.get_run(run_id, table_name)]
+
         prefix = self.staging_prefix
         if table_name:
             prefix = f"{self.staging_prefix}{table_name}/"
 
-        response = self.s3_client.list_objects_v2(
-            Bucket=self.bucket,
-            Prefix=prefix
-        )
-
-        files = []
-        if "Contents" in response:
-            files = [obj["Key"] for obj in response["Contents"]]
-
-        return files
+        return [key for key in self._list_keys(prefix) if not key.startswith(self.catalog.catalog_prefix)]
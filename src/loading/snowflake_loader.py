@@ -1,33 +1,111 @@
+import re
+import time
+import uuid
 import logging
-from typing import Optional
-
-import snowflake.connector
+from typing import Dict, List, Optional
 
 from config.config import SnowflakeConfig, AWSConfig
+from src.loading.snowflake_session import SnowflakeSessionPool, get_session_pool
+from src.metrics import instrumentation as metrics
 
 logger = logging.getLogger(__name__)
 
+# Snowflake caps the FILES list of a single COPY statement
+COPY_FILES_LIMIT = 1000
+
+# Natural keys, column order and the column used to pick the newest row per key
+MERGE_SPECS = {
+    "dim_sector": {
+        "keys": ["sector"],
+        "columns": ["sector_id", "sector", "created_at", "is_active"],
+        "order_by": "created_at"
+    },
+    "dim_company": {
+        "keys": ["symbol"],
+        "columns": [
+            "company_id", "symbol", "company_name", "sector_id", "sub_industry",
+            "headquarters", "date_added", "cik", "created_at", "updated_at", "is_active"
+        ],
+        "order_by": "updated_at"
+    },
+    "fact_daily_prices": {
+        "keys": ["company_id", "date"],
+        "columns": [
+            "price_id", "company_id", "date", "open", "high", "low",
+            "close", "volume", "extracted_at", "loaded_at"
+        ],
+        "order_by": "extracted_at"
+    },
+    "fact_daily_indicators": {
+        "keys": ["company_id", "date"],
+        "columns": [
+            "company_id", "date", "close", "return_1d", "log_return_1d", "sma_20", "sma_50",
+            "sma_200", "volatility_20", "vwap_20", "computed_at"
+        ],
+        "order_by": "computed_at"
+    },
+    "fact_intraday_prices": {
+        "keys": ["company_id", "bar_time"],
+        "columns": [
+            "company_id", "bar_time", "date", "open", "high", "low",
+            "close", "volume", "extracted_at", "loaded_at"
+        ],
+        "order_by": "extracted_at"
+    },
+    "agg_company_ohlcv": {
+        "keys": ["company_id", "period_type", "period_start"],
+        "columns": [
+            "company_id", "period_type", "period_start", "first_date", "last_date", "open", "high", "low",
+            "close", "volume", "turnover", "vwap", "trading_days", "updated_at"
+        ],
+        "order_by": "updated_at"
+    },
+    "agg_sector_ohlcv": {
+        "keys": ["sector_id", "period_type", "period_start"],
+        "columns": [
+            "sector_id", "period_type", "period_start", "companies", "volume", "turnover", "vwap",
+            "vw_return", "updated_at"
+        ],
+        "order_by": "updated_at"
+    }
+}
+
+PIPES = {
+    "fact_daily_prices": "STOCK_MARKET.PUBLIC.FACT_DAILY_PRICES_PIPE",
+    "fact_intraday_prices": "STOCK_MARKET.PUBLIC.FACT_INTRADAY_PRICES_PIPE"
+}
+
+# Dimension change sets carry updates and soft deletes, rollups restate whole periods on every run,
+# and indicators are recomputed once history arrives, so these tables always MERGE whatever the load mode
+UPSERT_TABLES = ["dim_sector", "dim_company", "fact_daily_indicators", "agg_company_ohlcv", "agg_sector_ohlcv"]
+
+# COPY_HISTORY statuses that will not change by polling again
+FAILED_LOAD_STATUSES = {"load failed", "partially loaded"}
+
+# Audit columns never count as a change, and created_at is kept from the first load
+AUDIT_COLUMNS = {"created_at", "updated_at", "extracted_at", "loaded_at", "computed_at"}
+
 
 class SnowflakeLoader:
-    def __init__(self):
+    def __init__(self, pool: SnowflakeSessionPool = None, query_tag: str = None, run_id: str = None):
+        self.pool = pool or get_session_pool()
+        self.query_tag = query_tag
         self.conn = None
+        # Per-run suffix for transient MERGE tables, so overlapping daily and backfill loads never share one
+        self.run_suffix = re.sub(r"[^A-Za-z0-9_]", "_", run_id or uuid.uuid4().hex)
 
     def connect(self):
-        self.conn = snowflake.connector.connect(
-            account=SnowflakeConfig.ACCOUNT,
-            user=SnowflakeConfig.USER,
-            password=SnowflakeConfig.PASSWORD,
-            database=SnowflakeConfig.DATABASE,
-            schema=SnowflakeConfig.SCHEMA,
-            warehouse=SnowflakeConfig.WAREHOUSE,
-            role=SnowflakeConfig.ROLE
-        )
+        self.conn = self.pool.acquire(self.query_tag)
         logger.info("Connected to Snowflake")
 
-    def disconnect(self):
+    def disconnect(self, close_idle: bool = False):
         if self.conn:
-            self.conn.close()
-            logger.info("Disconnected from Snowflake")
+            self.pool.release(self.conn)
+            self.conn = None
+            logger.info("Returned Snowflake session to the pool")
+        # Tasks end their process, so they close pooled sessions instead of leaving them to time out
+        if close_idle:
+            self.pool.close_all()
 
     def execute_query(self, query: str) -> Optional[list]:
         cursor = self.conn.cursor()
@@ -37,6 +115,133 @@ class SnowflakeLoader:
         finally:
             cursor.close()
 
+    def submit_async(self, query: str) -> str:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute_async(query)
+            return cursor.sfqid
+        finally:
+            cursor.close()
+
+    def _fetch_query_results(self, query_id: str, as_dicts: bool):
+        cursor = self.conn.cursor()
+        try:
+            cursor.get_results_from_sfqid(query_id)
+            rows = cursor.fetchall()
+            if not as_dicts:
+                return rows
+            columns = [c[0].lower() for c in cursor.description]
+            return [dict(zip(columns, row)) for row in rows]
+        finally:
+            cursor.close()
+
+    def wait_for_queries(self, query_ids: List[str], as_dicts: bool = False, timeout: int = None) -> list:
+        deadline = time.monotonic() + (timeout or SnowflakeConfig.PIPE_LOAD_TIMEOUT)
+        delay = 0.25
+        pending = set(query_ids)
+        start = time.monotonic()
+
+        while pending:
+            for query_id in list(pending):
+                status = self.conn.get_query_status_throw_if_error(query_id)
+                if not self.conn.is_still_running(status):
+                    pending.discard(query_id)
+                    metrics.observe("load_snowflake", "query_latency_seconds", time.monotonic() - start)
+            if pending:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{len(pending)} Snowflake queries still running: {sorted(pending)}")
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+
+        return [self._fetch_query_results(query_id, as_dicts) for query_id in query_ids]
+
+    def execute_concurrently(self, queries: List[str], as_dicts: bool = False) -> list:
+        return self.wait_for_queries([self.submit_async(q) for q in queries], as_dicts=as_dicts)
+
+    def _fetch_dicts(self, query: str) -> List[Dict]:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query)
+            columns = [c[0].lower() for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _stage_path(key: str) -> str:
+        # Staged keys are bucket-relative; the stage URL already points at the staging prefix
+        prefix = AWSConfig.S3_STAGING_PREFIX
+        return key[len(prefix):] if key.startswith(prefix) else key
+
+    def copy_staged_files(self, table_name: str, keys: List[str], target_table: str = None) -> List[Dict]:
+        target_table = target_table or table_name
+        results = []
+        for start in range(0, len(keys), COPY_FILES_LIMIT):
+            files = ", ".join(f"'{self._stage_path(k)}'" for k in keys[start:start + COPY_FILES_LIMIT])
+            query = f"""
+                COPY INTO {target_table}
+                FROM @{SnowflakeConfig.STAGE}
+                FILES = ({files})
+                FILE_FORMAT = (TYPE = 'PARQUET')
+                MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                ON_ERROR = ABORT_STATEMENT
+            """
+            # Files already in the table's load metadata come back as a single status row
+            with metrics.timer("load_snowflake", "copy_latency_seconds"):
+                results.extend(r for r in self._fetch_dicts(query) if "file" in r)
+
+        loaded = sum(r.get("rows_loaded") or 0 for r in results)
+        metrics.count("load_snowflake", "files_loaded", len(results))
+        metrics.count("load_snowflake", "rows_loaded", loaded)
+        logger.info(f"COPY INTO {target_table}: {len(results)} files, {loaded} rows loaded")
+        return results
+
+    @staticmethod
+    def _merge_query(table_name: str, staging_table: str) -> str:
+        spec = MERGE_SPECS[table_name]
+        keys, columns = spec["keys"], spec["columns"]
+        compared = [c for c in columns if c not in keys and c not in AUDIT_COLUMNS]
+        updated = [c for c in columns if c not in keys and c != "created_at"]
+
+        on_clause = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+        changed = " OR ".join(f"t.{c} IS DISTINCT FROM s.{c}" for c in compared) or "FALSE"
+        set_clause = ", ".join(f"t.{c} = s.{c}" for c in updated)
+
+        return f"""
+            MERGE INTO {table_name} t
+            USING (
+                SELECT *
+                FROM {staging_table}
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {", ".join(keys)} ORDER BY {spec["order_by"]} DESC) = 1
+            ) s
+            ON {on_clause}
+            WHEN MATCHED AND ({changed}) THEN UPDATE SET {set_clause}
+            WHEN NOT MATCHED THEN INSERT ({", ".join(columns)})
+                VALUES ({", ".join(f"s.{c}" for c in columns)})
+        """
+
+    def merge_staged_files(self, table_name: str, keys: List[str]) -> Dict:
+        staging_table = f"{table_name}_staging_{self.run_suffix}"
+        self.execute_query(f"CREATE OR REPLACE TRANSIENT TABLE {staging_table} LIKE {table_name}")
+
+        try:
+            files = self.copy_staged_files(table_name, keys, target_table=staging_table)
+            with metrics.timer("load_snowflake", "merge_latency_seconds"):
+                merged = self._fetch_dicts(self._merge_query(table_name, staging_table))
+        finally:
+            self.execute_query(f"DROP TABLE IF EXISTS {staging_table}")
+
+        counts = merged[0] if merged else {}
+        result = {
+            "files": files,
+            "rows_inserted": counts.get("number of rows inserted", 0),
+            "rows_updated": counts.get("number of rows updated", 0)
+        }
+        logger.info(
+            f"MERGE into {table_name}: {result['rows_inserted']} inserted, {result['rows_updated']} updated"
+        )
+        return result
+
     def refresh_snowpipe(self, pipe_name: str, s3_path: str):
         query = f"ALTER PIPE {pipe_name} REFRESH"
         self.execute_query(query)
@@ -48,8 +253,19 @@ class SnowflakeLoader:
         logger.info(f"Pipe status for {pipe_name}: {result}")
         return result
 
-    def get_copy_history(self, table_name: str, hours: int = 24) -> list:
-        query = f"""
+    def refresh_snowpipes(self, pipe_names: List[str]):
+        self.execute_concurrently([f"ALTER PIPE {pipe_name} REFRESH" for pipe_name in pipe_names])
+        logger.info(f"Refreshed Snowpipes {pipe_names}")
+
+    def check_pipe_statuses(self, pipe_names: List[str]) -> Dict[str, list]:
+        results = self.execute_concurrently([f"SELECT SYSTEM$PIPE_STATUS('{p}')" for p in pipe_names])
+        statuses = dict(zip(pipe_names, results))
+        logger.info(f"Pipe statuses: {statuses}")
+        return statuses
+
+    @staticmethod
+    def _copy_history_query(table_name: str, hours: int) -> str:
+        return f"""
             SELECT *
             FROM TABLE(INFORMATION_SCHEMA.COPY_HISTORY(
                 TABLE_NAME => '{table_name}',
@@ -57,12 +273,197 @@ class SnowflakeLoader:
             ))
             ORDER BY LAST_LOAD_TIME DESC
         """
-        return self.execute_query(query)
 
-    def validate_load(self, table_name: str, expected_count: int) -> bool:
-        query = f"SELECT COUNT(*) FROM {table_name}"
-        result = self.execute_query(query)
-        actual_count = result[0][0] if result else 0
-        is_valid = actual_count >= expected_count
-        logger.info(f"Load validation for {table_name}: expected={expected_count}, actual={actual_count}")
-        return is_valid
+    def get_copy_history(self, table_name: str, hours: int = 24) -> list:
+        return self.execute_query(self._copy_history_query(table_name, hours))
+
+    @classmethod
+    def _history_by_path(cls, rows: List[Dict]) -> Dict[str, Dict]:
+        # COPY_HISTORY may report the file with or without the stage location prefix
+        location = f"s3://{AWSConfig.S3_BUCKET}/"
+        by_path = {}
+        for row in rows:
+            file_name = row["file_name"]
+            if file_name.startswith(location):
+                file_name = file_name[len(location):]
+            # Rows come newest first, so a reloaded file keeps its latest status
+            by_path.setdefault(cls._stage_path(file_name), row)
+        return by_path
+
+    def wait_for_files_loaded(
+        self,
+        files_by_table: Dict[str, List[str]],
+        hours: int = 24,
+        timeout: int = None
+    ) -> Dict[str, Dict[str, Dict]]:
+        timeout = timeout or SnowflakeConfig.PIPE_LOAD_TIMEOUT
+        start = time.monotonic()
+        deadline = start + timeout
+        pending = {table: {self._stage_path(k) for k in keys} for table, keys in files_by_table.items()}
+        loaded = {table: {} for table in files_by_table}
+        delay = 5
+
+        while True:
+            tables = [table for table, files in pending.items() if files]
+            if not tables:
+                return loaded
+
+            histories = self.execute_concurrently(
+                [self._copy_history_query(table, hours) for table in tables], as_dicts=True
+            )
+            failures = []
+            for table, rows in zip(tables, histories):
+                history = self._history_by_path(rows)
+                for path in list(pending[table]):
+                    row = history.get(path)
+                    if row is None:
+                        continue
+                    status = row["status"].lower()
+                    if status in FAILED_LOAD_STATUSES:
+                        failures.append(f"{table}/{path}: {row['status']} ({row.get('first_error_message')})")
+                    elif status == "loaded":
+                        loaded[table][path] = row
+                        pending[table].discard(path)
+                        metrics.observe("load_snowflake", "pipe_load_seconds", time.monotonic() - start)
+                        metrics.count("load_snowflake", "files_loaded")
+                        metrics.count("load_snowflake", "rows_loaded", row.get("row_count") or 0)
+
+            if failures:
+                raise RuntimeError(f"Snowpipe failed to load {len(failures)} staged files: {'; '.join(failures)}")
+
+            remaining = sum(len(files) for files in pending.values())
+            if remaining == 0:
+                return loaded
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{remaining} staged files not loaded after {timeout}s")
+
+            logger.info(f"Waiting {delay}s for {remaining} staged files to load")
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def _validate_files(self, table_name: str, staged_files: List[Dict], hours: int) -> List[str]:
+        rows = self.execute_concurrently([self._copy_history_query(table_name, hours)], as_dicts=True)[0]
+        history = self._history_by_path(rows)
+        errors = []
+        for entry in staged_files:
+            path = self._stage_path(entry["key"])
+            row = history.get(path)
+            if row is None:
+                errors.append(f"{path}: not in COPY_HISTORY")
+            elif row["status"].lower() != "loaded":
+                errors.append(f"{path}: status {row['status']}")
+            elif row["row_count"] != entry["row_count"] or row["row_parsed"] != entry["row_count"]:
+                errors.append(
+                    f"{path}: staged {entry['row_count']} rows, parsed {row['row_parsed']}, loaded {row['row_count']}"
+                )
+            elif row.get("file_size") is not None and row["file_size"] != entry["bytes"]:
+                errors.append(f"{path}: staged {entry['bytes']} bytes, COPY_HISTORY saw {row['file_size']}")
+        return errors
+
+    def _validate_partitions(self, table_name: str, staged_files: List[Dict]) -> List[str]:
+        stats = [f["stats"] for f in staged_files if f.get("stats")]
+        if not stats:
+            return []
+
+        date_column = stats[0].get("date_column", "date")
+        min_date = min(s["min_date"] for s in stats)
+        max_date = max(s["max_date"] for s in stats)
+        staged_rows = sum(f["row_count"] for f in staged_files if f.get("stats"))
+        has_volume = all("sum_volume" in s for s in stats)
+        staged_volume = sum(s.get("sum_volume", 0) for s in stats)
+        volume_column = "SUM(volume)" if has_volume else "NULL"
+
+        # Scoped to this run's trade dates (period starts for rollups), so the cost tracks the run, not the table
+        query = f"""
+            SELECT
+                COUNT(*) AS row_count, MIN({date_column}) AS min_date, MAX({date_column}) AS max_date,
+                {volume_column} AS sum_volume
+            FROM {table_name}
+            WHERE {date_column} BETWEEN '{min_date}' AND '{max_date}'
+        """
+        actual = self._fetch_dicts(query)[0]
+
+        errors = []
+        if actual["row_count"] < staged_rows:
+            errors.append(f"{actual['row_count']} rows between {min_date} and {max_date}, staged {staged_rows}")
+        if str(actual["min_date"]) != min_date or str(actual["max_date"]) != max_date:
+            errors.append(f"date range {actual['min_date']}..{actual['max_date']}, staged {min_date}..{max_date}")
+        if has_volume and (actual["sum_volume"] or 0) < staged_volume:
+            errors.append(f"volume {actual['sum_volume']} between {min_date} and {max_date}, staged {staged_volume}")
+        return errors
+
+    def validate_load(
+        self,
+        table_name: str,
+        staged_files: List[Dict],
+        check_files: bool = True,
+        hours: int = 24
+    ) -> bool:
+        errors = []
+        if check_files:
+            errors.extend(self._validate_files(table_name, staged_files, hours))
+        errors.extend(self._validate_partitions(table_name, staged_files))
+
+        for error in errors:
+            logger.error(f"Load validation for {table_name}: {error}")
+        logger.info(f"Load validation for {table_name}: {len(staged_files)} files, {len(errors)} errors")
+        return not errors
+
+    @staticmethod
+    def _files_by_table(staged_files: List[Dict]) -> Dict[str, List[Dict]]:
+        files_by_table = {
+            table_name: [f for f in staged_files if f["table"] == table_name]
+            for table_name in MERGE_SPECS
+        }
+        return {table: files for table, files in files_by_table.items() if files}
+
+    def notify_snowpipe(self, staged_files: List[Dict]) -> Dict:
+        files_by_table = {
+            table: [f["key"] for f in files] for table, files in self._files_by_table(staged_files).items()
+        }
+        pipe_names = [PIPES[table] for table in files_by_table]
+
+        self.refresh_snowpipes(pipe_names)
+        self.check_pipe_statuses(pipe_names)
+        loaded = self.wait_for_files_loaded(files_by_table)
+
+        return {"pipes_refreshed": list(files_by_table), "files_loaded": {t: len(f) for t, f in loaded.items()}}
+
+    def copy_into_tables(self, staged_files: List[Dict], merge: bool) -> Dict:
+        results = {}
+        for table_name, files in self._files_by_table(staged_files).items():
+            keys = [f["key"] for f in files]
+            if merge:
+                results[table_name] = self.merge_staged_files(table_name, keys)
+            else:
+                results[table_name] = {"files": self.copy_staged_files(table_name, keys)}
+
+        failed = [r for result in results.values() for r in result["files"] if r.get("status") != "LOADED"]
+        if failed:
+            raise RuntimeError(f"COPY INTO failed for {len(failed)} files: {failed}")
+
+        return {table: dict(result, files=len(result["files"])) for table, result in results.items()}
+
+    @metrics.instrument("load_snowflake")
+    def load_staged_files(self, staged_files: List[Dict], mode: str = None) -> Dict:
+        mode = mode or SnowflakeConfig.LOAD_MODE
+        upserts = [f for f in staged_files if f["table"] in UPSERT_TABLES]
+        appends = [f for f in staged_files if f["table"] not in UPSERT_TABLES]
+        if mode in ("copy", "merge"):
+            result = self.copy_into_tables(appends, merge=mode == "merge")
+        else:
+            result = self.notify_snowpipe(appends)
+        if upserts:
+            result.update(self.copy_into_tables(upserts, merge=True))
+
+        # MERGE loads go through a dropped transient table, so only the partition aggregates apply
+        invalid = [
+            table_name for table_name, files in self._files_by_table(staged_files).items()
+            if not self.validate_load(
+                table_name, files, check_files=mode != "merge" and table_name not in UPSERT_TABLES
+            )
+        ]
+        if invalid:
+            raise ValueError(f"Load validation failed for {invalid}")
+
+        return result
@@ -0,0 +1,131 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import snowflake.connector
+
+from config.config import SnowflakeConfig
+
+logger = logging.getLogger(__name__)
+
+
+def load_private_key(path: str, passphrase: str = None) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    with open(path, "rb") as f:
+        key = serialization.load_pem_private_key(
+            f.read(),
+            password=passphrase.encode("utf-8") if passphrase else None
+        )
+    return key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+
+
+class SnowflakeSessionPool:
+    def __init__(self, size: int = None, query_tag: str = None, connector=None):
+        self.size = size or SnowflakeConfig.POOL_SIZE
+        # Default tag for new sessions; callers tag each acquired session with their own run
+        self.query_tag = query_tag or SnowflakeConfig.QUERY_TAG
+        self.connector = connector or snowflake.connector
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connection_params(self) -> Dict:
+        params = {
+            "account": SnowflakeConfig.ACCOUNT,
+            "user": SnowflakeConfig.USER,
+            "database": SnowflakeConfig.DATABASE,
+            "schema": SnowflakeConfig.SCHEMA,
+            "warehouse": SnowflakeConfig.WAREHOUSE,
+            "role": SnowflakeConfig.ROLE,
+            "session_parameters": {"QUERY_TAG": self.query_tag}
+        }
+        if SnowflakeConfig.PRIVATE_KEY_PATH:
+            params["private_key"] = load_private_key(
+                SnowflakeConfig.PRIVATE_KEY_PATH, SnowflakeConfig.PRIVATE_KEY_PASSPHRASE
+            )
+        else:
+            params["password"] = SnowflakeConfig.PASSWORD
+        return params
+
+    @staticmethod
+    def _set_query_tag(conn, query_tag: str):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("ALTER SESSION SET QUERY_TAG = '{}'".format(query_tag.replace("'", "''")))
+        finally:
+            cursor.close()
+
+    def acquire(self, query_tag: str = None):
+        conn = self._acquire()
+        if query_tag:
+            self._set_query_tag(conn, query_tag)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if not can_create:
+            return self._idle.get(timeout=SnowflakeConfig.POOL_TIMEOUT)
+
+        try:
+            conn = self.connector.connect(**self._connection_params())
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        logger.info(f"Opened Snowflake session {self._created}/{self.size} (query tag {self.query_tag})")
+        return conn
+
+    def release(self, conn):
+        if conn.is_closed():
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def session(self, query_tag: str = None):
+        conn = self.acquire(query_tag)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+        logger.info("Closed idle Snowflake sessions")
+
+
+_pool: Optional[SnowflakeSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SnowflakeSessionPool:
+    # One pool per process; per-run query tags are set on each acquired session, not by keying pools
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SnowflakeSessionPool()
+        return _pool
@@ -0,0 +1,208 @@
+import io
+import re
+import json
+import time
+import random
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from config.config import AWSConfig
+
+logger = logging.getLogger(__name__)
+
+# Raised by S3 when an IfMatch/IfNoneMatch PUT loses to another writer
+CONFLICT_CODES = {"PreconditionFailed", "ConditionalRequestConflict", "412", "409"}
+
+
+class StagingCatalog:
+    def __init__(self, s3_client, bucket: str, staging_prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.staging_prefix = staging_prefix
+        self.catalog_prefix = f"{staging_prefix}_catalog/"
+
+    def _run_key(self, table_name: str, run_id: str) -> str:
+        safe_run_id = re.sub(r"[^A-Za-z0-9_.-]", "_", run_id)
+        return f"{self.catalog_prefix}{table_name}/run_id={safe_run_id}.json"
+
+    def _put_json(self, key: str, payload, **conditions):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=json.dumps(payload, indent=2).encode("utf-8"),
+            ContentType="application/json",
+            **conditions
+        )
+
+    def _get_json(self, key: str):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def _list(self, prefix: str) -> List[Dict]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        objects = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+    def _current_key(self, table_name: str) -> str:
+        return f"{self.catalog_prefix}{table_name}/_current.json"
+
+    def _read_current(self, table_name: str) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._current_key(table_name))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None, None
+        return json.loads(response["Body"].read())["files"], response["ETag"]
+
+    def _write_current(self, table_name: str, entries: List[Dict], etag: Optional[str] = None):
+        # A single PUT replaces the whole current view, so readers see either the old or new file set.
+        # It only succeeds if the view is unchanged since it was read (or still absent)
+        conditions = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        self._put_json(self._current_key(table_name), {
+            "table": table_name,
+            "updated_at": datetime.utcnow().isoformat(),
+            "files": entries
+        }, **conditions)
+
+    @staticmethod
+    def _is_conflict(error: ClientError) -> bool:
+        return error.response.get("Error", {}).get("Code") in CONFLICT_CODES
+
+    def _update_current(self, table_name: str, update: Callable[[List[Dict]], List[Dict]]):
+        # Optimistic concurrency: daily, backfill and compaction runs re-read and retry instead of
+        # overwriting each other's entries
+        for attempt in range(AWSConfig.CATALOG_WRITE_RETRIES):
+            entries, etag = self._read_current(table_name)
+            if entries is None:
+                logger.warning(f"No current manifest for {table_name}, rebuilding from a prefix listing")
+                self.rebuild(table_name)
+                continue
+
+            try:
+                self._write_current(table_name, update(entries), etag)
+                return
+            except ClientError as e:
+                if not self._is_conflict(e):
+                    raise
+                wait_time = 0.1 * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.info(f"{table_name} manifest changed concurrently, retrying in {wait_time:.2f}s")
+                time.sleep(wait_time)
+
+        raise RuntimeError(
+            f"Could not update the {table_name} manifest after {AWSConfig.CATALOG_WRITE_RETRIES} attempts"
+        )
+
+    def _write_run(self, run_id: str, table_name: str, entries: List[Dict]) -> str:
+        key = self._run_key(table_name, run_id)
+        self._put_json(key, {
+            "table": table_name,
+            "run_id": run_id,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "files": entries
+        })
+        return key
+
+    def publish(self, table_name: str, entries: List[Dict]):
+        # Re-staging a partition replaces the files previously current in it; tagged (sharded)
+        # uploads only replace files carrying the same tag, so shards can share a partition
+        replaced = {(entry["partition"], entry.get("file_tag")) for entry in entries}
+        untagged = {partition for partition, tag in replaced if tag is None}
+        keys = {entry["key"] for entry in entries}
+
+        def update(current: List[Dict]) -> List[Dict]:
+            return [
+                e for e in current
+                if e["partition"] not in untagged and (e["partition"], e.get("file_tag")) not in replaced
+                and e["key"] not in keys
+            ] + entries
+
+        self._update_current(table_name, update)
+
+    def record(self, run_id: str, table_name: str, entries: List[Dict], publish: bool = True) -> str:
+        key = self._write_run(run_id, table_name, entries)
+        if publish:
+            self.publish(table_name, entries)
+
+        logger.info(f"Recorded {len(entries)} staged files for {table_name} run {run_id}")
+        return key
+
+    def current_files(self, table_name: str) -> List[Dict]:
+        entries, _ = self._read_current(table_name)
+        if entries is None:
+            logger.warning(f"No current manifest for {table_name}, rebuilding from a prefix listing")
+            return self.rebuild(table_name)
+        return entries
+
+    def swap(self, table_name: str, removed_keys: List[str], added: List[Dict]):
+        removed = set(removed_keys)
+        self._update_current(table_name, lambda current: [e for e in current if e["key"] not in removed] + added)
+        logger.info(f"Swapped {len(removed)} files for {len(added)} in the {table_name} manifest")
+
+    def mark_loaded(self, entries: List[Dict]):
+        # Compaction only rewrites files whose load has committed, so it never deletes a published
+        # file that a running load still has to copy
+        loaded_at = datetime.utcnow().isoformat()
+        keys_by_table: Dict[str, set] = {}
+        for entry in entries:
+            keys_by_table.setdefault(entry["table"], set()).add(entry["key"])
+
+        for table_name, keys in keys_by_table.items():
+            self._update_current(table_name, lambda current, keys=keys: [
+                {**e, "loaded_at": loaded_at} if e["key"] in keys and not e.get("loaded_at") else e
+                for e in current
+            ])
+            logger.info(f"Marked {len(keys)} {table_name} files as loaded")
+
+    def get_run(self, run_id: str, table_name: str) -> List[Dict]:
+        manifest = self._get_json(self._run_key(table_name, run_id))
+        return manifest["files"] if manifest else []
+
+    def list_runs(self, table_name: str) -> List[str]:
+        prefix = f"{self.catalog_prefix}{table_name}/run_id="
+        return [obj["Key"][len(prefix):-len(".json")] for obj in self._list(prefix)]
+
+    def _read_row_count(self, key: str) -> int:
+        # Only the Parquet footer is fetched: 8 bytes for its length, then the footer itself
+        tail = self.s3_client.get_object(Bucket=self.bucket, Key=key, Range="bytes=-8")["Body"].read()
+        footer_length = int.from_bytes(tail[:4], "little")
+        footer = self.s3_client.get_object(
+            Bucket=self.bucket, Key=key, Range=f"bytes=-{footer_length + 8}"
+        )["Body"].read()
+        return pq.read_metadata(io.BytesIO(b"PAR1" + footer)).num_rows
+
+    def rebuild(self, table_name: str) -> List[Dict]:
+        table_prefix = f"{self.staging_prefix}{table_name}/"
+        entries = []
+        for obj in self._list(table_prefix):
+            key = obj["Key"]
+            if not key.endswith(".parquet"):
+                continue
+            entries.append({
+                "table": table_name,
+                "partition": key[len(table_prefix):].rsplit("/", 1)[0],
+                "key": key,
+                "row_count": self._read_row_count(key),
+                "bytes": obj["Size"],
+                "checksum": None,
+                "etag": obj["ETag"].strip('"'),
+                "run_id": "rebuilt",
+                "staged_at": obj["LastModified"].isoformat()
+            })
+
+        self._write_run("rebuilt", table_name, entries)
+        try:
+            self._write_current(table_name, entries)
+        except ClientError as e:
+            if not self._is_conflict(e):
+                raise
+            # Another writer created the view first; theirs already reflects the listing
+            return self.current_files(table_name)
+        return entries
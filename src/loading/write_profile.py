@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config.config import AWSConfig
+
+# Clustering keys applied before writing so row-group min/max statistics are selective
+SORT_KEYS = {
+    "fact_daily_prices": ["company_id", "date"],
+    "fact_daily_indicators": ["company_id", "date"],
+    "fact_intraday_prices": ["company_id", "bar_time"],
+    "agg_company_ohlcv": ["period_type", "period_start", "company_id"],
+    "agg_sector_ohlcv": ["period_type", "period_start", "sector_id"]
+}
+
+DICTIONARY_COLUMNS = ["symbol", "date", "sector", "company_id", "sector_id"]
+
+
+class ParquetWriteProfile:
+    def __init__(
+        self,
+        name: str,
+        compression: str = "snappy",
+        compression_level: Optional[int] = None,
+        dictionary_columns: Optional[List[str]] = None,
+        row_group_size: Optional[int] = None,
+        presort: bool = False
+    ):
+        self.name = name
+        self.compression = compression
+        self.compression_level = compression_level
+        self.dictionary_columns = dictionary_columns
+        self.row_group_size = row_group_size
+        self.presort = presort
+
+    def writer_options(self, schema: pa.Schema) -> Dict:
+        options = {"compression": self.compression, "compression_level": self.compression_level}
+        if self.dictionary_columns is not None:
+            options["use_dictionary"] = [c for c in self.dictionary_columns if c in schema.names]
+        return options
+
+    def write_table(self, table: pa.Table, where):
+        pq.write_table(table, where, row_group_size=self.row_group_size, **self.writer_options(table.schema))
+
+
+WRITE_PROFILES = {
+    "default": ParquetWriteProfile("default"),
+    "snappy": ParquetWriteProfile(
+        "snappy",
+        compression="snappy",
+        dictionary_columns=DICTIONARY_COLUMNS,
+        row_group_size=1_000_000,
+        presort=True
+    ),
+    "zstd": ParquetWriteProfile(
+        "zstd",
+        compression="zstd",
+        compression_level=3,
+        dictionary_columns=DICTIONARY_COLUMNS,
+        row_group_size=1_000_000,
+        presort=True
+    ),
+    "zstd_max": ParquetWriteProfile(
+        "zstd_max",
+        compression="zstd",
+        compression_level=9,
+        dictionary_columns=DICTIONARY_COLUMNS,
+        row_group_size=1_000_000,
+        presort=True
+    )
+}
+
+
+def get_write_profile(name: str = None) -> ParquetWriteProfile:
+    name = name or AWSConfig.PARQUET_WRITE_PROFILE
+    if name not in WRITE_PROFILES:
+        raise ValueError(f"Unknown Parquet write profile: {name}")
+    return WRITE_PROFILES[name]
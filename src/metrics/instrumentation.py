@@ -0,0 +1,274 @@
+import os
+import re
+import sys
+import time
+import socket
+import logging
+import resource
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List
+
+import pandas as pd
+
+from config.config import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "buckets": {str(le): c for le, c in zip(self.buckets + ["+Inf"], self.counts)}
+        }
+
+
+class StageMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "counters": dict(self.counters),
+            "histograms": {name: h.to_dict() for name, h in self.histograms.items()}
+        }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = None):
+        self.enabled = MetricsConfig.ENABLED if enabled is None else enabled
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, stage: str) -> StageMetrics:
+        metrics = self.stages.get(stage)
+        if metrics is None:
+            metrics = self.stages.setdefault(stage, StageMetrics())
+        return metrics
+
+    @contextmanager
+    def stage(self, stage: str):
+        if not self.enabled:
+            yield
+            return
+
+        # Process CPU time, so work fanned out to thread pools is included
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with self._lock:
+                metrics = self._stage(stage)
+                metrics.calls += 1
+                metrics.wall_seconds += wall
+                metrics.cpu_seconds += cpu
+                metrics.peak_rss_mb = max(metrics.peak_rss_mb, peak_rss_mb())
+
+    def count(self, stage: str, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            counters = self._stage(stage).counters
+            counters[name] = counters.get(name, 0) + value
+
+    def observe(self, stage: str, name: str, value: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histograms = self._stage(stage).histograms
+            if name not in histograms:
+                histograms[name] = Histogram(MetricsConfig.LATENCY_BUCKETS)
+            histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {stage: metrics.to_dict() for stage, metrics in self.stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+
+registry = MetricsRegistry()
+
+
+def instrument(stage: str):
+    # Times every call; DataFrame results also count as rows_out
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+
+            with registry.stage(stage):
+                result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                registry.count(stage, "rows_out", len(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def stage(name: str):
+    return registry.stage(name)
+
+
+def count(stage_name: str, name: str, value: float = 1):
+    registry.count(stage_name, name, value)
+
+
+def observe(stage_name: str, name: str, value: float):
+    registry.observe(stage_name, name, value)
+
+
+def timer(stage_name: str, name: str):
+    return registry.timer(stage_name, name)
+
+
+def _metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts))
+
+
+def statsd_lines(snapshot: Dict[str, Dict], prefix: str, tags: Dict[str, str] = None) -> List[str]:
+    # Tags use the DogStatsD extension
+    suffix = "|#" + ",".join(f"{k}:{v}" for k, v in tags.items()) if tags else ""
+    lines = []
+    for stage_name, metrics in snapshot.items():
+        base = f"{prefix}.{stage_name}"
+        lines.append(f"{base}.wall_seconds:{metrics['wall_seconds'] * 1000:.3f}|ms{suffix}")
+        lines.append(f"{base}.cpu_seconds:{metrics['cpu_seconds'] * 1000:.3f}|ms{suffix}")
+        lines.append(f"{base}.peak_rss_mb:{metrics['peak_rss_mb']}|g{suffix}")
+        for name, value in metrics["counters"].items():
+            lines.append(f"{base}.{name}:{value}|c{suffix}")
+        for name, histogram in metrics["histograms"].items():
+            lines.append(f"{base}.{name}.count:{histogram['count']}|c{suffix}")
+            lines.append(f"{base}.{name}.sum:{histogram['sum'] * 1000:.3f}|ms{suffix}")
+            lines.append(f"{base}.{name}.max:{histogram['max'] * 1000:.3f}|ms{suffix}")
+    return lines
+
+
+def send_statsd(snapshot: Dict[str, Dict], tags: Dict[str, str] = None):
+    if not MetricsConfig.STATSD_HOST:
+        return
+
+    lines = statsd_lines(snapshot, MetricsConfig.PREFIX, tags)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Keep datagrams under a typical MTU
+        packet = []
+        for line in lines:
+            if packet and sum(len(p) + 1 for p in packet) + len(line) > 1400:
+                sock.sendto("\n".join(packet).encode("utf-8"), (MetricsConfig.STATSD_HOST, MetricsConfig.STATSD_PORT))
+                packet = []
+            packet.append(line)
+        if packet:
+            sock.sendto("\n".join(packet).encode("utf-8"), (MetricsConfig.STATSD_HOST, MetricsConfig.STATSD_PORT))
+    except OSError as e:
+        logger.warning(f"Could not send metrics to StatsD: {e}")
+    finally:
+        sock.close()
+
+
+def prometheus_text(snapshot: Dict[str, Dict], prefix: str, labels: Dict[str, str] = None) -> str:
+    labels = labels or {}
+
+    def label_str(extra: Dict[str, str]) -> str:
+        merged = {**labels, **extra}
+        return "{" + ",".join(f'{k}="{v}"' for k, v in merged.items()) + "}"
+
+    lines = []
+    for stage_name, metrics in snapshot.items():
+        stage_labels = {"stage": stage_name}
+        for field in ("calls", "wall_seconds", "cpu_seconds", "peak_rss_mb"):
+            lines.append(f"{_metric_name(prefix, 'stage', field)}{label_str(stage_labels)} {metrics[field]}")
+        for name, value in metrics["counters"].items():
+            lines.append(f"{_metric_name(prefix, name, 'total')}{label_str(stage_labels)} {value}")
+        for name, histogram in metrics["histograms"].items():
+            metric = _metric_name(prefix, name)
+            cumulative = 0
+            for le, bucket_count in histogram["buckets"].items():
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{label_str({**stage_labels, 'le': le})} {cumulative}")
+            lines.append(f"{metric}_sum{label_str(stage_labels)} {histogram['sum']}")
+            lines.append(f"{metric}_count{label_str(stage_labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(snapshot: Dict[str, Dict], name: str, labels: Dict[str, str] = None):
+    if not MetricsConfig.PROMETHEUS_TEXTFILE_DIR:
+        return
+
+    # node_exporter reads *.prom files; write-then-rename so it never sees a partial file
+    os.makedirs(MetricsConfig.PROMETHEUS_TEXTFILE_DIR, exist_ok=True)
+    path = os.path.join(MetricsConfig.PROMETHEUS_TEXTFILE_DIR, f"{_metric_name(MetricsConfig.PREFIX, name)}.prom")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text(snapshot, MetricsConfig.PREFIX, labels))
+    os.replace(tmp_path, path)
+
+
+def publish_task_metrics(context: Dict):
+    # Airflow success/failure callback: XCom for the UI, then StatsD and the Prometheus textfile
+    if not registry.enabled:
+        return
+
+    ti = context["ti"]
+    snapshot = registry.snapshot()
+    registry.reset()
+
+    labels = {"dag_id": ti.dag_id, "task_id": ti.task_id}
+    name = f"{ti.dag_id}_{ti.task_id}"
+    if getattr(ti, "map_index", -1) >= 0:
+        labels["map_index"] = str(ti.map_index)
+        name = f"{name}_{ti.map_index}"
+
+    ti.xcom_push(key="metrics", value=snapshot)
+    send_statsd(snapshot, labels)
+    write_prometheus_textfile(snapshot, name, labels)
@@ -0,0 +1,211 @@
+import io
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config.config import AWSConfig, ETLConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore(ABC):
+    @abstractmethod
+    def write(self, df: pd.DataFrame, run_id: str, name: str) -> Dict:
+        pass
+
+    @abstractmethod
+    def read(self, manifest: Dict) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def iter_batches(self, manifest: Dict, batch_size: int) -> Iterator[pa.RecordBatch]:
+        pass
+
+    @abstractmethod
+    def delete_run(self, run_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def expire(self, max_age: int) -> int:
+        pass
+
+    @staticmethod
+    def _safe_run_id(run_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", run_id)
+
+    @staticmethod
+    def _build_manifest(path: str, table: pa.Table, checksum: str, size: int) -> Dict:
+        return {
+            "path": path,
+            "format": "parquet",
+            "schema": [{"name": f.name, "type": str(f.type)} for f in table.schema],
+            "num_rows": table.num_rows,
+            "bytes": size,
+            "checksum": checksum,
+            "created_at": datetime.utcnow().isoformat()
+        }
+
+
+class LocalArtifactStore(ArtifactStore):
+    def __init__(self, root: str = None):
+        self.root = root or ETLConfig.ARTIFACT_ROOT
+
+    def _path(self, run_id: str, name: str) -> str:
+        return os.path.join(self.root, self._safe_run_id(run_id), f"{name}.parquet")
+
+    @staticmethod
+    def _checksum(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def write(self, df: pd.DataFrame, run_id: str, name: str) -> Dict:
+        path = self._path(run_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+        manifest = self._build_manifest(path, table, self._checksum(path), os.path.getsize(path))
+        logger.info(f"Wrote artifact {name} ({table.num_rows} rows) to {path}")
+        return manifest
+
+    def read(self, manifest: Dict) -> pd.DataFrame:
+        path = manifest["path"]
+        checksum = self._checksum(path)
+        if checksum != manifest["checksum"]:
+            raise ValueError(f"Checksum mismatch for artifact {path}")
+        return pq.read_table(path).to_pandas()
+
+    def iter_batches(self, manifest: Dict, batch_size: int) -> Iterator[pa.RecordBatch]:
+        return pq.ParquetFile(manifest["path"]).iter_batches(batch_size=batch_size)
+
+    def delete_run(self, run_id: str) -> int:
+        run_dir = os.path.join(self.root, self._safe_run_id(run_id))
+        if not os.path.isdir(run_dir):
+            return 0
+        removed = len(os.listdir(run_dir))
+        shutil.rmtree(run_dir, ignore_errors=True)
+        logger.info(f"Deleted {removed} artifacts for run {run_id}")
+        return removed
+
+    def expire(self, max_age: int) -> int:
+        # Runs that failed before their load committed never call delete_run; drop them once stale
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        for name in os.listdir(self.root):
+            run_dir = os.path.join(self.root, name)
+            if not os.path.isdir(run_dir):
+                continue
+            paths = [os.path.join(run_dir, f) for f in os.listdir(run_dir)]
+            if all(os.path.getmtime(path) < cutoff for path in paths):
+                removed += len(paths)
+                shutil.rmtree(run_dir, ignore_errors=True)
+        if removed:
+            logger.info(f"Expired {removed} artifacts older than {max_age}s")
+        return removed
+
+
+class S3ArtifactStore(ArtifactStore):
+    # Shared across workers, so mapped tasks on different hosts can hand artifacts to each other
+    def __init__(self, s3_client=None, bucket: str = None, prefix: str = None):
+        self.s3_client = s3_client or boto3.client(
+            "s3",
+            aws_access_key_id=AWSConfig.ACCESS_KEY_ID,
+            aws_secret_access_key=AWSConfig.SECRET_ACCESS_KEY,
+            region_name=AWSConfig.REGION
+        )
+        self.bucket = bucket or AWSConfig.S3_BUCKET
+        self.prefix = prefix or AWSConfig.S3_ARTIFACT_PREFIX
+
+    def _key(self, run_id: str, name: str) -> str:
+        return f"{self.prefix}{self._safe_run_id(run_id)}/{name}.parquet"
+
+    def _list(self, prefix: str) -> List[Dict]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        objects = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+    def _get(self, manifest: Dict) -> bytes:
+        key = manifest["path"].split(f"s3://{self.bucket}/", 1)[-1]
+        body = self.s3_client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        if hashlib.sha256(body).hexdigest() != manifest["checksum"]:
+            raise ValueError(f"Checksum mismatch for artifact {manifest['path']}")
+        return body
+
+    def write(self, df: pd.DataFrame, run_id: str, name: str) -> Dict:
+        key = self._key(run_id, name)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        body = buffer.getvalue()
+        self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=body)
+
+        path = f"s3://{self.bucket}/{key}"
+        manifest = self._build_manifest(path, table, hashlib.sha256(body).hexdigest(), len(body))
+        logger.info(f"Wrote artifact {name} ({table.num_rows} rows) to {path}")
+        return manifest
+
+    def read(self, manifest: Dict) -> pd.DataFrame:
+        return pq.read_table(io.BytesIO(self._get(manifest))).to_pandas()
+
+    def iter_batches(self, manifest: Dict, batch_size: int) -> Iterator[pa.RecordBatch]:
+        return pq.ParquetFile(io.BytesIO(self._get(manifest))).iter_batches(batch_size=batch_size)
+
+    def delete_run(self, run_id: str) -> int:
+        objects = self._list(f"{self.prefix}{self._safe_run_id(run_id)}/")
+        for obj in objects:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=obj["Key"])
+        if objects:
+            logger.info(f"Deleted {len(objects)} artifacts for run {run_id}")
+        return len(objects)
+
+    def expire(self, max_age: int) -> int:
+        cutoff = datetime.now(timezone.utc).timestamp() - max_age
+        runs = {}
+        for obj in self._list(self.prefix):
+            run_dir = obj["Key"][len(self.prefix):].split("/", 1)[0]
+            runs.setdefault(run_dir, []).append(obj)
+
+        removed = 0
+        for objects in runs.values():
+            if all(obj["LastModified"].timestamp() < cutoff for obj in objects):
+                for obj in objects:
+                    self.s3_client.delete_object(Bucket=self.bucket, Key=obj["Key"])
+                removed += len(objects)
+        if removed:
+            logger.info(f"Expired {removed} artifacts older than {max_age}s")
+        return removed
+
+
+ARTIFACT_STORES = {
+    "local": LocalArtifactStore,
+    "s3": S3ArtifactStore
+}
+
+
+def get_artifact_store(backend: str = None) -> ArtifactStore:
+    backend = backend or ETLConfig.ARTIFACT_BACKEND
+    if backend not in ARTIFACT_STORES:
+        raise ValueError(f"Unknown artifact backend: {backend}")
+    return ARTIFACT_STORES[backend]()
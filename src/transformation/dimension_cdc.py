@@ -0,0 +1,128 @@
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from config.config import ETLConfig
+
+logger = logging.getLogger(__name__)
+
+# Columns stamped per run; they never count as a change on their own
+AUDIT_COLUMNS = ["created_at", "updated_at", "is_active"]
+
+DIMENSION_KEYS = {
+    "dim_sector": ["sector"],
+    "dim_company": ["symbol"]
+}
+
+HASH_COLUMN = "_row_hash"
+
+
+class DimensionSnapshot:
+    def __init__(self, table_name: str, root: str = None):
+        root = root or ETLConfig.DIMENSION_SNAPSHOT_DIR
+        self.table_name = table_name
+        self.keys = DIMENSION_KEYS[table_name]
+        self.path = os.path.join(root, table_name)
+        self.current_path = os.path.join(self.path, "current.parquet")
+
+    def _pending_path(self, run_id: str) -> str:
+        return os.path.join(self.path, "pending", f"{re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)}.parquet")
+
+    def _row_hashes(self, df: pd.DataFrame) -> pd.Series:
+        columns = [c for c in df.columns if c not in AUDIT_COLUMNS and c != HASH_COLUMN]
+        return pd.util.hash_pandas_object(df[columns], index=False)
+
+    def read(self) -> pd.DataFrame:
+        if not os.path.exists(self.current_path):
+            return pd.DataFrame()
+        return pd.read_parquet(self.current_path)
+
+    def diff(self, df: pd.DataFrame, run_id: str) -> pd.DataFrame:
+        current = df.assign(is_active=True)
+        current[HASH_COLUMN] = self._row_hashes(current).to_numpy()
+        previous = self.read()
+
+        if previous.empty:
+            inserted = current
+            updated = deleted = current.iloc[0:0]
+        else:
+            merged = current[self.keys + [HASH_COLUMN]].merge(
+                previous[self.keys + [HASH_COLUMN]], on=self.keys, how="outer",
+                suffixes=("", "_previous"), indicator=True
+            )
+            inserted_keys = merged.loc[merged["_merge"] == "left_only", self.keys]
+            updated_keys = merged.loc[
+                (merged["_merge"] == "both") & (merged[HASH_COLUMN] != merged[f"{HASH_COLUMN}_previous"]), self.keys
+            ]
+            deleted_keys = merged.loc[merged["_merge"] == "right_only", self.keys]
+
+            inserted = current.merge(inserted_keys, on=self.keys)
+            updated = current.merge(updated_keys, on=self.keys)
+            deleted = previous.merge(deleted_keys, on=self.keys).assign(is_active=False)
+
+            # Updates keep the original created_at; deletes are soft and keep the last published values
+            if "created_at" in current.columns:
+                updated = updated.drop(columns="created_at").merge(previous[self.keys + ["created_at"]], on=self.keys)
+            if "updated_at" in deleted.columns:
+                deleted["updated_at"] = datetime.utcnow().isoformat()
+
+        # Next snapshot: everything still listed, with created_at carried over for unchanged rows
+        unchanged = previous.merge(
+            current[self.keys + [HASH_COLUMN]], on=self.keys + [HASH_COLUMN]
+        ) if not previous.empty else previous
+        snapshot = pd.concat([unchanged, inserted, updated], ignore_index=True)
+        self._write_pending(snapshot, run_id)
+
+        changes = pd.concat([inserted, updated, deleted], ignore_index=True)
+        logger.info(
+            f"{self.table_name} changes: {len(inserted)} inserted, {len(updated)} updated, "
+            f"{len(deleted)} deleted, {len(current) - len(inserted) - len(updated)} unchanged"
+        )
+        return changes.drop(columns=[HASH_COLUMN])[list(df.columns) + ["is_active"]]
+
+    def _write_pending(self, snapshot: pd.DataFrame, run_id: str):
+        path = self._pending_path(run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        snapshot.to_parquet(path, index=False)
+
+    def commit(self, run_id: str):
+        # Only called once the changes are loaded, so a failed load re-diffs against the old snapshot
+        path = self._pending_path(run_id)
+        if not os.path.exists(path):
+            return
+        os.replace(path, self.current_path)
+        logger.info(f"Committed {self.table_name} snapshot for run {run_id}")
+
+    def expire_pending(self, max_age: int) -> int:
+        # Pending files from runs whose load never committed are never promoted; drop them once stale
+        pending_dir = os.path.join(self.path, "pending")
+        if not os.path.isdir(pending_dir):
+            return 0
+        cutoff = time.time() - max_age
+        stale = [
+            os.path.join(pending_dir, name) for name in os.listdir(pending_dir)
+            if os.path.getmtime(os.path.join(pending_dir, name)) < cutoff
+        ]
+        for path in stale:
+            os.remove(path)
+        if stale:
+            logger.info(f"Expired {len(stale)} pending {self.table_name} files")
+        return len(stale)
+
+
+def diff_dimensions(dimensions: Dict[str, pd.DataFrame], run_id: str) -> Dict[str, pd.DataFrame]:
+    return {table: DimensionSnapshot(table).diff(df, run_id) for table, df in dimensions.items()}
+
+
+def commit_dimensions(tables: List[str], run_id: str):
+    for table in tables:
+        DimensionSnapshot(table).commit(run_id)
+
+
+def expire_pending_dimensions(tables: List[str], max_age: int) -> int:
+    return sum(DimensionSnapshot(table).expire_pending(max_age) for table in tables)
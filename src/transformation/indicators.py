@@ -0,0 +1,173 @@
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.config import ETLConfig
+from src.ingestion.price_cache import PriceCache
+from src.metrics import instrumentation as metrics
+
+logger = logging.getLogger(__name__)
+
+SMA_WINDOWS = [20, 50, 200]
+VOLATILITY_WINDOW = 20
+VWAP_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+
+HISTORY_COLUMNS = ["symbol", "date", "high", "low", "close", "volume"]
+
+# (company_ids, start_date, end_date) -> fact_daily_prices rows for those companies in [start, end)
+HistorySource = Callable[[List[int], str, str], pd.DataFrame]
+
+# Trailing bars needed before the first new date so every window is complete
+LOOKBACK_BARS = max(SMA_WINDOWS + [VOLATILITY_WINDOW + 1, VWAP_WINDOW])
+LOOKBACK_CALENDAR_DAYS = LOOKBACK_BARS * 7 // 5 + 30
+
+INDICATOR_COLUMNS = [
+    "company_id", "date", "close", "return_1d", "log_return_1d",
+    *[f"sma_{w}" for w in SMA_WINDOWS], f"volatility_{VOLATILITY_WINDOW}", f"vwap_{VWAP_WINDOW}", "computed_at"
+]
+
+
+class IndicatorCalculator:
+    def __init__(self, cache: Optional[PriceCache] = None, history_source: Optional[HistorySource] = None):
+        if cache is None and ETLConfig.USE_PRICE_CACHE:
+            cache = PriceCache()
+        self.cache = cache
+        self.history_source = history_source
+
+    def _cached_history(self, first_dates: pd.Series) -> pd.DataFrame:
+        frames = []
+        for symbol, first_date in first_dates.items():
+            start = (first_date - pd.Timedelta(days=LOOKBACK_CALENDAR_DAYS)).strftime("%Y-%m-%d")
+            bars = self.cache.read(symbol, start, first_date.strftime("%Y-%m-%d"))
+            if len(bars):
+                frames.append(bars[HISTORY_COLUMNS])
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    def _sourced_history(self, first_dates: pd.Series, company_ids: pd.Series) -> pd.DataFrame:
+        start = (first_dates.min() - pd.Timedelta(days=LOOKBACK_CALENDAR_DAYS)).strftime("%Y-%m-%d")
+        end = first_dates.max().strftime("%Y-%m-%d")
+        rows = self.history_source(company_ids.reindex(first_dates.index).astype("int64").tolist(), start, end)
+        symbols = pd.Series(company_ids.index.to_numpy(), index=company_ids.to_numpy())
+        return pd.DataFrame({
+            "symbol": symbols.reindex(rows["company_id"].to_numpy()).to_numpy(),
+            "date": pd.to_datetime(rows["date"]).to_numpy(),
+            **{c: rows[c].to_numpy(dtype="float64") for c in ["high", "low", "close", "volume"]}
+        })
+
+    def _history(self, new_bars: pd.DataFrame, company_ids: pd.Series) -> pd.DataFrame:
+        # Only the trailing LOOKBACK_BARS before each symbol's first new date, never the full history
+        first_dates = new_bars.groupby("symbol")["date"].min()
+        history = self._cached_history(first_dates) if self.cache is not None else None
+
+        # The cache is local to a worker and may be cold; symbols it cannot cover are seeded from the source
+        if self.history_source is not None:
+            counts = (
+                history.groupby("symbol").size().reindex(first_dates.index, fill_value=0)
+                if history is not None else pd.Series(0, index=first_dates.index)
+            )
+            short = first_dates[counts < LOOKBACK_BARS]
+            if len(short):
+                sourced = self._sourced_history(short, company_ids)
+                metrics.count("indicators", "sourced_history_rows", len(sourced))
+                history = sourced if history is None else pd.concat([history, sourced], ignore_index=True)
+
+        if history is None or history.empty:
+            return new_bars.iloc[0:0][HISTORY_COLUMNS]
+
+        history = history.drop_duplicates(subset=["symbol", "date"], keep="last")
+        history = history[history["date"] < history["symbol"].map(first_dates)]
+        return history.sort_values(["symbol", "date"]).groupby("symbol").tail(LOOKBACK_BARS).reset_index(drop=True)
+
+    def _check_history(self, new_bars: pd.DataFrame, history: pd.DataFrame):
+        # Symbols without LOOKBACK_BARS trailing bars get NULL windows on their first new dates
+        counts = history.groupby("symbol").size().reindex(new_bars["symbol"].unique(), fill_value=0)
+        short = counts[counts < LOOKBACK_BARS]
+        metrics.count("indicators", "short_history_symbols", len(short))
+        if short.empty:
+            return
+
+        source = "price cache is disabled" if self.cache is None else f"price cache at {self.cache.root}"
+        if self.history_source is not None:
+            source += " and fact_daily_prices"
+        message = (
+            f"{len(short)} of {len(counts)} symbols have fewer than {LOOKBACK_BARS} trailing bars "
+            f"({source}), so their rolling indicators start as NULL: {short.head(10).to_dict()}"
+        )
+        if ETLConfig.INDICATOR_REQUIRE_HISTORY:
+            raise ValueError(message)
+        logger.warning(message)
+
+    @staticmethod
+    def _rolling(grouped: pd.core.groupby.SeriesGroupBy, window: int, how: str) -> np.ndarray:
+        rolled = getattr(grouped.rolling(window, min_periods=window), how)()
+        return rolled.reset_index(level=0, drop=True).sort_index().to_numpy()
+
+    def _compute(self, bars: pd.DataFrame) -> pd.DataFrame:
+        bars = bars.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+        bars["volume"] = bars["volume"].astype("float64")
+        by_symbol = bars.groupby("symbol", sort=False)
+
+        previous_close = by_symbol["close"].shift(1)
+        bars["return_1d"] = bars["close"] / previous_close - 1
+        bars["log_return_1d"] = np.log(bars["close"] / previous_close)
+
+        for window in SMA_WINDOWS:
+            bars[f"sma_{window}"] = self._rolling(by_symbol["close"], window, "mean")
+
+        log_returns = bars.groupby("symbol", sort=False)["log_return_1d"]
+        bars[f"volatility_{VOLATILITY_WINDOW}"] = (
+            self._rolling(log_returns, VOLATILITY_WINDOW, "std") * np.sqrt(TRADING_DAYS_PER_YEAR)
+        )
+
+        bars["_turnover"] = (bars["high"] + bars["low"] + bars["close"]) / 3 * bars["volume"]
+        turnover = self._rolling(bars.groupby("symbol", sort=False)["_turnover"], VWAP_WINDOW, "sum")
+        volume = self._rolling(by_symbol["volume"], VWAP_WINDOW, "sum")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bars[f"vwap_{VWAP_WINDOW}"] = np.where(volume > 0, turnover / volume, np.nan)
+
+        return bars.drop(columns="_turnover")
+
+    @metrics.instrument("indicators")
+    def compute(self, fact_prices: pd.DataFrame, dim_company: pd.DataFrame) -> pd.DataFrame:
+        if fact_prices.empty:
+            return pd.DataFrame(columns=INDICATOR_COLUMNS)
+
+        symbols = dim_company.set_index("company_id")["symbol"]
+        new_bars = pd.DataFrame({
+            "symbol": symbols.reindex(fact_prices["company_id"].to_numpy()).to_numpy(),
+            "date": pd.to_datetime(fact_prices["date"]).to_numpy(),
+            "high": fact_prices["high"].to_numpy(dtype="float64"),
+            "low": fact_prices["low"].to_numpy(dtype="float64"),
+            "close": fact_prices["close"].to_numpy(dtype="float64"),
+            "volume": fact_prices["volume"].to_numpy(dtype="float64"),
+            "is_new": True
+        }).dropna(subset=["symbol"])
+
+        company_ids = pd.Series(symbols.index.to_numpy(), index=symbols.to_numpy())
+        history = self._history(new_bars, company_ids).assign(is_new=False)
+        self._check_history(new_bars, history)
+        bars = pd.concat([history, new_bars], ignore_index=True)
+        bars = bars.drop_duplicates(subset=["symbol", "date"], keep="last")
+        metrics.count("indicators", "rows_in", len(new_bars))
+        metrics.count("indicators", "history_rows", len(history))
+
+        computed = self._compute(bars)
+        computed = computed[computed["is_new"]]
+
+        indicators = computed.assign(
+            company_id=company_ids.reindex(computed["symbol"].to_numpy()).to_numpy(),
+            date=computed["date"].dt.strftime("%Y-%m-%d"),
+            computed_at=datetime.utcnow().isoformat()
+        )[INDICATOR_COLUMNS].reset_index(drop=True)
+
+        value_columns = INDICATOR_COLUMNS[3:-1]
+        indicators[value_columns] = indicators[value_columns].round(6)
+
+        logger.info(
+            f"Computed indicators for {len(indicators)} rows using {len(history)} trailing history rows"
+        )
+        return indicators
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.config import ETLConfig
+from src.metrics import instrumentation as metrics
+
+logger = logging.getLogger(__name__)
+
+# Pandas period aliases; W-SUN periods run Monday to Sunday
+PERIOD_TYPES = {
+    "week": "W-SUN",
+    "month": "M"
+}
+
+COMPANY_KEYS = ["company_id", "period_type", "period_start"]
+COMPANY_COLUMNS = COMPANY_KEYS + [
+    "first_date", "last_date", "open", "high", "low", "close", "volume", "turnover", "vwap", "trading_days", "updated_at"
+]
+SECTOR_KEYS = ["sector_id", "period_type", "period_start"]
+SECTOR_COLUMNS = SECTOR_KEYS + ["companies", "volume", "turnover", "vwap", "vw_return", "updated_at"]
+
+
+class RollupBuilder:
+    def __init__(self, root: str = None):
+        self.root = root or ETLConfig.ROLLUP_STATE_DIR
+        self.current_path = os.path.join(self.root, "company_periods.parquet")
+
+    def _pending_path(self, run_id: str) -> str:
+        return os.path.join(self.root, "pending", f"{re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)}.parquet")
+
+    def read_state(self) -> pd.DataFrame:
+        if not os.path.exists(self.current_path):
+            return pd.DataFrame(columns=COMPANY_COLUMNS)
+        return pd.read_parquet(self.current_path)
+
+    @staticmethod
+    def _aggregate(daily: pd.DataFrame) -> pd.DataFrame:
+        daily = daily.sort_values(["company_id", "date"], kind="stable")
+        grouped = daily.groupby(COMPANY_KEYS, sort=False)
+        return grouped.agg(
+            first_date=("date", "first"),
+            last_date=("date", "last"),
+            open=("open", "first"),
+            high=("high", "max"),
+            low=("low", "min"),
+            close=("close", "last"),
+            volume=("volume", "sum"),
+            turnover=("turnover", "sum"),
+            trading_days=("date", "size")
+        ).reset_index()
+
+    @staticmethod
+    def _combine(existing: pd.DataFrame, folded: pd.DataFrame) -> pd.DataFrame:
+        # New dates are always later than the existing period's, so open/first_date stay put
+        merged = folded.merge(existing, on=COMPANY_KEYS, how="left", suffixes=("", "_prev"))
+        has_prev = merged["first_date_prev"].notna().to_numpy()
+
+        merged["first_date"] = np.where(has_prev, merged["first_date_prev"], merged["first_date"])
+        merged["open"] = np.where(has_prev, merged["open_prev"], merged["open"])
+        merged["high"] = np.fmax(merged["high"], merged["high_prev"].astype("float64"))
+        merged["low"] = np.fmin(merged["low"], merged["low_prev"].astype("float64"))
+        for column in ("volume", "turnover", "trading_days"):
+            merged[column] = merged[column] + merged[f"{column}_prev"].fillna(0)
+        return merged.astype({"open": "float64", "volume": "int64", "trading_days": "int64"})
+
+    def _fold_state(
+        self,
+        state: pd.DataFrame,
+        fact_prices: pd.DataFrame,
+        now: str
+    ) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+        dates = pd.to_datetime(fact_prices["date"])
+        # Each company's last folded date; rows at or before it were already counted
+        watermarks = state.groupby("company_id")["last_date"].max() if len(state) else pd.Series(dtype="object")
+        watermark = pd.to_datetime(watermarks.reindex(fact_prices["company_id"].to_numpy()).to_numpy())
+        fresh = (dates.to_numpy() > watermark) | pd.isna(watermark)
+
+        skipped = int((~fresh).sum())
+        if skipped:
+            logger.info(f"Skipping {skipped} price rows already folded into rollups")
+
+        daily = fact_prices[fresh]
+        daily = pd.DataFrame({
+            "company_id": daily["company_id"].to_numpy(),
+            "date": dates[fresh].dt.strftime("%Y-%m-%d").to_numpy(),
+            "open": daily["open"].to_numpy(dtype="float64"),
+            "high": daily["high"].to_numpy(dtype="float64"),
+            "low": daily["low"].to_numpy(dtype="float64"),
+            "close": daily["close"].to_numpy(dtype="float64"),
+            "volume": daily["volume"].to_numpy(dtype="int64"),
+            "turnover": ((daily["high"] + daily["low"] + daily["close"]) / 3 * daily["volume"]).to_numpy("float64"),
+            "_date": dates[fresh].to_numpy()
+        })
+        metrics.count("rollups", "rows_in", len(daily))
+        if daily.empty:
+            return state, None
+
+        frames = []
+        for period_type, alias in PERIOD_TYPES.items():
+            periods = daily["_date"].dt.to_period(alias).dt.start_time.dt.strftime("%Y-%m-%d")
+            frames.append(daily.assign(period_type=period_type, period_start=periods.to_numpy()))
+        folded = self._aggregate(pd.concat(frames, ignore_index=True))
+
+        touched = self._combine(state, folded)
+        touched["vwap"] = touched["turnover"] / touched["volume"].where(touched["volume"] > 0)
+        touched["updated_at"] = now
+        touched = touched[COMPANY_COLUMNS]
+
+        untouched = state.merge(touched[COMPANY_KEYS], on=COMPANY_KEYS, how="left", indicator=True)
+        untouched = untouched[untouched["_merge"] == "left_only"].drop(columns="_merge")
+        new_state = pd.concat([untouched, touched], ignore_index=True) if len(untouched) else touched
+        logger.info(f"Folded {len(daily)} price rows into {len(touched)} company periods")
+        return new_state, touched
+
+    @metrics.instrument("rollups")
+    def fold(self, fact_prices: pd.DataFrame, dim_company: pd.DataFrame, run_id: str) -> Dict[str, pd.DataFrame]:
+        state = self.read_state()
+        now = datetime.utcnow().isoformat()
+
+        new_state, touched = self._fold_state(state, fact_prices, now)
+        self._write_pending(new_state, run_id)
+        if touched is None:
+            return {"agg_company_ohlcv": pd.DataFrame(columns=COMPANY_COLUMNS),
+                    "agg_sector_ohlcv": pd.DataFrame(columns=SECTOR_COLUMNS)}
+
+        sectors = self._sector_rollups(new_state, touched, dim_company, now)
+        logger.info(f"Restated {len(touched)} company periods and {len(sectors)} sector periods")
+        return {"agg_company_ohlcv": touched.reset_index(drop=True), "agg_sector_ohlcv": sectors}
+
+    @metrics.instrument("rollups")
+    def seed(
+        self,
+        fact_chunks: Iterable[pd.DataFrame],
+        dim_company: pd.DataFrame,
+        run_id: str
+    ) -> Dict[str, pd.DataFrame]:
+        # Rebuilds the state from scratch (e.g. from fact_daily_prices after a backfill), since the
+        # watermark makes fold() skip any history older than what it has already folded.
+        # Chunks must arrive in date order so each one only adds later dates.
+        state = pd.DataFrame(columns=COMPANY_COLUMNS)
+        now = datetime.utcnow().isoformat()
+        for chunk in fact_chunks:
+            state, _ = self._fold_state(state, chunk, now)
+
+        state = state.reset_index(drop=True)
+        self._write_pending(state, run_id)
+        sectors = self._sector_rollups(state, state, dim_company, now)
+        logger.info(f"Seeded rollups with {len(state)} company periods and {len(sectors)} sector periods")
+        return {"agg_company_ohlcv": state, "agg_sector_ohlcv": sectors}
+
+    @staticmethod
+    def _sector_rollups(
+        state: pd.DataFrame,
+        touched: pd.DataFrame,
+        dim_company: pd.DataFrame,
+        now: str
+    ) -> pd.DataFrame:
+        sector_ids = dim_company.set_index("company_id")["sector_id"]
+        state = state.assign(sector_id=sector_ids.reindex(state["company_id"].to_numpy()).to_numpy())
+        touched_keys = touched[["company_id", "period_type", "period_start"]].assign(
+            sector_id=sector_ids.reindex(touched["company_id"].to_numpy()).to_numpy()
+        )[SECTOR_KEYS].drop_duplicates()
+
+        # Recompute each touched sector period over every company in it, from the folded state
+        rows = state.merge(touched_keys, on=SECTOR_KEYS).dropna(subset=["sector_id"])
+        rows = rows.assign(
+            weighted_return=(rows["close"] / rows["open"] - 1) * rows["volume"]
+        )
+        sectors = rows.groupby(SECTOR_KEYS).agg(
+            companies=("company_id", "nunique"),
+            volume=("volume", "sum"),
+            turnover=("turnover", "sum"),
+            weighted_return=("weighted_return", "sum")
+        ).reset_index()
+
+        valid_volume = sectors["volume"].where(sectors["volume"] > 0)
+        sectors["vwap"] = sectors["turnover"] / valid_volume
+        sectors["vw_return"] = sectors["weighted_return"] / valid_volume
+        sectors["sector_id"] = sectors["sector_id"].astype("int64")
+        sectors["updated_at"] = now
+        return sectors[SECTOR_COLUMNS]
+
+    def _write_pending(self, state: pd.DataFrame, run_id: str):
+        path = self._pending_path(run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state.to_parquet(path, index=False)
+
+    def commit(self, run_id: str):
+        # Called once the rollups are loaded, so a failed run folds the same dates again
+        path = self._pending_path(run_id)
+        if not os.path.exists(path):
+            return
+        os.replace(path, self.current_path)
+        logger.info(f"Committed rollup state for run {run_id}")
+
+    def expire_pending(self, max_age: int) -> int:
+        # A run that fails before commit() leaves its folded state behind; the next run folds afresh
+        pending_dir = os.path.join(self.root, "pending")
+        if not os.path.isdir(pending_dir):
+            return 0
+        cutoff = time.time() - max_age
+        stale = [
+            os.path.join(pending_dir, name) for name in os.listdir(pending_dir)
+            if os.path.getmtime(os.path.join(pending_dir, name)) < cutoff
+        ]
+        for path in stale:
+            os.remove(path)
+        if stale:
+            logger.info(f"Expired {len(stale)} pending rollup files")
+        return len(stale)
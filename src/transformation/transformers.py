@@ -1,93 +1,183 @@
+import hashlib
 import logging
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import Iterable, Iterator, List, Dict, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from src.transformation.validators import DataValidator
+from src.metrics import instrumentation as metrics
+from src.transformation.validators import DataValidator, CLEAN_MASK
 
 logger = logging.getLogger(__name__)
 
+Records = Union[pd.DataFrame, List[Dict]]
+
+EPOCH = pd.Timestamp("1970-01-01")
+PRICE_ID_DAY_BITS = 20
+
+
+def _as_frame(data: Records) -> pd.DataFrame:
+    return data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+
 
 class StockDataTransformer:
     def __init__(self):
         self.validator = DataValidator()
 
-    def create_dim_sector(self, company_data: List[Dict]) -> pd.DataFrame:
-        df = pd.DataFrame(company_data)
-        sectors = df[["sector"]].drop_duplicates()
-        sectors = sectors.reset_index(drop=True)
-        sectors["sector_id"] = range(1, len(sectors) + 1)
+    @staticmethod
+    def _lookup_ids(keys: pd.Series, lookup_keys: pd.Series, lookup_ids: pd.Series) -> pd.Series:
+        # Resolve each distinct key once, then broadcast through the categorical codes
+        unique_keys = ~pd.Index(lookup_keys).duplicated()
+        lookup_index = pd.Index(lookup_keys[unique_keys])
+        lookup_values = lookup_ids.to_numpy()[unique_keys]
+
+        categorical = keys.astype("category")
+        # A trailing -1/0 sentinel covers null keys and empty lookups
+        category_positions = np.append(lookup_index.get_indexer(categorical.cat.categories), -1)
+        positions = category_positions[categorical.cat.codes.to_numpy()]
+
+        ids = pd.Series(np.append(lookup_values, 0)[positions], index=keys.index, dtype="Int64")
+        return ids.mask(positions < 0)
+
+    @staticmethod
+    def _date_columns(dates: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        codes, uniques = pd.factorize(pd.to_datetime(dates))
+        uniques = pd.DatetimeIndex(uniques)
+        formatted = uniques.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        day_numbers = ((uniques - EPOCH) // pd.Timedelta(days=1)).to_numpy(dtype="int64")
+        return np.append(formatted, None)[codes], np.append(day_numbers, -1)[codes]
+
+    @staticmethod
+    def _stable_ids(values: pd.Series) -> pd.Series:
+        # 31-bit ids derived from the natural key, so reruns and overlapping windows reuse the same ids
+        codes, uniques = pd.factorize(values)
+        ids = np.array([
+            int.from_bytes(hashlib.blake2b(str(v).encode("utf-8"), digest_size=4).digest(), "big") & 0x7FFFFFFF
+            for v in uniques
+        ], dtype="int64")
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError(f"Surrogate key collision among {len(ids)} natural keys")
+
+        resolved = pd.Series(np.append(ids, 0)[codes], index=values.index, dtype="Int64")
+        return resolved.mask(codes < 0)
+
+    def create_dim_sector(self, company_data: Records) -> pd.DataFrame:
+        df = _as_frame(company_data)
+        sectors = pd.DataFrame({"sector": df["sector"].drop_duplicates().to_numpy()})
+        sectors["sector_id"] = self._stable_ids(sectors["sector"]).array
         sectors["created_at"] = datetime.utcnow().isoformat()
 
         return sectors[["sector_id", "sector", "created_at"]]
 
-    def create_dim_company(self, company_data: List[Dict], dim_sector: pd.DataFrame) -> pd.DataFrame:
-        df = pd.DataFrame(company_data)
-        df = df.merge(dim_sector[["sector_id", "sector"]], on="sector", how="left")
-
-        df["company_id"] = range(1, len(df) + 1)
-        df["created_at"] = datetime.utcnow().isoformat()
-        df["updated_at"] = datetime.utcnow().isoformat()
-
-        return df[[
-            "company_id", "symbol", "company_name", "sector_id",
-            "sub_industry", "headquarters", "date_added", "cik",
-            "created_at", "updated_at"
-        ]]
-
-    def create_fact_daily_prices(self, price_data: List[Dict], dim_company: pd.DataFrame) -> pd.DataFrame:
-        df = pd.DataFrame(price_data)
-
-        company_lookup = dim_company[["company_id", "symbol"]].copy()
-        df = df.merge(company_lookup, on="symbol", how="left")
-
-        df["price_id"] = range(1, len(df) + 1)
-        df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
-        df["loaded_at"] = datetime.utcnow().isoformat()
-
-        df["open"] = df["open"].round(4)
-        df["high"] = df["high"].round(4)
-        df["low"] = df["low"].round(4)
-        df["close"] = df["close"].round(4)
-
-        return df[[
-            "price_id", "company_id", "date", "open", "high",
-            "low", "close", "volume", "extracted_at", "loaded_at"
-        ]]
-
+    def create_dim_company(self, company_data: Records, dim_sector: pd.DataFrame) -> pd.DataFrame:
+        df = _as_frame(company_data)
+        now = datetime.utcnow().isoformat()
+
+        return pd.DataFrame({
+            "company_id": self._stable_ids(df["symbol"]).array,
+            "symbol": df["symbol"].to_numpy(),
+            "company_name": df["company_name"].to_numpy(),
+            "sector_id": self._lookup_ids(df["sector"], dim_sector["sector"], dim_sector["sector_id"]).array,
+            "sub_industry": df["sub_industry"].to_numpy(),
+            "headquarters": df["headquarters"].to_numpy(),
+            "date_added": df["date_added"].to_numpy(),
+            "cik": df["cik"].to_numpy(),
+            "created_at": now,
+            "updated_at": now
+        })
+
+    def create_fact_daily_prices(self, price_data: Records, dim_company: pd.DataFrame) -> pd.DataFrame:
+        df = _as_frame(price_data)
+        company_ids = self._lookup_ids(df["symbol"], dim_company["symbol"], dim_company["company_id"])
+        dates, day_numbers = self._date_columns(df["date"])
+
+        # price_id packs company_id and the trade date's day number, unique per (company, date)
+        price_ids = (company_ids * (1 << PRICE_ID_DAY_BITS) + day_numbers).mask(day_numbers < 0)
+
+        return pd.DataFrame({
+            "price_id": price_ids.array,
+            "company_id": company_ids.array,
+            "date": dates,
+            "open": df["open"].round(4).to_numpy(),
+            "high": df["high"].round(4).to_numpy(),
+            "low": df["low"].round(4).to_numpy(),
+            "close": df["close"].round(4).to_numpy(),
+            "volume": df["volume"].to_numpy(),
+            "extracted_at": df["extracted_at"].to_numpy(),
+            "loaded_at": datetime.utcnow().isoformat()
+        })
+
+    def create_fact_intraday_prices(self, price_data: Records, dim_company: pd.DataFrame) -> pd.DataFrame:
+        df = _as_frame(price_data)
+        company_ids = self._lookup_ids(df["symbol"], dim_company["symbol"], dim_company["company_id"])
+
+        # Bar times are UTC; the regular session never crosses midnight UTC, so the date is the trade date
+        codes, uniques = pd.factorize(pd.to_datetime(df["date"]))
+        uniques = pd.DatetimeIndex(uniques)
+        bar_times = np.append(uniques.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object), None)[codes]
+        dates = np.append(uniques.strftime("%Y-%m-%d").to_numpy(dtype=object), None)[codes]
+
+        return pd.DataFrame({
+            "company_id": company_ids.array,
+            "bar_time": bar_times,
+            "date": dates,
+            "open": df["open"].round(4).to_numpy(),
+            "high": df["high"].round(4).to_numpy(),
+            "low": df["low"].round(4).to_numpy(),
+            "close": df["close"].round(4).to_numpy(),
+            "volume": df["volume"].to_numpy(),
+            "extracted_at": df["extracted_at"].to_numpy(),
+            "loaded_at": datetime.utcnow().isoformat()
+        })
+
+    def transform_intraday_batches(
+        self,
+        batches: Iterable[pd.DataFrame],
+        dim_company: pd.DataFrame
+    ) -> Iterator[pd.DataFrame]:
+        # Each micro-batch is validated and cleaned on its own, so nothing accumulates across batches
+        for price_df in batches:
+            with metrics.stage("transform"):
+                metrics.count("transform", "rows_in", len(price_df))
+                is_valid, _, violations = self.validator.evaluate(price_df)
+                if not is_valid:
+                    price_df = self._clean_invalid_records(price_df, violations)
+
+                fact_prices = self.create_fact_intraday_prices(price_df, dim_company)
+                fact_prices = fact_prices[fact_prices["company_id"].notna()]
+                metrics.count("transform", "rows_out", len(fact_prices))
+
+            yield fact_prices
+
+    @metrics.instrument("transform")
     def transform(
         self,
-        company_data: List[Dict],
-        price_data: List[Dict]
+        company_data: Records,
+        price_data: Records
     ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, List[Dict]]:
         logger.info("Starting transformation")
 
-        price_df = pd.DataFrame(price_data)
-        is_valid, validation_results = self.validator.validate_price_data(price_df)
+        company_df = _as_frame(company_data)
+        price_df = _as_frame(price_data)
+        metrics.count("transform", "rows_in", len(price_df))
+        is_valid, validation_results, violations = self.validator.evaluate(price_df)
 
         if not is_valid:
             logger.warning("Validation failed, proceeding with valid records only")
-            price_df = self._clean_invalid_records(price_df)
+            price_df = self._clean_invalid_records(price_df, violations)
 
-        dim_sector = self.create_dim_sector(company_data)
+        dim_sector = self.create_dim_sector(company_df)
         logger.info(f"Created dim_sector with {len(dim_sector)} sectors")
 
-        dim_company = self.create_dim_company(company_data, dim_sector)
+        dim_company = self.create_dim_company(company_df, dim_sector)
         logger.info(f"Created dim_company with {len(dim_company)} companies")
 
-        fact_prices = self.create_fact_daily_prices(price_data, dim_company)
+        fact_prices = self.create_fact_daily_prices(price_df, dim_company)
         logger.info(f"Created fact_daily_prices with {len(fact_prices)} records")
+        metrics.count("transform", "rows_out", len(fact_prices))
 
         return dim_sector, dim_company, fact_prices, validation_results
 
-    def _clean_invalid_records(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.dropna(subset=["symbol", "date"])
-        df = df.drop_duplicates(subset=["symbol", "date"])
-
-        price_cols = ["open", "high", "low", "close"]
-        for col in price_cols:
-            df = df[df[col] > 0]
-
-        df = df[df["volume"] >= 0]
-        return df
+    def _clean_invalid_records(self, df: pd.DataFrame, violations: np.ndarray) -> pd.DataFrame:
+        return df[(violations & CLEAN_MASK) == 0]
@@ -1,15 +1,42 @@
 import logging
-from typing import List, Dict, Tuple
+from collections import Counter
+from typing import Iterable, List, Dict, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
+from src.metrics import instrumentation as metrics
+
 logger = logging.getLogger(__name__)
 
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+# Per-row violation bits
+NULL_SYMBOL = 1 << 0
+NULL_DATE = 1 << 1
+NEGATIVE_PRICE = 1 << 2
+NEGATIVE_VOLUME = 1 << 3
+INVALID_OHLC = 1 << 4
+INVALID_DATE = 1 << 5
+DUPLICATE = 1 << 6
+INVALID_SYMBOL = 1 << 7
+EXCESS_PRECISION = 1 << 8
+EXTREME_PRICE = 1 << 9
+EXTREME_VOLUME = 1 << 10
+NON_POSITIVE_PRICE = 1 << 11
+
+# Rows carrying any of these bits are dropped by StockDataTransformer
+CLEAN_MASK = NULL_SYMBOL | NULL_DATE | NON_POSITIVE_PRICE | NEGATIVE_VOLUME | DUPLICATE
+
+MAX_PRICE_DECIMALS = 6
+SYMBOL_PATTERN = r"[^A-Z0-9\-\.]"
+
 
 class DataValidator:
     def __init__(self):
         self.validation_results = []
+        self.violation_mask = np.zeros(0, dtype=np.uint16)
 
     def _log_result(self, check_name: str, passed: bool, message: str):
         self.validation_results.append({
@@ -23,108 +50,168 @@ class DataValidator:
         else:
             logger.error(f"FAILED: {check_name} - {message}")
 
-    def check_not_empty(self, df: pd.DataFrame, name: str) -> bool:
-        passed = len(df) > 0
-        self._log_result("not_empty", passed, f"{name} has {len(df)} records")
-        return passed
-
-    def check_no_null_symbols(self, df: pd.DataFrame) -> bool:
-        null_count = df["symbol"].isnull().sum()
-        passed = null_count == 0
-        self._log_result("no_null_symbols", passed, f"Found {null_count} null symbols")
-        return passed
-
-    def check_no_null_dates(self, df: pd.DataFrame) -> bool:
-        null_count = df["date"].isnull().sum()
-        passed = null_count == 0
-        self._log_result("no_null_dates", passed, f"Found {null_count} null dates")
-        return passed
-
-    def check_positive_prices(self, df: pd.DataFrame) -> bool:
-        price_cols = ["open", "high", "low", "close"]
-        negative_count = (df[price_cols] < 0).sum().sum()
-        passed = negative_count == 0
-        self._log_result("positive_prices", passed, f"Found {negative_count} negative prices")
-        return passed
-
-    def check_positive_volume(self, df: pd.DataFrame) -> bool:
-        negative_count = (df["volume"] < 0).sum()
-        passed = negative_count == 0
-        self._log_result("positive_volume", passed, f"Found {negative_count} negative volumes")
-        return passed
-
-    def check_ohlc_relationship(self, df: pd.DataFrame) -> bool:
-        invalid = ((df["high"] < df["low"]) |
-                   (df["high"] < df["open"]) |
-                   (df["high"] < df["close"]) |
-                   (df["low"] > df["open"]) |
-                   (df["low"] > df["close"])).sum()
-        passed = invalid == 0
-        self._log_result("ohlc_relationship", passed, f"Found {invalid} invalid OHLC relationships")
-        return passed
-
-    def check_date_format(self, df: pd.DataFrame) -> bool:
-        try:
-            pd.to_datetime(df["date"])
-            passed = True
-            message = "All dates are valid"
-        except Exception as e:
-            passed = False
-            message = f"Invalid date format: {e}"
-        self._log_result("date_format", passed, message)
-        return passed
-
-    def check_no_duplicates(self, df: pd.DataFrame) -> bool:
-        duplicates = df.duplicated(subset=["symbol", "date"]).sum()
-        passed = duplicates == 0
-        self._log_result("no_duplicates", passed, f"Found {duplicates} duplicate records")
-        return passed
-
-    def check_symbol_format(self, df: pd.DataFrame) -> bool:
-        invalid = df["symbol"].str.contains(r"[^A-Z0-9\-\.]", regex=True, na=True).sum()
-        passed = invalid == 0
-        self._log_result("symbol_format", passed, f"Found {invalid} invalid symbol formats")
-        return passed
-
-    def check_price_precision(self, df: pd.DataFrame) -> bool:
-        price_cols = ["open", "high", "low", "close"]
-        max_decimals = df[price_cols].applymap(
-            lambda x: len(str(x).split(".")[-1]) if "." in str(x) else 0
-        ).max().max()
-        passed = max_decimals <= 6
-        self._log_result("price_precision", passed, f"Max decimal places: {max_decimals}")
-        return passed
-
-    def check_reasonable_prices(self, df: pd.DataFrame) -> bool:
-        price_cols = ["open", "high", "low", "close"]
-        extreme = ((df[price_cols] > 100000) | (df[price_cols] < 0.01)).sum().sum()
-        passed = extreme == 0
-        self._log_result("reasonable_prices", passed, f"Found {extreme} extreme prices")
-        return passed
-
-    def check_volume_range(self, df: pd.DataFrame) -> bool:
-        extreme = (df["volume"] > 1e12).sum()
-        passed = extreme == 0
-        self._log_result("volume_range", passed, f"Found {extreme} extreme volumes")
-        return passed
+    @staticmethod
+    def _invalid_dates(dates: pd.Series) -> np.ndarray:
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            return np.zeros(len(dates), dtype=bool)
+
+        # Parse each distinct date once; a backfill has few distinct dates and many rows
+        codes, uniques = pd.factorize(dates)
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce")
+        invalid_uniques = np.append(parsed.isna().to_numpy(), False)
+        return invalid_uniques[codes]
+
+    @staticmethod
+    def _invalid_symbols(symbols: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(symbols)
+        invalid_uniques = pd.Series(uniques, dtype=object).str.contains(SYMBOL_PATTERN, regex=True, na=True)
+        invalid_uniques = np.append(invalid_uniques.to_numpy(dtype=bool), True)
+        return invalid_uniques[codes]
+
+    @staticmethod
+    def _excess_precision(prices: np.ndarray) -> np.ndarray:
+        scaled = prices * 10 ** MAX_PRICE_DECIMALS
+        with np.errstate(invalid="ignore"):
+            excess = ~np.isclose(scaled, np.rint(scaled), rtol=1e-12, atol=1e-6)
+        return excess & ~np.isnan(prices)
+
+    @staticmethod
+    def _in_sorted(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+        # Binary search against the sorted seen set: O(chunk log seen), no re-sort of the seen set
+        positions = np.searchsorted(sorted_keys, keys)
+        found = positions < len(sorted_keys)
+        found[found] = sorted_keys[positions[found]] == keys[found]
+        return found
+
+    @staticmethod
+    def _insert_sorted(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        new_keys = np.unique(keys)
+        new_keys = new_keys[~DataValidator._in_sorted(new_keys, sorted_keys)]
+        return np.insert(sorted_keys, np.searchsorted(sorted_keys, new_keys), new_keys)
+
+    @staticmethod
+    def _key_hashes(df: pd.DataFrame) -> np.ndarray:
+        return pd.util.hash_pandas_object(df[["symbol", "date"]], index=False).to_numpy()
+
+    @metrics.instrument("validate")
+    def compute_violations(
+        self,
+        df: pd.DataFrame,
+        seen_keys: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Dict[str, int], np.ndarray]:
+        mask = np.zeros(len(df), dtype=np.uint16)
+        counts = {}
+
+        def flag(bit: int, rows: np.ndarray):
+            mask[rows] |= bit
+
+        null_symbols = df["symbol"].isna().to_numpy()
+        null_dates = df["date"].isna().to_numpy()
+        flag(NULL_SYMBOL, null_symbols)
+        flag(NULL_DATE, null_dates)
+        counts["null_symbols"] = int(null_symbols.sum())
+        counts["null_dates"] = int(null_dates.sum())
+
+        prices = df[PRICE_COLUMNS].to_numpy(dtype="float64")
+        volume = df["volume"].to_numpy(dtype="float64")
+
+        with np.errstate(invalid="ignore"):
+            negative_prices = prices < 0
+            extreme_prices = (prices > 100000) | (prices < 0.01)
+            non_positive = ~(prices > 0)
+            o, h, l, c = prices.T
+            invalid_ohlc = (h < l) | (h < o) | (h < c) | (l > o) | (l > c)
+
+        excess_precision = self._excess_precision(prices)
+
+        flag(NEGATIVE_PRICE, negative_prices.any(axis=1))
+        flag(EXTREME_PRICE, extreme_prices.any(axis=1))
+        flag(NON_POSITIVE_PRICE, non_positive.any(axis=1))
+        flag(INVALID_OHLC, invalid_ohlc)
+        flag(EXCESS_PRECISION, excess_precision.any(axis=1))
+        counts["negative_prices"] = int(negative_prices.sum())
+        counts["extreme_prices"] = int(extreme_prices.sum())
+        counts["invalid_ohlc"] = int(invalid_ohlc.sum())
+        counts["excess_precision"] = int(excess_precision.sum())
+
+        negative_volume = volume < 0
+        extreme_volume = volume > 1e12
+        flag(NEGATIVE_VOLUME, negative_volume)
+        flag(EXTREME_VOLUME, extreme_volume)
+        counts["negative_volumes"] = int(negative_volume.sum())
+        counts["extreme_volumes"] = int(extreme_volume.sum())
+
+        invalid_dates = self._invalid_dates(df["date"]) & ~null_dates
+        flag(INVALID_DATE, invalid_dates)
+        counts["invalid_dates"] = int(invalid_dates.sum())
+
+        # (symbol, date) pairs are compared as 64-bit hashes so keys from earlier
+        # chunks can be kept as a compact sorted array
+        keys = self._key_hashes(df)
+        duplicates = pd.Series(keys).duplicated().to_numpy()
+        if seen_keys is not None and len(seen_keys):
+            duplicates |= self._in_sorted(keys, seen_keys)
+        flag(DUPLICATE, duplicates)
+        counts["duplicates"] = int(duplicates.sum())
+
+        invalid_symbols = self._invalid_symbols(df["symbol"])
+        flag(INVALID_SYMBOL, invalid_symbols)
+        counts["invalid_symbols"] = int(invalid_symbols.sum())
+
+        counts["rows"] = len(df)
+        metrics.count("validate", "rows_in", len(df))
+        metrics.count("validate", "invalid_rows", int(np.count_nonzero(mask)))
+        return mask, counts, keys
+
+    def _log_counts(self, counts: Dict[str, int]) -> bool:
+        checks = [
+            ("not_empty", counts["rows"] > 0, f"price_data has {counts['rows']} records"),
+            ("no_null_symbols", counts["null_symbols"] == 0, f"Found {counts['null_symbols']} null symbols"),
+            ("no_null_dates", counts["null_dates"] == 0, f"Found {counts['null_dates']} null dates"),
+            ("positive_prices", counts["negative_prices"] == 0, f"Found {counts['negative_prices']} negative prices"),
+            ("positive_volume", counts["negative_volumes"] == 0,
+             f"Found {counts['negative_volumes']} negative volumes"),
+            ("ohlc_relationship", counts["invalid_ohlc"] == 0,
+             f"Found {counts['invalid_ohlc']} invalid OHLC relationships"),
+            ("date_format", counts["invalid_dates"] == 0,
+             "All dates are valid" if counts["invalid_dates"] == 0
+             else f"Found {counts['invalid_dates']} invalid dates"),
+            ("no_duplicates", counts["duplicates"] == 0, f"Found {counts['duplicates']} duplicate records"),
+            ("symbol_format", counts["invalid_symbols"] == 0,
+             f"Found {counts['invalid_symbols']} invalid symbol formats"),
+            ("price_precision", counts["excess_precision"] == 0,
+             f"Found {counts['excess_precision']} prices with more than {MAX_PRICE_DECIMALS} decimal places"),
+            ("reasonable_prices", counts["extreme_prices"] == 0, f"Found {counts['extreme_prices']} extreme prices"),
+            ("volume_range", counts["extreme_volumes"] == 0, f"Found {counts['extreme_volumes']} extreme volumes")
+        ]
 
-    def validate_price_data(self, df: pd.DataFrame) -> Tuple[bool, List[Dict]]:
+        for check_name, passed, message in checks:
+            self._log_result(check_name, passed, message)
+        return all(passed for _, passed, _ in checks)
+
+    def evaluate(self, df: pd.DataFrame) -> Tuple[bool, List[Dict], np.ndarray]:
         self.validation_results = []
+        self.violation_mask, counts, _ = self.compute_violations(df)
+        all_passed = self._log_counts(counts)
+        return all_passed, self.validation_results, self.violation_mask
 
-        checks = [
-            self.check_not_empty(df, "price_data"),
-            self.check_no_null_symbols(df),
-            self.check_no_null_dates(df),
-            self.check_positive_prices(df),
-            self.check_positive_volume(df),
-            self.check_ohlc_relationship(df),
-            self.check_date_format(df),
-            self.check_no_duplicates(df),
-            self.check_symbol_format(df),
-            self.check_price_precision(df),
-            self.check_reasonable_prices(df),
-            self.check_volume_range(df)
-        ]
+    def validate_price_data(self, df: pd.DataFrame) -> Tuple[bool, List[Dict]]:
+        all_passed, validation_results, _ = self.evaluate(df)
+        return all_passed, validation_results
 
-        all_passed = all(checks)
+    def validate_price_batches(self, batches: Iterable[pd.DataFrame]) -> Tuple[bool, List[Dict]]:
+        self.validation_results = []
+        totals = Counter({"rows": 0})
+        seen_keys = np.empty(0, dtype=np.uint64)
+
+        for batch in batches:
+            if not isinstance(batch, pd.DataFrame):
+                batch = batch.to_pandas()
+            _, counts, keys = self.compute_violations(batch, seen_keys)
+            totals.update(counts)
+            seen_keys = self._insert_sorted(seen_keys, keys)
+
+        logger.info(f"Validated {totals['rows']} records in batches, {len(seen_keys)} distinct keys")
+        self.violation_mask = np.zeros(0, dtype=np.uint16)
+        all_passed = self._log_counts(totals)
         return all_passed, self.validation_results
@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.fakes import FakeSnowflakeConnector, fake_s3
+from config.config import AWSConfig
+from src.loading.snowflake_loader import SnowflakeLoader
+from src.loading.snowflake_session import SnowflakeSessionPool
+from src.loading.staging_catalog import StagingCatalog
+
+BUCKET = "stock-etl-test"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setattr(AWSConfig, "S3_BUCKET", BUCKET)
+    with fake_s3(BUCKET) as client:
+        yield client
+
+
+@pytest.fixture
+def catalog(s3):
+    return StagingCatalog(s3, BUCKET, AWSConfig.S3_STAGING_PREFIX)
+
+
+@pytest.fixture
+def connector():
+    return FakeSnowflakeConnector()
+
+
+@pytest.fixture
+def snowflake(connector):
+    loader = SnowflakeLoader(pool=SnowflakeSessionPool(size=1, connector=connector), run_id="test_run")
+    loader.connect()
+    yield loader
+    loader.disconnect(close_idle=True)
@@ -0,0 +1,72 @@
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.fakes import LocalS3Client
+from src.storage.artifact_store import LocalArtifactStore, S3ArtifactStore
+from src.transformation.dimension_cdc import DimensionSnapshot
+from src.transformation.rollups import RollupBuilder
+
+FRAME = pd.DataFrame({"symbol": ["AAPL", "MSFT"], "close": [190.0, 410.0]})
+
+
+def age(path: str, seconds: int):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_delete_run_removes_only_that_run(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    store.write(FRAME, "manual__2024-01-02", "price_data")
+    store.write(FRAME, "manual__2024-01-02", "fact_prices")
+    kept = store.write(FRAME, "manual__2024-01-03", "price_data")
+
+    assert store.delete_run("manual__2024-01-02") == 2
+    assert store.delete_run("manual__2024-01-02") == 0
+    assert not os.path.exists(tmp_path / "manual__2024-01-02")
+    pd.testing.assert_frame_equal(store.read(kept), FRAME)
+
+
+def test_expire_drops_stale_runs(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    stale = store.write(FRAME, "failed_run", "price_data")
+    fresh = store.write(FRAME, "running", "price_data")
+    age(stale["path"], 3600)
+
+    assert store.expire(60) == 1
+    assert not os.path.exists(stale["path"])
+    assert os.path.exists(fresh["path"])
+
+
+def test_s3_store_deletes_and_expires(tmp_path):
+    client = LocalS3Client(str(tmp_path / "s3"))
+    client.create_bucket(Bucket="artifacts")
+    store = S3ArtifactStore(client, bucket="artifacts", prefix="artifacts/")
+    store.write(FRAME, "run_a", "price_data")
+    store.write(FRAME, "run_a", "fact_prices")
+    stale = store.write(FRAME, "run_b", "price_data")
+    store.write(FRAME, "run_c", "price_data")
+
+    assert store.delete_run("run_a") == 2
+    age(client._path("artifacts", stale["path"].split("s3://artifacts/", 1)[1]), 3600)
+    assert store.expire(60) == 1
+    keys = [obj["Key"] for page in client.get_paginator("list_objects_v2").paginate(Bucket="artifacts")
+            for obj in page.get("Contents", [])]
+    assert keys == ["artifacts/run_c/price_data.parquet"]
+
+
+def test_expire_pending_keeps_fresh_files(tmp_path):
+    snapshot = DimensionSnapshot("dim_sector", str(tmp_path / "dimensions"))
+    snapshot.diff(pd.DataFrame({"sector_id": [1], "sector": ["Energy"]}), "abandoned")
+    snapshot.diff(pd.DataFrame({"sector_id": [1], "sector": ["Energy"]}), "running")
+    age(snapshot._pending_path("abandoned"), 3600)
+
+    rollups = RollupBuilder(str(tmp_path / "rollups"))
+    rollups._write_pending(pd.DataFrame({"company_id": [1]}), "abandoned")
+    age(rollups._pending_path("abandoned"), 3600)
+
+    assert snapshot.expire_pending(60) == 1
+    assert rollups.expire_pending(60) == 1
+    assert not os.path.exists(snapshot._pending_path("abandoned"))
+    assert os.path.exists(snapshot._pending_path("running"))
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.loading.compaction import StagingCompactor
+from src.loading.s3_loader import S3Loader
+
+TABLE = "fact_daily_prices"
+
+
+def stage(s3, run_id: str, dates: list, close: float, file_tag: str = None) -> S3Loader:
+    loader = S3Loader(s3_client=s3, run_id=run_id, file_tag=file_tag)
+    loader.upload_dataframe(pd.DataFrame({
+        "company_id": [1] * len(dates), "date": dates, "close": close, "volume": 100
+    }), TABLE)
+    return loader
+
+
+def test_compaction_skips_published_files_that_are_not_loaded(s3, catalog):
+    loaded = stage(s3, "daily_1", ["2024-01-02", "2024-01-03"], 1.0)
+    catalog.mark_loaded(loaded.staged_files)
+    # Published, as the backfill does in assemble_staging, but its load has not committed yet
+    pending = stage(s3, "backfill", ["2024-01-04", "2024-01-05"], 2.0)
+
+    compactor = StagingCompactor(S3Loader(s3_client=s3, run_id="compact"))
+    added = compactor.compact(TABLE, before_month="2024-02")
+
+    current = {e["key"] for e in catalog.current_files(TABLE)}
+    assert current == {e["key"] for e in added + pending.staged_files}
+    for entry in pending.staged_files:
+        assert len(compactor.loader.read_staged(entry["key"])) == 1
+    assert compactor.compact(TABLE, before_month="2024-02") == []
+
+
+def test_later_loaded_file_wins_over_an_earlier_compaction(s3, catalog):
+    first = stage(s3, "daily_1", ["2024-01-02", "2024-01-03"], 1.0)
+    rerun = stage(s3, "backfill", ["2024-01-03"], 9.0, file_tag="bf20240101t000")
+    catalog.mark_loaded(first.staged_files)
+    compactor = StagingCompactor(S3Loader(s3_client=s3, run_id="compact"))
+    compactor.compact(TABLE, before_month="2024-02")
+
+    catalog.mark_loaded(rerun.staged_files)
+    added = compactor.compact(TABLE, before_month="2024-02")
+
+    compacted = pd.concat([compactor.loader.read_staged(e["key"]) for e in added], ignore_index=True)
+    assert dict(zip(compacted["date"].astype(str), compacted["close"])) == {"2024-01-02": 1.0, "2024-01-03": 9.0}
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from src.transformation.dimension_cdc import DimensionSnapshot
+
+
+def companies(**overrides) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "company_id": [1, 2, 3],
+        "symbol": ["AAPL", "MSFT", "XOM"],
+        "company_name": ["Apple", "Microsoft", "Exxon"],
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00"
+    })
+    for column, values in overrides.items():
+        df[column] = values
+    return df
+
+
+def test_first_run_inserts_everything(tmp_path):
+    changes = DimensionSnapshot("dim_company", str(tmp_path)).diff(companies(), "run_1")
+
+    assert sorted(changes["symbol"]) == ["AAPL", "MSFT", "XOM"]
+    assert changes["is_active"].all()
+
+
+def test_unchanged_rows_are_not_restaged(tmp_path):
+    snapshot = DimensionSnapshot("dim_company", str(tmp_path))
+    snapshot.diff(companies(), "run_1")
+    snapshot.commit("run_1")
+
+    # Audit columns alone never count as a change
+    changes = snapshot.diff(companies(updated_at="2024-02-01T00:00:00"), "run_2")
+
+    assert changes.empty
+
+
+def test_updates_inserts_and_soft_deletes(tmp_path):
+    snapshot = DimensionSnapshot("dim_company", str(tmp_path))
+    snapshot.diff(companies(), "run_1")
+    snapshot.commit("run_1")
+
+    current = companies(company_name=["Apple Inc.", "Microsoft", "Exxon"]).iloc[:2]
+    current = pd.concat([current, companies().iloc[:1].assign(company_id=4, symbol="NVDA")], ignore_index=True)
+    current["created_at"] = "2024-02-01T00:00:00"
+    changes = snapshot.diff(current, "run_2").set_index("symbol")
+
+    assert sorted(changes.index) == ["AAPL", "NVDA", "XOM"]
+    assert changes.loc["AAPL", "company_name"] == "Apple Inc."
+    assert changes.loc["AAPL", "created_at"] == "2024-01-01T00:00:00"
+    assert changes.loc["NVDA", "is_active"]
+    assert not changes.loc["XOM", "is_active"]
+
+
+def test_uncommitted_runs_diff_against_the_last_committed_snapshot(tmp_path):
+    snapshot = DimensionSnapshot("dim_company", str(tmp_path))
+    snapshot.diff(companies(), "run_1")
+
+    # run_1 was never loaded, so run_2 must restage the same rows
+    changes = snapshot.diff(companies(), "run_2")
+
+    assert len(changes) == 3
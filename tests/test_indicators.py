@@ -0,0 +1,101 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.config import ETLConfig
+from src.ingestion.price_cache import PriceCache
+from src.transformation.indicators import LOOKBACK_BARS, IndicatorCalculator
+
+DIM_COMPANY = pd.DataFrame({"company_id": [1, 2], "symbol": ["AAPL", "MSFT"]})
+
+
+def daily_bars(symbol: str, dates: pd.DatetimeIndex, seed: int) -> pd.DataFrame:
+    # Shaped like the extractor's output, which is what the price cache holds
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, len(dates)).cumsum()
+    return pd.DataFrame({
+        "symbol": symbol,
+        "date": dates,
+        "open": close,
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": rng.integers(1_000, 10_000, len(dates))
+    })
+
+
+def as_fact(bars: pd.DataFrame, company_id: int) -> pd.DataFrame:
+    return bars.drop(columns="symbol").assign(company_id=company_id, date=bars["date"].dt.strftime("%Y-%m-%d"))
+
+
+@pytest.fixture
+def history():
+    dates = pd.bdate_range("2023-01-02", periods=LOOKBACK_BARS + 5)
+    return {symbol: daily_bars(symbol, dates, seed) for seed, symbol in enumerate(DIM_COMPANY["symbol"])}
+
+
+def test_incremental_compute_matches_full_history(tmp_path, history):
+    cache = PriceCache(str(tmp_path))
+    for symbol, bars in history.items():
+        cache.write(symbol, bars.iloc[:-5], "2023-01-01", bars["date"].iloc[-5].strftime("%Y-%m-%d"))
+
+    full = pd.concat([as_fact(bars, i + 1) for i, bars in enumerate(history.values())], ignore_index=True)
+    new = full.groupby("company_id").tail(5)
+
+    incremental = IndicatorCalculator(cache).compute(new, DIM_COMPANY)
+    recomputed = IndicatorCalculator(PriceCache(str(tmp_path / "empty"))).compute(full, DIM_COMPANY)
+
+    keys = ["company_id", "date"]
+    expected = recomputed.merge(incremental[keys], on=keys).sort_values(keys).reset_index(drop=True)
+    actual = incremental.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual.drop(columns="computed_at"), expected.drop(columns="computed_at"))
+    assert actual["sma_200"].notna().all()
+
+    last_aapl = actual[actual["company_id"] == 1].iloc[-1]
+    assert last_aapl["sma_20"] == pytest.approx(history["AAPL"]["close"].tail(20).mean(), abs=1e-5)
+
+
+def test_cold_cache_is_seeded_from_fact_history(tmp_path, history):
+    full = pd.concat([as_fact(bars, i + 1) for i, bars in enumerate(history.values())], ignore_index=True)
+    new = full.groupby("company_id").tail(5)
+    # AAPL is cached on this worker; MSFT only exists in fact_daily_prices
+    cache = PriceCache(str(tmp_path))
+    aapl = history["AAPL"]
+    cache.write("AAPL", aapl.iloc[:-5], "2023-01-01", aapl["date"].iloc[-5].strftime("%Y-%m-%d"))
+    requests = []
+
+    def fact_history(company_ids, start_date, end_date):
+        requests.append(company_ids)
+        dates = pd.to_datetime(full["date"])
+        return full[full["company_id"].isin(company_ids) & (dates >= start_date) & (dates < end_date)]
+
+    seeded = IndicatorCalculator(cache, history_source=fact_history).compute(new, DIM_COMPANY)
+    recomputed = IndicatorCalculator(PriceCache(str(tmp_path / "empty"))).compute(full, DIM_COMPANY)
+
+    keys = ["company_id", "date"]
+    expected = recomputed.merge(seeded[keys], on=keys).sort_values(keys).reset_index(drop=True)
+    actual = seeded.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual.drop(columns="computed_at"), expected.drop(columns="computed_at"))
+    assert actual["sma_200"].notna().all()
+    assert requests == [[2]]
+
+
+def test_short_history_warns_and_leaves_windows_null(tmp_path, history, caplog):
+    new = as_fact(history["AAPL"].tail(5), 1)
+
+    with caplog.at_level(logging.WARNING):
+        indicators = IndicatorCalculator(PriceCache(str(tmp_path))).compute(new, DIM_COMPANY)
+
+    assert indicators["sma_20"].isna().all()
+    assert indicators["return_1d"].iloc[1:].notna().all()
+    assert "fewer than" in caplog.text
+
+
+def test_short_history_fails_when_history_is_required(tmp_path, history, monkeypatch):
+    monkeypatch.setattr(ETLConfig, "INDICATOR_REQUIRE_HISTORY", True)
+    new = as_fact(history["AAPL"].tail(5), 1)
+
+    with pytest.raises(ValueError, match="trailing bars"):
+        IndicatorCalculator(PriceCache(str(tmp_path))).compute(new, DIM_COMPANY)
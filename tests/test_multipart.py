@@ -0,0 +1,71 @@
+import hashlib
+
+import pytest
+
+from benchmarks.synthetic import synthetic_fact_prices
+from config.config import AWSConfig
+from src.loading import multipart
+from src.loading.multipart import MultipartUploadStream
+from src.loading.s3_loader import S3Loader
+
+PART_SIZE = 16 * 1024
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    # Real S3 needs 5 MB parts; shrink them so a small frame still spans several parts
+    monkeypatch.setattr(multipart, "MIN_PART_SIZE", PART_SIZE)
+    monkeypatch.setattr(AWSConfig, "MULTIPART_PART_SIZE", PART_SIZE)
+    monkeypatch.setattr(AWSConfig, "MULTIPART_THRESHOLD", 1)
+
+
+def record_parts(monkeypatch, s3) -> list:
+    parts = []
+    upload_part = s3.upload_part
+
+    def recording(**kwargs):
+        parts.append(kwargs["PartNumber"])
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", recording)
+    return parts
+
+
+def test_frames_above_the_threshold_stream_in_parts(s3, small_parts, monkeypatch):
+    parts = record_parts(monkeypatch, s3)
+    prices = synthetic_fact_prices(20_000, symbols=50)
+    loader = S3Loader(s3_client=s3, run_id="multipart", granularity="month")
+
+    loader.upload_dataframe(prices, "fact_daily_prices")
+
+    assert len(parts) > len(loader.staged_files)
+    assert sum(len(loader.read_staged(e["key"])) for e in loader.staged_files) == len(prices)
+    for entry in loader.staged_files:
+        body = s3.get_object(Bucket=AWSConfig.S3_BUCKET, Key=entry["key"])["Body"].read()
+        assert len(loader.read_staged(entry["key"])) == entry["row_count"]
+        assert (len(body), hashlib.sha256(body).hexdigest()) == (entry["bytes"], entry["checksum"])
+
+
+def test_failed_part_aborts_the_upload(s3, small_parts, monkeypatch):
+    upload_part = s3.upload_part
+    aborted = []
+
+    def failing(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise ConnectionError("part upload failed")
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", failing)
+    monkeypatch.setattr(s3, "abort_multipart_upload", lambda **kwargs: aborted.append(kwargs["UploadId"]))
+
+    stream = MultipartUploadStream(
+        s3, AWSConfig.S3_BUCKET, "staging/partial.parquet", part_size=PART_SIZE, concurrency=2
+    )
+    stream.write(b"x" * (3 * PART_SIZE + 100))
+    with pytest.raises(ConnectionError):
+        stream.close()
+
+    assert aborted == [stream._upload_id]
+    assert stream.closed
+    with pytest.raises(s3.exceptions.NoSuchKey):
+        s3.get_object(Bucket=AWSConfig.S3_BUCKET, Key="staging/partial.parquet")
@@ -0,0 +1,87 @@
+import pandas as pd
+
+from src.ingestion.price_cache import PriceCache
+
+
+def bars(start: str, end: str) -> pd.DataFrame:
+    dates = pd.bdate_range(start, end, inclusive="left")
+    return pd.DataFrame({"date": dates, "close": range(len(dates)), "volume": 100})
+
+
+def test_missing_range_covers_everything_for_unknown_symbol(tmp_path):
+    cache = PriceCache(str(tmp_path))
+
+    assert cache.missing_range("AAPL", "2024-01-01", "2024-02-01") == ("2024-01-01", "2024-02-01")
+
+
+def test_missing_range_only_fetches_past_the_watermark(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    cache.write("AAPL", bars("2024-01-01", "2024-01-15"), "2024-01-01", "2024-01-15")
+
+    assert cache.missing_range("AAPL", "2024-01-01", "2024-01-15") is None
+    assert cache.missing_range("AAPL", "2024-01-01", "2024-02-01") == ("2024-01-15", "2024-02-01")
+    # Earlier than anything fetched: the whole range is refetched
+    assert cache.missing_range("AAPL", "2023-12-01", "2024-01-10") == ("2023-12-01", "2024-01-10")
+
+
+def test_write_merges_overlapping_ranges_and_dedupes_bars(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    cache.write("AAPL", bars("2024-01-01", "2024-01-15"), "2024-01-01", "2024-01-15")
+    cache.write("AAPL", bars("2024-01-10", "2024-01-20"), "2024-01-10", "2024-01-20")
+
+    read = cache.read("AAPL", "2024-01-01", "2024-01-20")
+    assert read["date"].is_unique
+    assert read["date"].is_monotonic_increasing
+    assert len(read) == len(pd.bdate_range("2024-01-01", "2024-01-20", inclusive="left"))
+    assert cache.index["AAPL"]["fetched_from"] == "2024-01-01"
+    assert cache.index["AAPL"]["fetched_through"] == "2024-01-20"
+    assert cache.get_watermark("AAPL") == "2024-01-19"
+
+
+def test_empty_range_advances_watermark_without_a_file(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    cache.write("AAPL", bars("2024-01-06", "2024-01-08"), "2024-01-06", "2024-01-08")
+
+    assert cache.read("AAPL", "2024-01-01", "2024-02-01").empty
+    assert cache.missing_range("AAPL", "2024-01-06", "2024-01-08") is None
+    assert cache.get_watermark("AAPL") is None
+
+
+def test_index_survives_reload(tmp_path):
+    cache = PriceCache(str(tmp_path))
+    cache.write("AAPL", bars("2024-01-01", "2024-01-15"), "2024-01-01", "2024-01-15")
+    cache.save_index()
+
+    assert PriceCache(str(tmp_path)).missing_range("AAPL", "2024-01-01", "2024-01-15") is None
+
+
+def test_merge_folds_adjacent_shard_windows_into_one_range(tmp_path):
+    shared = PriceCache(str(tmp_path / "shared"))
+    shared.write("AAPL", bars("2024-03-01", "2024-03-15"), "2024-03-01", "2024-03-15")
+    shards = []
+    for i, (start, end) in enumerate([("2024-02-01", "2024-03-01"), ("2024-01-01", "2024-02-01")]):
+        shard = PriceCache(str(tmp_path / f"shard{i}"))
+        shard.write("AAPL", bars(start, end), start, end)
+        shard.write("MSFT", bars(start, end), start, end)
+        shards.append(shard)
+
+    assert shared.merge(shards) == 2
+
+    reloaded = PriceCache(str(tmp_path / "shared"))
+    assert reloaded.missing_range("AAPL", "2024-01-01", "2024-03-15") is None
+    assert reloaded.missing_range("MSFT", "2024-01-01", "2024-03-15") == ("2024-03-01", "2024-03-15")
+    assert reloaded.get_watermark("AAPL") == "2024-03-14"
+    assert len(reloaded.read("AAPL", "2024-01-01", "2024-03-15")) == len(bars("2024-01-01", "2024-03-15"))
+
+
+def test_merge_keeps_the_latest_range_when_windows_leave_a_gap(tmp_path):
+    shared = PriceCache(str(tmp_path / "shared"))
+    shared.write("AAPL", bars("2024-06-01", "2024-06-10"), "2024-06-01", "2024-06-10")
+    shard = PriceCache(str(tmp_path / "shard"))
+    shard.write("AAPL", bars("2024-01-01", "2024-02-01"), "2024-01-01", "2024-02-01")
+
+    shared.merge([shard])
+
+    # Incremental runs resume from the newest stretch; the older bars are still there for history
+    assert shared.missing_range("AAPL", "2024-06-01", "2024-06-20") == ("2024-06-10", "2024-06-20")
+    assert len(shared.read("AAPL", "2024-01-01", "2024-02-01")) == len(bars("2024-01-01", "2024-02-01"))
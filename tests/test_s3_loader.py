@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_fact_prices
+from config.config import AWSConfig
+from src.loading.s3_loader import S3Loader
+
+TABLE = "fact_daily_prices"
+
+
+@pytest.fixture
+def small_files(monkeypatch):
+    monkeypatch.setattr(AWSConfig, "TARGET_FILE_SIZE", 4 * 1024)
+
+
+def january(rows: int, seed: int) -> pd.DataFrame:
+    prices = synthetic_fact_prices(rows, symbols=20, seed=seed)
+    prices["date"] = pd.Timestamp("2024-01-02") + pd.to_timedelta(prices.index % 20, unit="D")
+    return prices
+
+
+def staged_keys(loader: S3Loader) -> set:
+    return set(loader.list_staging_files(TABLE))
+
+
+def shard_loader(s3, tag: str) -> S3Loader:
+    return S3Loader(s3_client=s3, run_id=f"backfill__{tag}", file_tag=tag, publish=False, granularity="month")
+
+
+def test_rerunning_a_month_shard_only_replaces_its_own_parts(s3, small_files):
+    first = shard_loader(s3, "bf20240101t000")
+    first.upload_dataframe(january(2_000, seed=1), TABLE)
+    sibling = shard_loader(s3, "bf20240101t001")
+    sibling.upload_dataframe(january(2_000, seed=2), TABLE)
+    sibling_keys = {e["key"] for e in sibling.staged_files}
+    assert len({e["key"] for e in first.staged_files}) > 1
+
+    # The retried shard returns fewer rows, so it writes fewer parts than before
+    rerun = shard_loader(s3, "bf20240101t000")
+    rerun.upload_dataframe(january(200, seed=1), TABLE)
+
+    assert staged_keys(rerun) == sibling_keys | {e["key"] for e in rerun.staged_files}
+
+
+def test_untagged_month_upload_keeps_tagged_parts(s3, small_files):
+    shard = shard_loader(s3, "bf20240101t000")
+    shard.upload_dataframe(january(2_000, seed=1), TABLE)
+
+    daily = S3Loader(s3_client=s3, run_id="daily", publish=False, granularity="month")
+    daily.upload_dataframe(january(100, seed=3), TABLE)
+
+    assert staged_keys(daily) == {e["key"] for e in shard.staged_files + daily.staged_files}
@@ -0,0 +1,131 @@
+import pytest
+
+from benchmarks.fakes import FakeSnowflakeConnection
+from src.loading.snowflake_loader import SnowflakeLoader
+from src.loading.snowflake_session import SnowflakeSessionPool
+
+
+def staged(table: str, name: str) -> dict:
+    return {
+        "table": table,
+        "partition": "date=2024-01-02",
+        "key": f"staging/{table}/date=2024-01-02/{name}.parquet",
+        "row_count": 10,
+        "bytes": 100,
+        "stats": {"min_date": "2024-01-02", "max_date": "2024-01-02"}
+    }
+
+
+STAGED_FILES = [
+    staged("dim_company", "dim_company_0000"),
+    staged("fact_daily_prices", "fact_daily_prices_0000"),
+    staged("agg_company_ohlcv", "agg_company_ohlcv_0000")
+]
+
+
+@pytest.fixture
+def validations(snowflake, monkeypatch):
+    calls = {}
+
+    def validate_load(table_name, staged_files, check_files=True, hours=24):
+        calls[table_name] = check_files
+        return True
+
+    monkeypatch.setattr(snowflake, "validate_load", validate_load)
+    return calls
+
+
+def statements(connector, verb: str) -> list:
+    return [" ".join(q.split()[:3]) for q in connector.connections[0].queries if q.split()[0] == verb]
+
+
+def test_copy_mode_copies_facts_and_merges_dimensions_and_rollups(snowflake, connector, validations):
+    result = snowflake.load_staged_files(STAGED_FILES, mode="copy")
+
+    assert "COPY INTO fact_daily_prices" in statements(connector, "COPY")
+    assert statements(connector, "MERGE") == ["MERGE INTO dim_company", "MERGE INTO agg_company_ohlcv"]
+    assert result["fact_daily_prices"]["files"] == 1
+    assert validations == {"dim_company": False, "fact_daily_prices": True, "agg_company_ohlcv": False}
+
+
+def test_merge_mode_merges_every_table(snowflake, connector, validations):
+    snowflake.load_staged_files(STAGED_FILES, mode="merge")
+
+    assert sorted(statements(connector, "MERGE")) == [
+        "MERGE INTO agg_company_ohlcv", "MERGE INTO dim_company", "MERGE INTO fact_daily_prices"
+    ]
+    assert statements(connector, "DROP") == ["DROP TABLE IF"] * 3
+    assert not any(validations.values())
+
+
+def test_snowpipe_mode_refreshes_fact_pipes_only(snowflake, connector, validations, monkeypatch):
+    waited = {}
+    monkeypatch.setattr(snowflake, "wait_for_files_loaded", lambda files_by_table: waited.update(files_by_table) or {})
+
+    result = snowflake.load_staged_files(STAGED_FILES, mode="snowpipe")
+
+    assert statements(connector, "ALTER") == ["ALTER PIPE STOCK_MARKET.PUBLIC.FACT_DAILY_PRICES_PIPE"]
+    assert list(waited) == ["fact_daily_prices"]
+    assert statements(connector, "MERGE") == ["MERGE INTO dim_company", "MERGE INTO agg_company_ohlcv"]
+    assert result["pipes_refreshed"] == ["fact_daily_prices"]
+
+
+def test_indicators_merge_in_every_mode(snowflake, connector, validations):
+    snowflake.load_staged_files([staged("fact_daily_indicators", "fact_daily_indicators_0000")], mode="snowpipe")
+
+    assert statements(connector, "MERGE") == ["MERGE INTO fact_daily_indicators"]
+    assert statements(connector, "ALTER") == []
+    assert validations == {"fact_daily_indicators": False}
+
+
+def test_failed_validation_fails_the_load(snowflake, monkeypatch):
+    monkeypatch.setattr(snowflake, "validate_load", lambda *args, **kwargs: False)
+
+    with pytest.raises(ValueError, match="Load validation failed"):
+        snowflake.load_staged_files(STAGED_FILES, mode="merge")
+
+
+class CopyHistoryConnection(FakeSnowflakeConnection):
+    # Reports one status per staged file, the way COPY_HISTORY lists files under the stage URL
+    statuses = {}
+
+    def respond(self, query: str):
+        if "COPY_HISTORY" not in query:
+            return super().respond(query)
+        description = [("file_name",), ("status",), ("row_count",), ("first_error_message",)]
+        return description, [
+            (f"s3://stock-etl-test/staging/{path}", status, 10, None) for path, status in self.statuses.items()
+        ]
+
+
+class CopyHistoryConnector:
+    def connect(self, **kwargs):
+        return CopyHistoryConnection(**kwargs)
+
+
+@pytest.fixture
+def history_loader(monkeypatch):
+    monkeypatch.setattr("config.config.AWSConfig.S3_BUCKET", "stock-etl-test")
+    loader = SnowflakeLoader(pool=SnowflakeSessionPool(size=1, connector=CopyHistoryConnector()), run_id="test_run")
+    loader.connect()
+    yield loader
+    loader.disconnect()
+
+
+def test_wait_for_files_loaded_matches_history_by_stage_path(history_loader, monkeypatch):
+    monkeypatch.setattr(CopyHistoryConnection, "statuses", {"fact_daily_prices/a.parquet": "Loaded"})
+
+    loaded = history_loader.wait_for_files_loaded({"fact_daily_prices": ["staging/fact_daily_prices/a.parquet"]})
+
+    assert list(loaded["fact_daily_prices"]) == ["fact_daily_prices/a.parquet"]
+
+
+@pytest.mark.parametrize("status", ["Load failed", "Partially loaded"])
+def test_wait_for_files_loaded_fails_fast_on_failed_loads(history_loader, monkeypatch, status):
+    monkeypatch.setattr(CopyHistoryConnection, "statuses", {
+        "fact_daily_prices/a.parquet": "Loaded", "fact_daily_prices/b.parquet": status
+    })
+    keys = ["staging/fact_daily_prices/a.parquet", "staging/fact_daily_prices/b.parquet"]
+
+    with pytest.raises(RuntimeError, match=status):
+        history_loader.wait_for_files_loaded({"fact_daily_prices": keys}, timeout=1)
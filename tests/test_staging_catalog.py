@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.loading.s3_loader import S3Loader
+
+TABLE = "fact_daily_prices"
+
+
+def entry(partition: str, name: str, file_tag: str = None) -> dict:
+    return {
+        "table": TABLE,
+        "partition": partition,
+        "key": f"staging/{TABLE}/{partition}/{name}.parquet",
+        "row_count": 1,
+        "file_tag": file_tag,
+        "staged_at": "2024-01-01T00:00:00"
+    }
+
+
+def current_keys(catalog) -> set:
+    return {e["key"] for e in catalog.current_files(TABLE)}
+
+
+def test_publish_replaces_files_previously_current_in_a_partition(catalog):
+    catalog.publish(TABLE, [entry("trade_date=2024-01-02", "a"), entry("trade_date=2024-01-03", "b")])
+    catalog.publish(TABLE, [entry("trade_date=2024-01-02", "c")])
+
+    assert current_keys(catalog) == {
+        f"staging/{TABLE}/trade_date=2024-01-02/c.parquet",
+        f"staging/{TABLE}/trade_date=2024-01-03/b.parquet"
+    }
+
+
+def test_tagged_publishes_share_a_partition(catalog):
+    catalog.publish(TABLE, [entry("year=2024/month=01", "t0", "t000")])
+    catalog.publish(TABLE, [entry("year=2024/month=01", "t1", "t001")])
+    catalog.publish(TABLE, [entry("year=2024/month=01", "t0_rerun", "t000")])
+
+    assert current_keys(catalog) == {
+        f"staging/{TABLE}/year=2024/month=01/t1.parquet",
+        f"staging/{TABLE}/year=2024/month=01/t0_rerun.parquet"
+    }
+
+
+def test_swap_replaces_removed_keys_with_added_entries(catalog):
+    old = [entry("trade_date=2024-01-02", "a"), entry("trade_date=2024-01-03", "b")]
+    catalog.publish(TABLE, old)
+    compacted = entry("month=2024-01", "compacted")
+
+    catalog.swap(TABLE, [e["key"] for e in old], [compacted])
+
+    assert current_keys(catalog) == {compacted["key"]}
+
+
+def test_concurrent_publishes_are_all_retained(catalog):
+    entries = [entry(f"trade_date=2024-01-{day:02d}", f"f{day}") for day in range(1, 13)]
+
+    with ThreadPoolExecutor(max_workers=len(entries)) as executor:
+        list(executor.map(lambda e: catalog.publish(TABLE, [e]), entries))
+
+    assert current_keys(catalog) == {e["key"] for e in entries}
+
+
+def test_record_without_publish_only_writes_the_run_manifest(catalog):
+    catalog.record("run_1", TABLE, [entry("trade_date=2024-01-02", "a")], publish=False)
+
+    assert catalog.get_run("run_1", TABLE)[0]["key"].endswith("/a.parquet")
+    assert current_keys(catalog) == set()
+
+
+def test_missing_manifest_is_rebuilt_from_staged_files(s3, catalog):
+    loader = S3Loader(s3_client=s3, run_id="run_1", publish=False)
+    loader.upload_dataframe(pd.DataFrame({
+        "company_id": [1, 2], "date": ["2024-01-02", "2024-01-03"], "close": [1.0, 2.0], "volume": [10, 20]
+    }), TABLE)
+
+    rebuilt = catalog.current_files(TABLE)
+
+    assert {e["key"] for e in rebuilt} == {e["key"] for e in loader.staged_files}
+    assert sum(e["row_count"] for e in rebuilt) == 2
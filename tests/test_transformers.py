@@ -0,0 +1,56 @@
+import pandas as pd
+
+from src.transformation.transformers import PRICE_ID_DAY_BITS, StockDataTransformer
+
+
+def test_stable_ids_do_not_depend_on_order_or_batch():
+    first = StockDataTransformer._stable_ids(pd.Series(["AAPL", "MSFT", "AAPL"]))
+    second = StockDataTransformer._stable_ids(pd.Series(["NVDA", "MSFT", "AAPL"]))
+
+    assert first[0] == first[2] == second[2]
+    assert first[1] == second[1]
+    assert first[0] != first[1]
+
+
+def test_stable_ids_are_31_bit_and_null_safe():
+    ids = StockDataTransformer._stable_ids(pd.Series(["AAPL", None, "MSFT"], index=[10, 11, 12]))
+
+    assert list(ids.index) == [10, 11, 12]
+    assert pd.isna(ids[11])
+    assert ((ids.dropna() >= 0) & (ids.dropna() < 2 ** 31)).all()
+
+
+def test_lookup_ids_handles_empty_lookups_null_keys_and_duplicates():
+    keys = pd.Series(["Energy", None, "Utilities"])
+
+    empty = StockDataTransformer._lookup_ids(keys, pd.Series([], dtype=object), pd.Series([], dtype="int64"))
+    assert empty.isna().all()
+
+    nulls = StockDataTransformer._lookup_ids(pd.Series([None, None]), pd.Series(["Energy"]), pd.Series([7]))
+    assert nulls.isna().all()
+
+    # The first id wins for a duplicated lookup key
+    resolved = StockDataTransformer._lookup_ids(
+        keys, pd.Series(["Energy", "Energy", "Utilities"]), pd.Series([7, 8, 9])
+    )
+    assert resolved.tolist() == [7, pd.NA, 9]
+
+
+def test_price_id_packs_company_id_and_day_number():
+    transformer = StockDataTransformer()
+    company_data = [{
+        "symbol": "AAPL", "company_name": "Apple", "sector": "Information Technology", "sub_industry": "Hardware",
+        "headquarters": "Cupertino", "date_added": "1982-11-30", "cik": "320193"
+    }]
+    dim_sector = transformer.create_dim_sector(company_data)
+    dim_company = transformer.create_dim_company(company_data, dim_sector)
+    prices = pd.DataFrame({
+        "symbol": ["AAPL"], "date": ["1970-01-03"], "open": [1.0], "high": [1.0], "low": [1.0],
+        "close": [1.0], "volume": [10], "extracted_at": [pd.Timestamp("2024-01-01")]
+    })
+
+    fact = transformer.create_fact_daily_prices(prices, dim_company)
+
+    company_id = dim_company["company_id"].iloc[0]
+    assert dim_company["sector_id"].iloc[0] == dim_sector["sector_id"].iloc[0]
+    assert fact["price_id"].iloc[0] == company_id * (1 << PRICE_ID_DAY_BITS) + 2
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from src.ingestion.universe_cache import UniverseCache
+
+
+def universe(symbols: list, sector: str = "Energy") -> pd.DataFrame:
+    return pd.DataFrame({"symbol": symbols, "sector": sector})
+
+
+def test_write_reports_added_removed_and_changed(tmp_path):
+    cache = UniverseCache(str(tmp_path), ttl=3600)
+    cache.write(universe(["AAPL", "MSFT"]))
+
+    diff = cache.write(pd.concat([universe(["AAPL"]), universe(["XOM"], "Utilities")], ignore_index=True))
+    assert diff == {"added": ["XOM"], "removed": ["MSFT"], "changed": []}
+
+    diff = cache.write(universe(["AAPL", "XOM"], "Utilities"))
+    assert diff == {"added": [], "removed": [], "changed": ["AAPL"]}
+    assert cache.diff == diff
+
+
+def test_fresh_hit_reports_an_empty_diff(tmp_path):
+    UniverseCache(str(tmp_path), ttl=3600).write(universe(["AAPL", "MSFT"]))
+
+    cache = UniverseCache(str(tmp_path), ttl=3600)
+
+    assert cache.is_fresh()
+    assert cache.diff == {"added": [], "removed": [], "changed": []}
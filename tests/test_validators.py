@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_prices
+from src.storage.artifact_store import LocalArtifactStore
+from src.transformation.validators import DataValidator
+
+
+def summary(results: list) -> list:
+    return [(r["check"], r["passed"], r["message"]) for r in results]
+
+
+def chunks(df: pd.DataFrame, count: int) -> list:
+    return [df.iloc[rows] for rows in np.array_split(np.arange(len(df)), count)]
+
+
+def test_batches_match_the_in_memory_results():
+    # Duplicates are appended after the originals, so most of them land in a later chunk
+    prices = synthetic_prices(20, 30, invalid_rate=0.02, duplicate_rate=0.05)
+
+    expected_passed, expected = DataValidator().validate_price_data(prices)
+    passed, actual = DataValidator().validate_price_batches(chunks(prices, 7))
+
+    assert passed == expected_passed
+    assert summary(actual) == summary(expected)
+
+
+def test_duplicates_across_chunk_boundaries_are_counted():
+    prices = synthetic_prices(5, 10)
+    repeated = pd.concat([prices, prices.iloc[[0, 17]]], ignore_index=True)
+
+    passed, results = DataValidator().validate_price_batches(chunks(repeated, 4))
+
+    assert not passed
+    assert summary(results) == summary(DataValidator().validate_price_data(repeated)[1])
+    assert next(r for r in results if r["check"] == "no_duplicates")["message"] == "Found 2 duplicate records"
+
+
+def test_artifact_record_batches_validate_like_frames(tmp_path):
+    prices = synthetic_prices(10, 20, duplicate_rate=0.1)
+    store = LocalArtifactStore(str(tmp_path))
+    manifests = [store.write(chunk, "run", f"shard_{i}") for i, chunk in enumerate(chunks(prices, 3))]
+
+    batches = (batch for manifest in manifests for batch in store.iter_batches(manifest, 25))
+    _, results = DataValidator().validate_price_batches(batches)
+
+    assert summary(results) == summary(DataValidator().validate_price_data(prices)[1])
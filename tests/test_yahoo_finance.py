@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.fakes import FakeYahooSource
+from benchmarks.synthetic import symbol_names
+from config.config import ETLConfig
+from src.ingestion.checkpoint import ExtractionCheckpoint
+from src.ingestion.price_cache import PriceCache
+from src.ingestion.rate_limiter import TokenBucket
+from src.ingestion.yahoo_finance import YahooFinanceExtractor
+
+TICKERS = symbol_names(40)
+
+
+class SlowSource(FakeYahooSource):
+    # Later tickers answer first, so completion order never matches request order
+    def __call__(self, ticker, start_date, end_date, interval):
+        time.sleep(0.001 * (len(TICKERS) - TICKERS.index(ticker)))
+        return super().__call__(ticker, start_date, end_date, interval)
+
+
+class FailingSource(FakeYahooSource):
+    def __init__(self, failing: set):
+        super().__init__()
+        self.failing = failing
+        self.failures = 0
+
+    def __call__(self, ticker, start_date, end_date, interval):
+        if ticker in self.failing:
+            self.failures += 1
+            raise ConnectionError(f"{ticker} unavailable")
+        return super().__call__(ticker, start_date, end_date, interval)
+
+
+@pytest.fixture(autouse=True)
+def fast_extraction(monkeypatch):
+    monkeypatch.setattr(ETLConfig, "USE_PRICE_CACHE", False)
+    monkeypatch.setattr(ETLConfig, "EXTRACT_RATE_LIMIT", 10_000.0)
+    monkeypatch.setattr(ETLConfig, "EXTRACT_RATE_BURST", 10_000)
+    monkeypatch.setattr(ETLConfig, "RETRY_DELAY", 0)
+    monkeypatch.setattr(ETLConfig, "BATCH_SIZE", 15)
+
+
+def test_concurrent_extraction_matches_serial_order_without_duplicates():
+    serial = YahooFinanceExtractor(price_source=SlowSource(), max_workers=1)
+    concurrent = YahooFinanceExtractor(price_source=SlowSource(), max_workers=8)
+
+    expected = serial.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01")
+    actual = concurrent.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01")
+
+    columns = ["symbol", "date", "open", "high", "low", "close", "volume"]
+    pd.testing.assert_frame_equal(actual[columns], expected[columns])
+    assert list(actual["symbol"].drop_duplicates()) == TICKERS
+    assert not actual.duplicated(["symbol", "date"]).any()
+
+
+def test_cached_windows_are_not_fetched_again(tmp_path):
+    source = FakeYahooSource()
+    extractor = YahooFinanceExtractor(price_source=source, max_workers=4, cache=PriceCache(str(tmp_path)))
+
+    first = extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01")
+    calls = source.calls
+    second = extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01")
+
+    assert calls == len(TICKERS)
+    assert source.calls == calls
+    pd.testing.assert_frame_equal(first.drop(columns="extracted_at"), second.drop(columns="extracted_at"))
+
+
+def test_one_failing_ticker_does_not_fail_the_batch():
+    source = FailingSource({TICKERS[3]})
+    extractor = YahooFinanceExtractor(price_source=source, max_workers=8)
+
+    prices = extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01")
+
+    assert set(prices["symbol"]) == set(TICKERS) - {TICKERS[3]}
+    # Every healthy ticker is fetched once; the failing one uses all its retries
+    assert source.calls == len(TICKERS) - 1
+    assert source.failures == extractor.max_retries
+
+
+def test_outage_still_fails_once_retries_dead_letter_everything(tmp_path):
+    extractor = YahooFinanceExtractor(price_source=FailingSource(set(TICKERS)), max_workers=8)
+
+    with pytest.raises(RuntimeError, match="40 of 40 tickers failed"):
+        extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01", ExtractionCheckpoint("run", str(tmp_path)))
+
+    # The retry dead-letters every ticker in save_chunk, leaving nothing retryable
+    checkpoint = ExtractionCheckpoint("run", str(tmp_path))
+    with pytest.raises(RuntimeError, match="40 of 40 tickers failed"):
+        extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01", checkpoint)
+    assert sorted(checkpoint.dead_letter) == sorted(TICKERS)
+
+
+def test_isolated_failure_is_dead_lettered_without_failing(tmp_path):
+    extractor = YahooFinanceExtractor(price_source=FailingSource({TICKERS[3]}), max_workers=8)
+    checkpoint = ExtractionCheckpoint("run", str(tmp_path))
+
+    prices = extractor.extract_daily_prices(TICKERS, "2024-01-01", "2024-02-01", checkpoint)
+
+    assert checkpoint.dead_letter == [TICKERS[3]]
+    assert prices["symbol"].nunique() == len(TICKERS) - 1
+
+
+def test_token_bucket_throttles_to_its_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    started = time.monotonic()
+
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 25 tokens with a burst of 5 need at least 20 refills at 100 tokens/s
+    assert time.monotonic() - started >= 0.2
+
+
+def test_token_bucket_allows_an_initial_burst():
+    bucket = TokenBucket(rate=1, capacity=10)
+    started = time.monotonic()
+
+    for _ in range(10):
+        bucket.acquire()
+
+    assert time.monotonic() - started < 0.5